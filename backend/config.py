@@ -12,9 +12,45 @@ class Config:
     FACE_MATCH_THRESHOLD = float(os.getenv('FACE_MATCH_THRESHOLD', 0.6))
     FACE_CAPTURE_DURATION = int(os.getenv('FACE_CAPTURE_DURATION', 10))
     FACE_CAPTURE_FPS = int(os.getenv('FACE_CAPTURE_FPS', 10))
+    FACE_EMBEDDING_DTYPE = os.getenv('FACE_EMBEDDING_DTYPE', 'float32')  # float32 or float16
+    FACE_MODEL_VERSION = os.getenv('FACE_MODEL_VERSION', 'inception_resnet_v1_vggface2')
+    FACE_EMBEDDING_CACHE_SIZE = int(os.getenv('FACE_EMBEDDING_CACHE_SIZE', 1024))
+    FACE_EMBED_BATCH_SIZE = int(os.getenv('FACE_EMBED_BATCH_SIZE', 32))
+    FACE_EMBED_BACKEND = os.getenv('FACE_EMBED_BACKEND', 'eager')  # eager, torchscript, onnx or onnx_int8
+    FACE_EMBED_THREADS = int(os.getenv('FACE_EMBED_THREADS', 0))  # 0 lets the runtime decide
+    MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', 'data/models')
+    FACE_BATCHING_ENABLED = os.getenv('FACE_BATCHING_ENABLED', 'false').lower() == 'true'
+    FACE_BATCH_MAX_SIZE = int(os.getenv('FACE_BATCH_MAX_SIZE', 16))
+    FACE_BATCH_MAX_WAIT_MS = float(os.getenv('FACE_BATCH_MAX_WAIT_MS', 10))
+    FACE_MESH_POOL_SIZE = int(os.getenv('FACE_MESH_POOL_SIZE', 2))  # match gunicorn --threads
+    FACE_MESH_POOL_TIMEOUT = float(os.getenv('FACE_MESH_POOL_TIMEOUT', 30))
+    LIVENESS_ROI_ENABLED = os.getenv('LIVENESS_ROI_ENABLED', 'true').lower() == 'true'
+    LIVENESS_ROI_PADDING = float(os.getenv('LIVENESS_ROI_PADDING', 0.75))  # fraction of face size per side
+    FRAME_DEDUP_ENABLED = os.getenv('FRAME_DEDUP_ENABLED', 'true').lower() == 'true'
+    FRAME_DEDUP_THRESHOLD = int(os.getenv('FRAME_DEDUP_THRESHOLD', 6))  # max gray-level change on a 32x32 thumbnail
+    FRAME_DEDUP_MAX_GAP = int(os.getenv('FRAME_DEDUP_MAX_GAP', 3))  # keep at least one of every N frames
+    FRAME_DECODE_WORKERS = int(os.getenv('FRAME_DECODE_WORKERS', 4))
+    FRAME_DECODE_MAX_FRAMES = int(os.getenv('FRAME_DECODE_MAX_FRAMES', 60))  # per mark-attendance request
+    FRAME_DECODE_MAX_REGISTRATION_FRAMES = int(os.getenv('FRAME_DECODE_MAX_REGISTRATION_FRAMES', 150))  # UI sends 100
+    FRAME_DECODE_MAX_BYTES = int(os.getenv('FRAME_DECODE_MAX_BYTES', 4 * 1024 * 1024))  # per encoded frame
+    FRAME_DECODE_MIN_SHORT_SIDE = int(os.getenv('FRAME_DECODE_MIN_SHORT_SIDE', 0))  # e.g. 480; 0 decodes full size
+    FACE_DETECT_SHORT_SIDE = int(os.getenv('FACE_DETECT_SHORT_SIDE', 0))  # e.g. 360; 0 detects at full size
+    FACE_HINT_ENABLED = os.getenv('FACE_HINT_ENABLED', 'false').lower() == 'true'
+    FACE_HINT_PADDING = float(os.getenv('FACE_HINT_PADDING', 0.5))  # fraction of the hinted box per side
+    FACE_HINT_COUNT_SHORT_SIDE = int(os.getenv('FACE_HINT_COUNT_SHORT_SIDE', 240))  # whole-frame face count with a hint
+    ATTENDANCE_JOB_WORKERS = int(os.getenv('ATTENDANCE_JOB_WORKERS', 4))  # concurrent async mark-attendance jobs
+    ATTENDANCE_JOB_MAX_PENDING = int(os.getenv('ATTENDANCE_JOB_MAX_PENDING', 64))
+    ATTENDANCE_JOB_TTL = float(os.getenv('ATTENDANCE_JOB_TTL', 300))  # seconds a finished job stays readable
+    GALLERY_MMAP_PATH = os.getenv('GALLERY_MMAP_PATH', '')  # e.g. data/gallery.bin to share across workers
+    GROUP_PHOTO_MAX_PHOTOS = int(os.getenv('GROUP_PHOTO_MAX_PHOTOS', 5))
 
     # BLE Settings
     BLE_RSSI_THRESHOLD = int(os.getenv('BLE_RSSI_THRESHOLD', -70))
+    BLE_SCAN_TIMEOUT = float(os.getenv('BLE_SCAN_TIMEOUT', 5))
+    BLE_TARGETED_SCAN = os.getenv('BLE_TARGETED_SCAN', 'true').lower() == 'true'
+    BLE_BACKGROUND_SCAN = os.getenv('BLE_BACKGROUND_SCAN', 'false').lower() == 'true'
+    BLE_FRESHNESS_SECONDS = float(os.getenv('BLE_FRESHNESS_SECONDS', 10))
+    BLE_EXPIRY_SECONDS = float(os.getenv('BLE_EXPIRY_SECONDS', 60))
 
     # SendGrid
     SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY', '')
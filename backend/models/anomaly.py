@@ -11,7 +11,7 @@ class AnomalyLog(db.Model):
 
     anomaly_type = db.Column(db.String(50), nullable=False)
     # Types: 'multi_face', 'no_face', 'liveness_failed', 'rapid_attempts',
-    #        'ble_failed', 'duplicate_ip', 'low_confidence'
+    #        'ble_failed', 'duplicate_ip', 'low_confidence', 'unmatched_face'
 
     severity = db.Column(db.String(20), default='medium')  # low, medium, high
     description = db.Column(db.Text)
@@ -14,7 +14,7 @@ class AttendanceLog(db.Model):
     ble_verified = db.Column(db.Boolean, default=False)
 
     # Face Recognition Data
-    face_confidence = db.Column(db.Float)  # Euclidean distance
+    face_confidence = db.Column(db.Float)  # Euclidean distance between unit-normalised embeddings
     face_verified = db.Column(db.Boolean, default=False)
 
     # Liveness Detection
@@ -2,6 +2,8 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from backend.config import Config
+from backend.utils.embedding_codec import encode_embedding, decode_embedding
 
 db = SQLAlchemy()
 
@@ -46,6 +48,21 @@ class FaceEmbedding(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    embedding = db.Column(db.PickleType, nullable=False)  # Store numpy array as pickle
+    embedding_data = db.Column(db.LargeBinary, nullable=False)  # Raw little-endian values
+    dtype = db.Column(db.String(10), nullable=False, default='float32')  # 'float32' or 'float16'
+    dim = db.Column(db.Integer, nullable=False)
+    model_version = db.Column(db.String(50), nullable=False, default=Config.FACE_MODEL_VERSION)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def embedding(self):
+        """Stored template as a read-only numpy view over the column bytes"""
+        if self.embedding_data is None:
+            return None
+        return decode_embedding(self.embedding_data, self.dtype, self.dim)
+
+    @embedding.setter
+    def embedding(self, value):
+        self.embedding_data, self.dtype, self.dim = encode_embedding(value, Config.FACE_EMBEDDING_DTYPE)
+        self.model_version = Config.FACE_MODEL_VERSION
@@ -0,0 +1,171 @@
+"""
+INT8 embedder calibration and accuracy/latency report.
+
+Builds the calibrated INT8 ONNX embedder used by FACE_EMBED_BACKEND=onnx_int8
+from a labelled image set laid out as <image_dir>/<person>/<image>.jpg, then
+re-embeds every face with both the fp32 and INT8 models and reports the
+latency speedup and how far pairwise distances move relative to
+FACE_MATCH_THRESHOLD.
+
+Usage:
+    python backend/quantize_embedder.py path/to/labelled_faces
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import cv2
+import numpy as np
+import torch
+
+from backend.config import Config
+from backend.services.embedding_backends import OnnxEmbedder, build_embedder, model_path, quantize_onnx
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_labelled_crops(image_dir, mtcnn):
+    """
+    Detect and crop one face per image in a labelled directory tree.
+
+    Args:
+        image_dir: Directory with one sub-directory of images per person
+        mtcnn: Single-face MTCNN detector
+
+    Returns:
+        tuple: (crops float32 array (n, 3, 160, 160), labels list)
+    """
+    crops = []
+    labels = []
+    for person in sorted(os.listdir(image_dir)):
+        person_dir = os.path.join(image_dir, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for filename in sorted(os.listdir(person_dir)):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            frame = cv2.imread(os.path.join(person_dir, filename))
+            if frame is None:
+                continue
+            face = mtcnn(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if face is not None:
+                crops.append(face.numpy())
+                labels.append(person)
+
+    return np.stack(crops).astype(np.float32) if crops else np.empty((0, 3, 160, 160), np.float32), labels
+
+
+def _median_latency_ms(embedder, crops, iterations):
+    single = torch.from_numpy(crops[:1])
+    embedder(single)  # warm-up
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        embedder(torch.from_numpy(crops[i % len(crops):i % len(crops) + 1]))
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+
+def _pairwise_distances(embeddings):
+    i, j = np.triu_indices(len(embeddings), k=1)
+    return np.linalg.norm(embeddings[i] - embeddings[j], axis=1), i, j
+
+
+def compare_embedders(fp32, int8, crops, labels, threshold=None, iterations=50):
+    """
+    Re-embed face crops with both models and compare latency and match decisions.
+
+    Args:
+        fp32: Reference embedder
+        int8: Quantized embedder
+        crops: float32 array (n, 3, 160, 160) of face crops
+        labels: Person label per crop
+        threshold: Match threshold (from Config if None)
+        iterations: Batch-of-1 calls timed per model
+
+    Returns:
+        dict: Latency, embedding drift, distance shift and per-model accuracy at the threshold
+    """
+    threshold = threshold if threshold is not None else Config.FACE_MATCH_THRESHOLD
+    faces = torch.from_numpy(crops)
+
+    with torch.no_grad():
+        fp32_emb = np.asarray(fp32(faces))
+        int8_emb = np.asarray(int8(faces))
+
+    fp32_latency = _median_latency_ms(fp32, crops, iterations)
+    int8_latency = _median_latency_ms(int8, crops, iterations)
+
+    fp32_dist, i, j = _pairwise_distances(fp32_emb)
+    int8_dist, _, _ = _pairwise_distances(int8_emb)
+    genuine = np.array(labels)[i] == np.array(labels)[j]
+    shift = int8_dist - fp32_dist
+
+    def accuracy(distances):
+        matched = distances < threshold
+        return {
+            'genuine_accept_rate': float(matched[genuine].mean()) if genuine.any() else None,
+            'impostor_accept_rate': float(matched[~genuine].mean()) if (~genuine).any() else None
+        }
+
+    return {
+        'faces': len(crops),
+        'pairs': len(shift),
+        'threshold': threshold,
+        'latency_ms': {'fp32': fp32_latency, 'int8': int8_latency},
+        'speedup': fp32_latency / int8_latency,
+        'embedding_drift': {
+            'mean': float(np.linalg.norm(int8_emb - fp32_emb, axis=1).mean()),
+            'max': float(np.linalg.norm(int8_emb - fp32_emb, axis=1).max())
+        },
+        'distance_shift': {
+            'mean_abs': float(np.abs(shift).mean()) if len(shift) else 0.0,
+            'max_abs': float(np.abs(shift).max()) if len(shift) else 0.0
+        },
+        'decisions_flipped': int(((fp32_dist < threshold) != (int8_dist < threshold)).sum()),
+        'fp32': accuracy(fp32_dist),
+        'int8': accuracy(int8_dist)
+    }
+
+
+def print_report(report):
+    print("📊 INT8 embedder report")
+    print("=" * 50)
+    print(f"Faces: {report['faces']} | Pairs: {report['pairs']} | Threshold: {report['threshold']}")
+    print(f"Latency (batch 1): fp32 {report['latency_ms']['fp32']:.1f} ms, int8 {report['latency_ms']['int8']:.1f} ms "
+          f"-> {report['speedup']:.2f}x")
+    print(f"Embedding drift: mean {report['embedding_drift']['mean']:.4f}, max {report['embedding_drift']['max']:.4f}")
+    print(f"Distance shift: mean |d| {report['distance_shift']['mean_abs']:.4f}, max |d| {report['distance_shift']['max_abs']:.4f}")
+    print(f"Match decisions flipped: {report['decisions_flipped']}")
+    for model in ('fp32', 'int8'):
+        acc = report[model]
+        print(f"{model}: genuine accept {acc['genuine_accept_rate']}, impostor accept {acc['impostor_accept_rate']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the INT8 face embedder and report its accuracy cost')
+    parser.add_argument('image_dir', help='Labelled images, one sub-directory per person')
+    parser.add_argument('--calibration-count', type=int, default=100, help='Face crops used for calibration')
+    parser.add_argument('--cache-dir', default=None, help='Model cache directory (defaults to MODEL_CACHE_DIR)')
+    args = parser.parse_args()
+
+    from facenet_pytorch import MTCNN, InceptionResnetV1
+
+    crops, labels = load_labelled_crops(args.image_dir, MTCNN(image_size=160, margin=0))
+    if len(crops) < 2:
+        print("❌ Need at least two detectable faces")
+        return False
+
+    fp32 = build_embedder('onnx', lambda: InceptionResnetV1(pretrained='vggface2').eval(), cache_dir=args.cache_dir)
+    int8_path = model_path('onnx_int8', args.cache_dir)
+    quantize_onnx(fp32.path, int8_path, crops[:args.calibration_count])
+    print(f"✅ INT8 embedder written to {int8_path}")
+
+    print_report(compare_embedders(fp32, OnnxEmbedder(int8_path), crops, labels))
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
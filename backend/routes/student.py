@@ -1,22 +1,26 @@
-from flask import Blueprint, render_template, request, jsonify, session
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, session
 from flask_login import login_required, current_user
 from backend.models import db, User, FaceEmbedding, AttendanceLog, Session as ClassSession
 from backend.services.face_recognition import FaceRecognitionService
 from backend.services.liveness_detection import LivenessDetectionService
 from backend.services.ble_service import BLEProximityService
 from backend.services.attendance_service import AttendanceService
-import cv2
+from backend.services.attendance_jobs import get_attendance_jobs, QueueFullError, FINISHED
+from backend.utils.frame_decoding import get_frame_decoder, data_url_bytes, upload_bytes
+from backend.config import Config
 import numpy as np
-import base64
 import asyncio
+import json
+from contextlib import nullcontext
 from datetime import datetime
 
 student_bp = Blueprint('student', __name__)
 
+# Services are cheap to build; their models load lazily from the shared registry
 face_service = FaceRecognitionService()
-attendance_service = AttendanceService()
 ble_service = BLEProximityService()
 liveness_service = LivenessDetectionService()
+attendance_service = AttendanceService(face_service, liveness_service, ble_service)
 
 def require_student(f):
     """Decorator to require student role"""
@@ -62,37 +66,66 @@ def register_face_api():
 
         if len(frames_b64) < 10:
             return jsonify({'success': False, 'error': 'Insufficient frames captured'}), 400
+        if len(frames_b64) > Config.FRAME_DECODE_MAX_REGISTRATION_FRAMES:
+            return jsonify({'success': False,
+                            'error': _frame_limit_message(Config.FRAME_DECODE_MAX_REGISTRATION_FRAMES)}), 400
 
         # Convert base64 frames to OpenCV format
-        embeddings = []
-        for frame_b64 in frames_b64:
-            # Decode base64
-            img_data = base64.b64decode(frame_b64.split(',')[1])
-            nparr = np.frombuffer(img_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        decoded = get_frame_decoder().decode_all(frames_b64, data_url_bytes)
+        return _register_frames(decoded)
 
-            try:
-                embedding = face_service.get_embedding_from_frame(frame)
-                embeddings.append(embedding)
-            except ValueError:
-                continue  # Skip frames without faces
-
-        if len(embeddings) < 5:
-            return jsonify({'success': False, 'error': 'Not enough valid face captures'}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'errors': [str(e)]}), 500
 
-        # Average embeddings
-        avg_embedding = np.mean(embeddings, axis=0)
+@student_bp.route('/api/register-face/upload', methods=['POST'])
+@login_required
+@require_student
+def register_face_upload():
+    """Binary variant of register-face: one multipart 'frames' part per JPEG"""
+    try:
+        parts = request.files.getlist('frames')
 
-        # Store in database
-        face_service.register_user_face(current_user.id, avg_embedding)
+        if len(parts) < 10:
+            return jsonify({'success': False, 'error': 'Insufficient frames captured'}), 400
+        if len(parts) > Config.FRAME_DECODE_MAX_REGISTRATION_FRAMES:
+            return jsonify({'success': False,
+                            'error': _frame_limit_message(Config.FRAME_DECODE_MAX_REGISTRATION_FRAMES)}), 400
 
-        return jsonify({'success': True, 'message': 'Face registered successfully'})
+        decoded = get_frame_decoder().decode_all(parts, upload_bytes)
+        return _register_frames(decoded)
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'errors': [str(e)]}), 500
 
+def _frame_limit_message(limit):
+    return f'At most {limit} frames per request'
+
+def _register_frames(decoded):
+    # Detect and embed all frames in one batch; frames without faces are rejected
+    batch = face_service.get_embeddings_from_frames(decoded['frames'])
+    embeddings = batch['embeddings']
+
+    if len(embeddings) < 5:
+        # Undecodable frames reach the face service as None; report why they failed
+        reasons = {failure['index']: failure['reason'] for failure in decoded['failed']}
+        return jsonify({
+            'success': False,
+            'error': 'Not enough valid face captures',
+            'rejected': [dict(r, reason=reasons.get(r['index'], r['reason'])) for r in batch['rejected']]
+        }), 400
+
+    # Average embeddings
+    avg_embedding = np.mean(embeddings, axis=0)
+
+    # Store in database
+    face_service.register_user_face(current_user.id, avg_embedding)
+
+    return jsonify({'success': True, 'message': 'Face registered successfully'})
+
 @student_bp.route('/mark-attendance')
 @login_required
 @require_student
@@ -107,52 +140,183 @@ def mark_attendance_page():
 def mark_attendance_api():
     """API endpoint to mark attendance with face verification"""
     try:
+        attendance, error = _attendance_request()
+        if error:
+            return error
+
+        result, status = _run_attendance(current_user.id, attendance)
+        return jsonify(result), status
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'errors': [str(e)]}), 500
+
+@student_bp.route('/api/mark-attendance/upload', methods=['POST'])
+@login_required
+@require_student
+def mark_attendance_upload():
+    """Binary variant of mark-attendance: multipart 'frame' and 'liveness_frames' JPEG parts"""
+    return mark_attendance_api()
+
+@student_bp.route('/api/mark-attendance/jobs', methods=['POST'])
+@login_required
+@require_student
+def submit_attendance_job():
+    """Queue a mark-attendance check (JSON or multipart body) and return its job id at once"""
+    try:
+        attendance, error = _attendance_request()
+        if error:
+            return error
+
+        if attendance['load'] is upload_bytes:
+            # Multipart parts close with the request; keep their bytes for the worker
+            attendance['frames'] = [part.read() for part in attendance['frames']]
+            attendance['load'] = memoryview
+
+        app = current_app._get_current_object()
+        user_id = current_user.id
+
+        def run(job):
+            with app.app_context():
+                return _run_attendance(user_id, attendance, job)[0]
+
+        jobs = get_attendance_jobs()
+        job = jobs.submit(user_id, run)
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status,
+                        'queue_depth': jobs.metrics()['queue_depth']}), 202
+
+    except QueueFullError:
+        return jsonify({'success': False, 'errors': ['Attendance queue is full, retry shortly']}), 503, \
+            {'Retry-After': '2'}
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'errors': [str(e)]}), 500
+
+@student_bp.route('/api/mark-attendance/jobs/<job_id>')
+@login_required
+@require_student
+def attendance_job_status(job_id):
+    """Poll a queued attendance check; 'result' holds the mark-attendance response once done"""
+    job = get_attendance_jobs().get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'errors': ['Unknown or expired job']}), 404
+    return jsonify(job.to_dict())
+
+@student_bp.route('/api/mark-attendance/jobs/<job_id>/events')
+@login_required
+@require_student
+def attendance_job_events(job_id):
+    """Server-sent events for a queued attendance check, one per status change"""
+    jobs = get_attendance_jobs()
+    job = jobs.get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'errors': ['Unknown or expired job']}), 404
+
+    def stream():
+        seen = None
+        while seen not in FINISHED:
+            snapshot = jobs.wait(job, seen, timeout=15)
+            if snapshot['status'] == seen:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            seen = snapshot['status']
+            yield f"event: {seen}\ndata: {json.dumps(snapshot)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _attendance_request():
+    """
+    Read a mark-attendance request from a JSON body or a multipart form.
+
+    Returns:
+        tuple: (dict with session_id, frames, load, liveness_challenge and face_hint, None),
+               or (None, error response)
+    """
+    if request.mimetype == 'multipart/form-data':
+        if 'frame' not in request.files:
+            return None, (jsonify({'success': False, 'errors': ['No frame uploaded']}), 400)
+
+        # Optional 'x1,y1,x2,y2' face box as fractions of the frame
+        face_box = request.form.get('face_box')
+        attendance = {
+            'session_id': request.form.get('session_id', type=int),
+            'frames': [request.files['frame']] + request.files.getlist('liveness_frames'),
+            'load': upload_bytes,
+            'liveness_challenge': request.form.get('liveness_challenge') or None,
+            'face_hint': face_box.split(',') if face_box else None
+        }
+    else:
         data = request.get_json()
-        session_id = data.get('session_id')
-        frame_b64 = data.get('frame')
-        liveness_frames_b64 = data.get('liveness_frames', [])
-        liveness_challenge = data.get('liveness_challenge')
-
-        # Decode frame
-        img_data = base64.b64decode(frame_b64.split(',')[1])
-        nparr = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # Decode liveness frames if provided
-        liveness_frames = []
-        if liveness_frames_b64:
-            for lf_b64 in liveness_frames_b64:
-                img_data = base64.b64decode(lf_b64.split(',')[1])
-                nparr = np.frombuffer(img_data, np.uint8)
-                lf = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                liveness_frames.append(lf)
-
-        # Perform BLE Proximity Check
-        # Run async BLE check synchronously
+        attendance = {
+            'session_id': data.get('session_id'),
+            'frames': [data.get('frame')] + data.get('liveness_frames', []),
+            'load': data_url_bytes,
+            'liveness_challenge': data.get('liveness_challenge'),
+            # Optional [x1, y1, x2, y2] face box as fractions of the frame, estimated by the browser
+            'face_hint': data.get('face_box')
+        }
+
+    if len(attendance['frames']) > Config.FRAME_DECODE_MAX_FRAMES:
+        return None, (jsonify({'success': False, 'errors': [_frame_limit_message(Config.FRAME_DECODE_MAX_FRAMES)]}), 400)
+    return attendance, None
+
+def _run_attendance(user_id, attendance, job=None):
+    """
+    Decode the frames, check BLE proximity and mark attendance.
+
+    Args:
+        user_id: Student user ID
+        attendance: Request fields from _attendance_request
+        job: AttendanceJob whose stages are timed, when run from the job queue
+
+    Returns:
+        tuple: (result dict, HTTP status)
+    """
+    stage = job.stage if job is not None else lambda name: nullcontext()
+
+    # Decode frame and liveness frames together
+    with stage('decode'):
+        decoded = get_frame_decoder().decode_all(attendance['frames'], attendance['load'])
+
+    # The first decoded frame is the verification frame, the rest are liveness frames
+    frame = decoded['frames'][0]
+    if frame is None:
+        return {'success': False, 'errors': ['Could not decode frame'],
+                'decode_failures': decoded['failed']}, 400
+
+    # Liveness runs on the frames that decoded; the failures are reported back
+    liveness_frames = [lf for lf in decoded['frames'][1:] if lf is not None]
+
+    # Perform BLE Proximity Check
+    # Run async BLE check synchronously
+    with stage('ble'):
         try:
             loop = asyncio.get_event_loop()
         except RuntimeError:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            
-        ble_data = loop.run_until_complete(ble_service.check_proximity(current_user.id))
 
-        # Mark attendance
+        ble_data = loop.run_until_complete(ble_service.check_proximity(user_id))
+
+    # Mark attendance
+    with stage('verify'):
         result = attendance_service.mark_attendance(
-            user_id=current_user.id,
-            session_id=session_id,
+            user_id=user_id,
+            session_id=attendance['session_id'],
             frame=frame,
             ble_data=ble_data,
             liveness_frames=liveness_frames if liveness_frames else None,
-            liveness_challenge=liveness_challenge
+            liveness_challenge=attendance['liveness_challenge'],
+            face_hint=attendance['face_hint']
         )
 
-        return jsonify(result)
-
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'errors': [str(e)]}), 500
+    if decoded['failed']:
+        result['decode_failures'] = decoded['failed']
+    return result, 200
 
 @student_bp.route('/api/attendance-history')
 @login_required
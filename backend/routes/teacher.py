@@ -2,6 +2,13 @@ from flask import Blueprint, render_template, request, jsonify, send_file
 from flask_login import login_required, current_user
 from backend.models import db, User, AttendanceLog, Session as ClassSession, AnomalyLog
 from backend.services.attendance_service import AttendanceService
+from backend.services.model_registry import registry as model_registry
+from backend.services.inference_batcher import get_embedding_batcher
+from backend.services.embedding_cache import embedding_cache
+from backend.services.face_hints import face_hint_stats
+from backend.services.attendance_jobs import peek_attendance_jobs
+from backend.utils.frame_decoding import get_frame_decoder, data_url_bytes
+from backend.config import Config
 from datetime import datetime, date
 import io
 import csv
@@ -149,6 +156,36 @@ def view_session(session_id):
                          attendance_summary=attendance_summary,
                          anomalies=anomalies)
 
+@teacher_bp.route('/api/group-attendance/<int:session_id>', methods=['POST'])
+@login_required
+@require_teacher
+def group_attendance(session_id):
+    """Mark attendance for everyone recognised in one or a few classroom photos"""
+    session = ClassSession.query.get_or_404(session_id)
+
+    if session.teacher_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        data = request.get_json()
+        photos_b64 = data.get('photos', [])
+
+        if not photos_b64:
+            return jsonify({'success': False, 'error': 'No photos provided'}), 400
+        if len(photos_b64) > Config.GROUP_PHOTO_MAX_PHOTOS:
+            return jsonify({'success': False,
+                            'error': f'At most {Config.GROUP_PHOTO_MAX_PHOTOS} photos per request'}), 400
+
+        # Convert base64 photos to OpenCV format; failed photos are rejected as decode_failed
+        photos = get_frame_decoder().decode_all(photos_b64, data_url_bytes)['frames']
+
+        result = attendance_service.mark_group_attendance(session_id, photos)
+        return jsonify(result)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @teacher_bp.route('/api/manual-override', methods=['POST'])
 @login_required
 @require_teacher
@@ -252,3 +289,20 @@ def export_attendance(session_id):
 def manage_students():
     students = User.query.filter_by(role='student').all()
     return render_template('teacher/manage_students.html', students=students)
+
+@teacher_bp.route('/api/metrics')
+@login_required
+@require_teacher
+def metrics():
+    """Runtime metrics for this worker's inference pipeline"""
+    batcher = get_embedding_batcher()
+    face_mesh_pool = model_registry.get('face_mesh_pool') if model_registry.is_loaded('face_mesh_pool') else None
+    attendance_jobs = peek_attendance_jobs()
+    return jsonify({
+        'models': model_registry.stats(),
+        'embedding_batcher': batcher.metrics() if batcher else None,
+        'face_mesh_pool': face_mesh_pool.stats() if face_mesh_pool else None,
+        'embedding_cache': embedding_cache.stats(),
+        'face_hints': face_hint_stats.stats(),
+        'attendance_jobs': attendance_jobs.metrics() if attendance_jobs else None
+    })
@@ -0,0 +1,218 @@
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from backend.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ('done', 'failed')
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds the maximum number of pending jobs"""
+
+
+class AttendanceJob:
+    def __init__(self, user_id):
+        """
+        One submitted attendance request and its outcome.
+
+        Args:
+            user_id: Student the job belongs to; only they may read it
+        """
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time one processing stage in milliseconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - started) * 1000
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'timings_ms': dict(self.timings)
+        }
+
+
+class AttendanceJobQueue:
+    def __init__(self, workers=None, max_pending=None, ttl=None):
+        """
+        In-process pool that runs attendance checks off the request thread.
+        Submitting returns at once; clients poll or subscribe for the result.
+        Jobs live in this process only, so polls must reach the worker that
+        accepted the job, and finished jobs are forgotten after ttl seconds.
+
+        Args:
+            workers: Jobs processed concurrently (from Config if None)
+            max_pending: Queued jobs accepted before submit() refuses (from Config if None)
+            ttl: Seconds a finished job stays readable (from Config if None)
+        """
+        self.workers = workers or Config.ATTENDANCE_JOB_WORKERS
+        self.max_pending = max_pending or Config.ATTENDANCE_JOB_MAX_PENDING
+        self.ttl = ttl or Config.ATTENDANCE_JOB_TTL
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='attendance-job')
+        self._jobs = {}
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._stage_timings = defaultdict(lambda: deque(maxlen=1000))
+        self._condition = threading.Condition()
+
+    def submit(self, user_id, run):
+        """
+        Queue an attendance check.
+
+        Args:
+            user_id: Student submitting the job
+            run: Callable taking the AttendanceJob and returning the result dict;
+                 it may time its stages with job.stage(name)
+
+        Returns:
+            AttendanceJob: The queued job
+
+        Raises:
+            QueueFullError: If max_pending jobs are already waiting
+        """
+        job = AttendanceJob(user_id)
+        with self._condition:
+            self._expire()
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(f"{self._pending} attendance jobs already queued")
+            self._pending += 1
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id, user_id):
+        """
+        Look up a job for its owner.
+
+        Returns:
+            AttendanceJob: The job, or None if unknown, expired or owned by someone else
+        """
+        with self._condition:
+            self._expire()
+            job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def wait(self, job, seen_status, timeout):
+        """
+        Block until the job leaves seen_status or the timeout passes.
+
+        Returns:
+            dict: Snapshot of the job
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: job.status != seen_status, timeout=timeout)
+            return job.to_dict()
+
+    def _run(self, job, run):
+        with self._condition:
+            self._pending -= 1
+            self._running += 1
+            job.status = 'running'
+            job.timings['queued'] = (time.time() - job.submitted_at) * 1000
+            self._condition.notify_all()
+
+        try:
+            result, error, status = run(job), None, 'done'
+        except Exception as e:
+            logger.exception(f"Attendance job {job.id} failed")
+            result, error, status = None, str(e), 'failed'
+
+        job.timings['total'] = (time.time() - job.submitted_at) * 1000
+        with self._condition:
+            self._running -= 1
+            if status == 'done':
+                self._completed += 1
+            else:
+                self._failed += 1
+            for name, ms in job.timings.items():
+                self._stage_timings[name].append(ms)
+            job.result, job.error, job.status = result, error, status
+            job.finished_at = time.time()
+            self._condition.notify_all()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def metrics(self):
+        """
+        Report queue depth and per-stage timings.
+
+        Returns:
+            dict: queue_depth, running, completed, failed, rejected, and per stage
+                  the mean and p95 milliseconds over the last 1000 jobs
+        """
+        with self._condition:
+            stages = {
+                name: {
+                    'mean_ms': float(np.mean(timings)),
+                    'p95_ms': float(np.percentile(timings, 95))
+                }
+                for name, timings in self._stage_timings.items() if timings
+            }
+            return {
+                'queue_depth': self._pending,
+                'running': self._running,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'stages': stages
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_attendance_jobs():
+    """
+    Return the process-wide attendance job queue.
+
+    Returns:
+        AttendanceJobQueue: Shared queue and its worker pool
+    """
+    global _queue
+
+    with _queue_lock:
+        if _queue is None:
+            _queue = AttendanceJobQueue()
+        return _queue
+
+
+def peek_attendance_jobs():
+    """Return the job queue if this process has created one, without creating it"""
+    return _queue
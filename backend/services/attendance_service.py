@@ -3,14 +3,19 @@ from backend.models import db, AttendanceLog, Session, AnomalyLog, User
 from backend.services.face_recognition import FaceRecognitionService
 from backend.services.liveness_detection import LivenessDetectionService
 from backend.services.ble_service import BLEProximityService
+from backend.utils.frame_context import FrameContext, FrameStats
+import logging
+
+logger = logging.getLogger(__name__)
 
 class AttendanceService:
-    def __init__(self):
-        self.face_service = FaceRecognitionService()
-        self.liveness_service = LivenessDetectionService()
-        self.ble_service = BLEProximityService()
+    def __init__(self, face_service=None, liveness_service=None, ble_service=None):
+        self.face_service = face_service or FaceRecognitionService()
+        self.liveness_service = liveness_service or LivenessDetectionService()
+        self.ble_service = ble_service or BLEProximityService()
 
-    def mark_attendance(self, user_id, session_id, frame, ble_data, liveness_frames=None, liveness_challenge=None):
+    def mark_attendance(self, user_id, session_id, frame, ble_data, liveness_frames=None, liveness_challenge=None,
+                        face_hint=None):
         """
         Complete attendance marking workflow.
 
@@ -21,10 +26,25 @@ class AttendanceService:
             ble_data: BLE proximity verification data
             liveness_frames: Frames for liveness verification (optional)
             liveness_challenge: Type of liveness challenge given (optional)
+            face_hint: Client estimate of the face box as fractions of the frame (optional)
 
         Returns:
             dict: Attendance result with status and details
         """
+        # Every service reuses the same colour conversions of each frame
+        stats = FrameStats()
+        frame = FrameContext.wrap(frame, stats)
+        if liveness_frames:
+            liveness_frames = [FrameContext.wrap(f, stats) for f in liveness_frames]
+
+        result = self._mark_attendance(user_id, session_id, frame, ble_data, liveness_frames, liveness_challenge,
+                                       face_hint)
+
+        result['frame_stats'] = stats.to_dict()
+        logger.debug(f"Frame conversions for user {user_id}: {result['frame_stats']}")
+        return result
+
+    def _mark_attendance(self, user_id, session_id, frame, ble_data, liveness_frames, liveness_challenge, face_hint):
         result = {
             'success': False,
             'attendance_id': None,
@@ -51,8 +71,10 @@ class AttendanceService:
 
         result['ble_verified'] = True
 
-        # Step 2: Multi-face Detection
-        face_count = self.face_service.detect_multiple_faces(frame)
+        # Step 2: Multi-face Detection (single detector pass, also embeds the primary face)
+        detection = self.face_service.detect_and_embed(frame, hint=face_hint)
+        result['face_hint'] = detection['hint']
+        face_count = detection['face_count']
         if face_count == 0:
             result['errors'].append('No face detected')
             self._log_anomaly(user_id, session_id, 'no_face', 'No face in frame')
@@ -64,7 +86,7 @@ class AttendanceService:
 
         # Step 3: Face Recognition
         try:
-            probe_embedding = self.face_service.get_embedding_from_frame(frame)
+            probe_embedding = detection['embedding']
             match_found, distance = self.face_service.verify_face(user_id, probe_embedding)
 
             result['face_verified'] = match_found
@@ -82,11 +104,16 @@ class AttendanceService:
 
         # Step 4: Liveness Detection (if frames provided)
         if liveness_frames and liveness_challenge:
+            # The recognised face box seeds the liveness ROI (same camera, moments apart)
+            face_box = detection['boxes'][detection['primary_index']]
             liveness_result = self.liveness_service.verify_liveness_challenge(
-                liveness_challenge, liveness_frames
+                liveness_challenge, liveness_frames, face_box=face_box
             )
             result['liveness_verified'] = liveness_result['success']
             result['liveness_confidence'] = liveness_result['confidence']
+            result['liveness_details'] = liveness_result['details']
+            logger.info(f"Liveness {liveness_challenge} for user {user_id}: processed "
+                        f"{liveness_result['details'].get('frames_processed', 0)}/{len(liveness_frames)} frames")
 
             if not liveness_result['success']:
                 result['anomalies'].append('liveness_failed')
@@ -129,6 +156,105 @@ class AttendanceService:
 
         return result
 
+    def mark_group_attendance(self, session_id, photos):
+        """
+        Mark attendance for every recognisable student in classroom photos.
+        All faces are embedded in one batched pass and matched against the
+        students expected in the session; each student is matched at most once.
+        Further faces of an already matched student (the same class shot
+        twice) are reported as duplicates, not as unrecognised faces.
+
+        Args:
+            session_id: Session ID (does not need to be active)
+            photos: List of BGR images from OpenCV
+
+        Returns:
+            dict: Counts plus 'marked', 'already_marked', 'duplicates' and 'unmatched' face details
+        """
+        result = {
+            'success': False,
+            'faces_detected': 0,
+            'marked': [],
+            'already_marked': [],
+            'duplicates': [],
+            'unmatched': [],
+            'rejected': [],
+            'errors': []
+        }
+
+        session = Session.query.get(session_id)
+        if not session:
+            result['errors'].append('Session not found')
+            return result
+
+        detection = self.face_service.embed_all_faces(photos)
+        faces = detection['faces']
+        result['faces_detected'] = len(faces)
+        result['rejected'] = detection['rejected']
+
+        if faces:
+            # No per-session enrollment yet, so every student is expected (as in the session view)
+            student_ids = [uid for (uid,) in db.session.query(User.id).filter_by(role='student')]
+            matches = self.face_service.identify_face(detection['embeddings'], k=1, candidates=student_ids)
+        else:
+            matches = []
+
+        # Closest face wins when two faces resolve to the same student
+        order = sorted(range(len(faces)),
+                       key=lambda i: matches[i][0]['distance'] if matches[i] else float('inf'))
+        claimed = {}
+        for i in order:
+            best = matches[i][0] if matches[i] else None
+            if best and best['match']:
+                if best['user_id'] not in claimed:
+                    claimed[best['user_id']] = (i, best['distance'])
+                else:
+                    result['duplicates'].append(dict(faces[i], user_id=best['user_id'], distance=best['distance']))
+            else:
+                face = dict(faces[i], distance=best['distance'] if best else None)
+                result['unmatched'].append(face)
+
+        existing = {uid for (uid,) in db.session.query(AttendanceLog.user_id)
+                    .filter(AttendanceLog.session_id == session_id,
+                            AttendanceLog.user_id.in_(list(claimed)))} if claimed else set()
+
+        now = datetime.utcnow()
+        records = []
+        for user_id, (i, distance) in claimed.items():
+            if user_id in existing:
+                result['already_marked'].append({'user_id': user_id, 'distance': distance})
+                continue
+            records.append(AttendanceLog(
+                user_id=user_id,
+                session_id=session_id,
+                timestamp=now,
+                ble_verified=False,
+                face_confidence=distance,
+                face_verified=True,
+                liveness_verified=False,
+                status='present',
+                notes=f'Group photo {faces[i]["photo"] + 1}'
+            ))
+
+        anomalies = [
+            AnomalyLog(
+                session_id=session_id,
+                anomaly_type='unmatched_face',
+                description=f"Unrecognised face in group photo {face['photo'] + 1}",
+                severity='low',
+                extra_metadata={'box': face['box'], 'distance': face['distance']}
+            )
+            for face in result['unmatched']
+        ]
+
+        db.session.add_all(records + anomalies)
+        db.session.commit()
+
+        result['marked'] = [{'user_id': r.user_id, 'attendance_id': r.id, 'distance': r.face_confidence}
+                            for r in records]
+        result['success'] = True
+        return result
+
     def _log_anomaly(self, user_id, session_id, anomaly_type, description):
         """Log anomaly to database"""
         anomaly = AnomalyLog(
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from backend.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BleakScannerBackend:
+    """Radio backend that feeds advertisements from bleak into a callback."""
+
+    def __init__(self):
+        self._scanner = None
+
+    async def start(self, on_advertisement):
+        from bleak import BleakScanner
+
+        def detection_callback(device, advertisement_data):
+            on_advertisement(device.address, advertisement_data.rssi, device.name)
+
+        self._scanner = BleakScanner(detection_callback=detection_callback)
+        await self._scanner.start()
+
+    async def stop(self):
+        if self._scanner is not None:
+            await self._scanner.stop()
+            self._scanner = None
+
+
+class FakeScannerBackend:
+    """In-memory backend for tests and machines without a Bluetooth radio."""
+
+    def __init__(self):
+        self._callback = None
+
+    async def start(self, on_advertisement):
+        self._callback = on_advertisement
+
+    async def stop(self):
+        self._callback = None
+
+    def emit(self, address, rssi, name=None):
+        """Deliver a fake advertisement as if it came from the radio"""
+        if self._callback is None:
+            raise RuntimeError("Fake scanner backend is not started")
+        self._callback(address, rssi, name)
+
+
+class BLEScannerDaemon:
+    def __init__(self, backend=None, expiry_seconds=None, clock=time.monotonic):
+        self.backend = backend or BleakScannerBackend()
+        self.expiry_seconds = Config.BLE_EXPIRY_SECONDS if expiry_seconds is None else expiry_seconds
+        self.clock = clock
+
+        self._table = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._stop_event = None
+        self._started = threading.Event()
+
+    def record(self, address, rssi, name=None):
+        """
+        Record one advertisement in the RSSI table.
+
+        Args:
+            address: Device MAC address
+            rssi: Received signal strength in dBm
+            name: Advertised device name (optional)
+        """
+        key = address.strip().upper()
+        now = self.clock()
+
+        with self._lock:
+            entry = self._table.get(key)
+            if entry is None:
+                self._table[key] = {
+                    'address': key,
+                    'name': name,
+                    'rssi': rssi,
+                    'last_seen': now,
+                    'samples': 1
+                }
+            else:
+                entry['rssi'] = rssi
+                entry['last_seen'] = now
+                entry['samples'] += 1
+                if name:
+                    entry['name'] = name
+
+    def lookup(self, address, max_age=None):
+        """
+        Look up the latest sighting of a device.
+
+        Args:
+            address: Device MAC address
+            max_age: Maximum age in seconds for the sighting to count (optional)
+
+        Returns:
+            dict: Copy of the table entry with its age, or None if unseen or stale
+        """
+        key = address.strip().upper()
+        now = self.clock()
+
+        with self._lock:
+            entry = self._table.get(key)
+            if entry is None:
+                return None
+            age = now - entry['last_seen']
+            if age > self.expiry_seconds:
+                del self._table[key]
+                return None
+            if max_age is not None and age > max_age:
+                return None
+            result = dict(entry)
+
+        result['age'] = age
+        return result
+
+    def prune(self):
+        """Drop entries older than the expiry horizon, returning how many were removed"""
+        cutoff = self.clock() - self.expiry_seconds
+        with self._lock:
+            stale = [key for key, entry in self._table.items() if entry['last_seen'] < cutoff]
+            for key in stale:
+                del self._table[key]
+        return len(stale)
+
+    def snapshot(self):
+        """Return a copy of every entry currently in the table"""
+        with self._lock:
+            return [dict(entry) for entry in self._table.values()]
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, timeout=5.0):
+        """Start scanning on a daemon thread with its own event loop"""
+        if self.is_running():
+            return
+
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run_loop, name='ble-scanner', daemon=True)
+        self._thread.start()
+        self._started.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        """Stop scanning and wait for the background thread to exit"""
+        if not self.is_running():
+            return
+
+        self._loop.call_soon_threadsafe(self._stop_event.set)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._scan())
+        except Exception as e:
+            logger.error(f"BLE scanner daemon stopped: {e}")
+        finally:
+            self._loop.close()
+            self._started.set()
+
+    async def _scan(self):
+        self._stop_event = asyncio.Event()
+        await self.backend.start(self.record)
+        self._started.set()
+        logger.info("BLE scanner daemon started")
+
+        prune_interval = max(self.expiry_seconds / 2.0, 0.1)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=prune_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.prune()
+        finally:
+            await self.backend.stop()
+            logger.info("BLE scanner daemon stopped")
+
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+
+def get_background_scanner():
+    """
+    Return the process-wide scanner daemon, starting it on first use.
+
+    Returns:
+        BLEScannerDaemon: Running daemon, or None when BLE_BACKGROUND_SCAN is off
+    """
+    global _scanner
+
+    if not Config.BLE_BACKGROUND_SCAN:
+        return None
+
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = BLEScannerDaemon()
+            _scanner.start()
+        return _scanner
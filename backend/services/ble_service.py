@@ -1,7 +1,9 @@
 import asyncio
+import time
 from bleak import BleakScanner
 from backend.config import Config
 from backend.models import User
+from backend.services.ble_scanner import BleakScannerBackend, get_background_scanner
 import logging
 
 # Configure logging
@@ -9,8 +11,13 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class BLEProximityService:
-    def __init__(self):
+    def __init__(self, scanner=None, scan_backend_factory=None):
         self.rssi_threshold = Config.BLE_RSSI_THRESHOLD
+        self.freshness_seconds = Config.BLE_FRESHNESS_SECONDS
+        self.scan_timeout = Config.BLE_SCAN_TIMEOUT
+        self.targeted_scan = Config.BLE_TARGETED_SCAN
+        self.scanner = scanner if scanner is not None else get_background_scanner()
+        self.scan_backend_factory = scan_backend_factory or BleakScannerBackend
 
     async def scan_for_devices(self, duration=5):
         """
@@ -41,6 +48,61 @@ class BLEProximityService:
             logger.error(f"BLE Scan Error: {e}")
             return []
 
+    async def scan_for_target(self, target_address, timeout=None):
+        """
+        Scan until the target device is seen at or above the RSSI threshold.
+
+        Args:
+            target_address: MAC address of the device to look for
+            timeout: Upper bound on scan duration in seconds (from Config if None)
+
+        Returns:
+            dict: Best sighting of the target with time-to-detection, or None if unseen
+        """
+        timeout = timeout or self.scan_timeout
+        target_address = target_address.strip().upper()
+        detected = asyncio.Event()
+        best = {}
+        started = time.monotonic()
+
+        def on_advertisement(address, rssi, name=None):
+            if address.upper() != target_address:
+                return
+            if not best or rssi > best['rssi']:
+                best.update({
+                    'address': address,
+                    'name': name,
+                    'rssi': rssi,
+                    'time_to_detection': time.monotonic() - started
+                })
+            if rssi >= self.rssi_threshold:
+                detected.set()
+
+        logger.info(f"Starting targeted BLE scan for {target_address} (timeout {timeout}s)...")
+        backend = self.scan_backend_factory()
+        try:
+            await backend.start(on_advertisement)
+            try:
+                await asyncio.wait_for(detected.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        except Exception as e:
+            logger.error(f"BLE Scan Error: {e}")
+        finally:
+            try:
+                await backend.stop()
+            except Exception as e:
+                logger.error(f"BLE Scan Error: {e}")
+
+        elapsed = time.monotonic() - started
+        if not best:
+            logger.info(f"Targeted scan finished after {elapsed:.2f}s without seeing {target_address}")
+            return None
+
+        best['scan_duration'] = elapsed
+        logger.info(f"Targeted scan finished after {elapsed:.2f}s (first qualifying sighting at {best['time_to_detection']:.2f}s)")
+        return best
+
     async def check_proximity(self, user_id):
         """
         Check if a user's registered device is nearby.
@@ -62,7 +124,13 @@ class BLEProximityService:
             
         target_address = user.device_uuid.strip().upper()
         logger.info(f"Checking proximity for user {user.name} (Target: {target_address})")
-        
+
+        if self.scanner is not None and self.scanner.is_running():
+            return self._check_scanner_table(user_id, target_address)
+
+        if self.targeted_scan:
+            return await self._check_targeted_scan(user_id, target_address)
+
         devices = await self.scan_for_devices()
         
         # Check if user's device is in the scanned list
@@ -90,3 +158,55 @@ class BLEProximityService:
             'user_id': user_id,
             'rssi': None
         }
+
+    def _check_scanner_table(self, user_id, target_address):
+        """Answer a proximity check from the background scanner's RSSI table"""
+        entry = self.scanner.lookup(target_address, max_age=self.freshness_seconds)
+
+        if entry is None:
+            logger.warning(f"Target device {target_address} not seen in the last {self.freshness_seconds}s")
+            return {
+                'verified': False,
+                'user_id': user_id,
+                'rssi': None,
+                'source': 'scanner'
+            }
+
+        rssi = entry['rssi']
+        verified = rssi >= self.rssi_threshold
+        logger.info(f"Target device seen {entry['age']:.1f}s ago. RSSI: {rssi} (Threshold: {self.rssi_threshold}) - Verified: {verified}")
+
+        return {
+            'verified': verified,
+            'user_id': user_id,
+            'rssi': rssi,
+            'age': entry['age'],
+            'source': 'scanner'
+        }
+
+    async def _check_targeted_scan(self, user_id, target_address):
+        """Answer a proximity check with a scan that stops once the target is in range"""
+        sighting = await self.scan_for_target(target_address)
+
+        if sighting is None:
+            logger.warning(f"Target device {target_address} NOT found in targeted scan")
+            return {
+                'verified': False,
+                'user_id': user_id,
+                'rssi': None,
+                'time_to_detection': None,
+                'source': 'targeted_scan'
+            }
+
+        rssi = sighting['rssi']
+        verified = rssi >= self.rssi_threshold
+        logger.info(f"Target device found! RSSI: {rssi} (Threshold: {self.rssi_threshold}) - Verified: {verified}")
+
+        return {
+            'verified': verified,
+            'user_id': user_id,
+            'rssi': rssi,
+            'time_to_detection': sighting['time_to_detection'],
+            'scan_duration': sighting['scan_duration'],
+            'source': 'targeted_scan'
+        }
@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import torch
+from backend.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('eager', 'torchscript', 'onnx', 'onnx_int8')
+
+# Example input used for tracing/export; the batch axis stays dynamic
+_EXAMPLE_SHAPE = (2, 3, 160, 160)
+
+
+class OnnxEmbedder:
+    """ONNX Runtime session wrapped to take and return torch tensors like the eager model"""
+
+    def __init__(self, path):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("FACE_EMBED_BACKEND=onnx requires onnxruntime (pip install onnxruntime)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if Config.FACE_EMBED_THREADS:
+            options.intra_op_num_threads = Config.FACE_EMBED_THREADS
+
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, faces):
+        out = self.session.run(None, {self.input_name: faces.detach().cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+
+def _atomic_save(path, save):
+    """Write via a temp file so concurrent workers never read a partial export"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def export_torchscript(model, path):
+    """
+    Trace, freeze and save the embedding model as TorchScript.
+
+    Args:
+        model: Eager InceptionResnetV1 in eval mode
+        path: Destination .pt file
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.randn(*_EXAMPLE_SHAPE))
+        frozen = torch.jit.freeze(traced)
+    _atomic_save(path, frozen.save)
+
+
+def export_onnx(model, path):
+    """
+    Export the embedding model to ONNX with a dynamic batch axis.
+
+    Args:
+        model: Eager InceptionResnetV1 in eval mode
+        path: Destination .onnx file
+    """
+    def save(tmp_path):
+        torch.onnx.export(
+            model,
+            torch.randn(*_EXAMPLE_SHAPE),
+            tmp_path,
+            input_names=['faces'],
+            output_names=['embeddings'],
+            dynamic_axes={'faces': {0: 'batch'}, 'embeddings': {0: 'batch'}},
+            dynamo=False
+        )
+    _atomic_save(path, save)
+
+
+def quantize_onnx(fp32_path, int8_path, calibration_faces):
+    """
+    Statically quantize an exported ONNX embedder to INT8 (QDQ, per-channel weights).
+    Dynamic quantization is not used: ORT's ConvInteger kernels run this
+    network several times slower than fp32 on CPU.
+
+    Args:
+        fp32_path: Exported fp32 .onnx file
+        int8_path: Destination for the quantized model
+        calibration_faces: float32 array (n, 3, 160, 160) of real face crops
+    """
+    try:
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat,
+                                              QuantType, quantize_static)
+    except ImportError:
+        raise RuntimeError("INT8 quantization requires onnxruntime (pip install onnxruntime)")
+
+    class FaceCropReader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = iter(np.asarray(calibration_faces, dtype=np.float32)[:, None])
+
+        def get_next(self):
+            batch = next(self.batches, None)
+            return None if batch is None else {'faces': batch}
+
+    def save(tmp_path):
+        quantize_static(
+            fp32_path,
+            tmp_path,
+            FaceCropReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8
+        )
+    _atomic_save(int8_path, save)
+
+
+def model_path(backend, cache_dir=None, name='inception_resnet_v1_vggface2'):
+    """Location of the exported model file for a non-eager backend"""
+    cache_dir = cache_dir or Config.MODEL_CACHE_DIR
+    suffix = {'torchscript': 'pt', 'onnx': 'onnx', 'onnx_int8': 'int8.onnx'}[backend]
+    return os.path.join(cache_dir, f"{name}.{suffix}")
+
+
+def load_torchscript(path):
+    model = torch.jit.load(path, map_location='cpu')
+    return torch.jit.optimize_for_inference(model)
+
+
+def build_embedder(backend, eager_loader, cache_dir=None, name='inception_resnet_v1_vggface2'):
+    """
+    Build the embedding model for a backend, exporting and caching on first use.
+
+    Args:
+        backend: 'eager', 'torchscript', 'onnx' or 'onnx_int8'
+        eager_loader: Zero-argument callable returning the eager model
+        cache_dir: Directory for exported models (from Config if None)
+        name: File name stem for the exported model
+
+    Returns:
+        Callable taking a (n, 3, 160, 160) tensor and returning (n, 512) embeddings
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == 'eager':
+        return eager_loader()
+
+    if backend == 'onnx_int8':
+        path = model_path('onnx_int8', cache_dir, name)
+        if os.path.exists(path):
+            return OnnxEmbedder(path)
+        # The INT8 model needs calibration on real faces, produced by backend/quantize_embedder.py
+        logger.error(f"No calibrated INT8 embedder at {path}, falling back to fp32 ONNX")
+        backend = 'onnx'
+
+    path = model_path(backend, cache_dir, name)
+
+    if not os.path.exists(path):
+        logger.info(f"Exporting embedding model to {backend} at {path}")
+        model = eager_loader().to('cpu')
+        if backend == 'onnx':
+            export_onnx(model, path)
+        else:
+            export_torchscript(model, path)
+
+    if backend == 'onnx':
+        return OnnxEmbedder(path)
+    return load_torchscript(path)
@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from backend.config import Config
+
+
+class EmbeddingCache:
+    def __init__(self, max_size=None):
+        """
+        Bounded LRU cache of decoded face templates keyed by user_id.
+        Every entry carries the version of the row it was decoded from, so a
+        worker notices when another worker re-registered the same user.
+
+        Args:
+            max_size: Maximum number of cached users (from Config if None)
+        """
+        self.max_size = max_size or Config.FACE_EMBEDDING_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, version):
+        """
+        Return the cached template if it was decoded from this row version.
+
+        Args:
+            user_id: User database ID
+            version: Current row version (see FaceRecognitionService._template_version)
+
+        Returns:
+            numpy.ndarray: float32 template, or None on a miss or stale entry
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id, version, embedding):
+        """Store a decoded template, evicting the least recently used user when full"""
+        template = np.asarray(embedding, dtype=np.float32)
+        template.setflags(write=False)
+
+        with self._lock:
+            self._entries[user_id] = (version, template)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return template
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
+
+
+# Process-wide cache shared by every FaceRecognitionService in a worker
+embedding_cache = EmbeddingCache()
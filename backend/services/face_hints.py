@@ -0,0 +1,72 @@
+import math
+import threading
+from collections import Counter
+
+
+# Outcomes of a detection request, as recorded in FaceHintStats
+HINT_OUTCOMES = ('hint_used', 'hint_fallback', 'hint_invalid', 'no_hint')
+
+
+def hint_roi(shape, hint, padding):
+    """
+    Turn a client face-box hint into a padded pixel region of the frame.
+    Hints are fractions of the frame size so they survive reduced-size
+    decoding of the upload.
+
+    Args:
+        shape: Frame shape (height, width, ...)
+        hint: (x1, y1, x2, y2) as fractions of frame width and height
+        padding: Margin added on every side, as a fraction of the box size
+
+    Returns:
+        tuple: (x1, y1, x2, y2) in pixels clipped to the frame, or None if the hint is unusable
+    """
+    try:
+        x1, y1, x2, y2 = (float(v) for v in hint)
+    except (TypeError, ValueError):
+        return None
+    if not all(math.isfinite(v) for v in (x1, y1, x2, y2)) or x2 <= x1 or y2 <= y1:
+        return None
+
+    h, w = shape[:2]
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    roi = (
+        max(0, int((x1 - pad_x) * w)),
+        max(0, int((y1 - pad_y) * h)),
+        min(w, int(math.ceil((x2 + pad_x) * w))),
+        min(h, int(math.ceil((y2 + pad_y) * h)))
+    )
+    if roi[2] - roi[0] < 2 or roi[3] - roi[1] < 2:
+        return None
+    return roi
+
+
+class FaceHintStats:
+    def __init__(self):
+        """
+        Process-wide tally of how mark-attendance detections used the
+        client's face-box hint.
+        """
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self):
+        """
+        Report hint outcomes.
+
+        Returns:
+            dict: Count per outcome plus hint_hit_rate, the share of hinted
+                  requests whose face was found inside the hint region
+        """
+        with self._lock:
+            counts = {outcome: self._counts[outcome] for outcome in HINT_OUTCOMES}
+        hinted = counts['hint_used'] + counts['hint_fallback']
+        counts['hint_hit_rate'] = counts['hint_used'] / hinted if hinted else None
+        return counts
+
+
+face_hint_stats = FaceHintStats()
@@ -0,0 +1,109 @@
+import threading
+import time
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FaceMeshPool:
+    def __init__(self, factory, size, timeout=None):
+        """
+        Fixed-size pool of FaceMesh graphs for concurrent requests.
+        A graph is used by one request at a time and reset on checkout, so
+        tracking state never carries over from another student's frames.
+
+        Args:
+            factory: Zero-argument callable that builds one FaceMesh
+            size: Maximum number of graphs, built lazily as demand grows
+            timeout: Seconds to wait for a free graph before giving up (None waits forever)
+        """
+        if size < 1:
+            raise ValueError("FaceMesh pool size must be at least 1")
+
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._max_wait_ms = 0.0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Borrow a graph for the duration of one request.
+
+        Yields:
+            FaceMesh: A graph with fresh tracking state
+
+        Raises:
+            TimeoutError: If no graph became free within the pool timeout
+        """
+        face_mesh = self._acquire()
+        try:
+            # Tracking state belongs to the previous request's frames
+            if hasattr(face_mesh, 'reset'):
+                face_mesh.reset()
+            yield face_mesh
+        finally:
+            self._release(face_mesh)
+
+    def _acquire(self):
+        started = time.perf_counter()
+        with self._condition:
+            build = False
+            if not self._idle and self._created >= self.size:
+                self._waits += 1
+                if not self._condition.wait_for(lambda: self._idle or self._created < self.size,
+                                                timeout=self.timeout):
+                    raise TimeoutError(f"No FaceMesh free after {self.timeout}s (pool size {self.size})")
+
+            if self._idle:
+                face_mesh = self._idle.pop()
+            else:
+                # Reserve the slot now, build outside the lock
+                self._created += 1
+                build = True
+
+            self._in_use += 1
+            self._checkouts += 1
+            self._max_wait_ms = max(self._max_wait_ms, (time.perf_counter() - started) * 1000)
+
+        if build:
+            try:
+                face_mesh = self.factory()
+            except Exception:
+                with self._condition:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._condition.notify()
+                raise
+            logger.info(f"Built FaceMesh {self._created}/{self.size} for the pool")
+        return face_mesh
+
+    def _release(self, face_mesh):
+        with self._condition:
+            self._idle.append(face_mesh)
+            self._in_use -= 1
+            self._condition.notify()
+
+    def stats(self):
+        """
+        Report pool usage.
+
+        Returns:
+            dict: size, created, in_use, checkouts, waits and max_wait_ms
+        """
+        with self._condition:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'max_wait_ms': self._max_wait_ms
+            }
@@ -1,10 +1,17 @@
 import os
+from datetime import datetime
 import cv2
 import numpy as np
 import torch
-from facenet_pytorch import MTCNN, InceptionResnetV1
 from backend.models import db, User, FaceEmbedding
 from backend.config import Config
+from backend.services.model_registry import registry as model_registry, get_device
+from backend.services.inference_batcher import get_embedding_batcher
+from backend.services.embedding_cache import embedding_cache
+from backend.services.gallery_index import gallery_index, normalize_embeddings
+from backend.services.frame_dedup import NearDuplicateFilter
+from backend.services.face_hints import hint_roi, face_hint_stats
+from backend.utils.frame_context import FrameContext
 import logging
 
 # Configure logging
@@ -12,11 +19,31 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class FaceRecognitionService:
-    def __init__(self):
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.mtcnn = MTCNN(image_size=160, margin=0, keep_all=False, device=self.device)
-        self.resnet = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
+    def __init__(self, registry=None, batcher=None, cache=None, gallery=None, hint_stats=None):
+        # Models are shared through the registry and only loaded on first use
+        self.registry = registry or model_registry
+        self.batcher = batcher if batcher is not None else get_embedding_batcher()
+        self.cache = cache or embedding_cache
+        self.gallery = gallery if gallery is not None else gallery_index
+        self.hint_stats = hint_stats or face_hint_stats
+        self.device = get_device()
         self.match_threshold = Config.FACE_MATCH_THRESHOLD
+        self.detect_short_side = Config.FACE_DETECT_SHORT_SIDE
+        self.hints_enabled = Config.FACE_HINT_ENABLED
+        self.hint_padding = Config.FACE_HINT_PADDING
+        self.hint_count_short_side = Config.FACE_HINT_COUNT_SHORT_SIDE
+
+    @property
+    def mtcnn(self):
+        return self.registry.get('mtcnn')
+
+    @property
+    def mtcnn_multi(self):
+        return self.registry.get('mtcnn_multi')
+
+    @property
+    def resnet(self):
+        return self.registry.get('resnet')
 
     def capture_face_embeddings(self, video_source=0, duration=None, fps=None):
         """
@@ -29,7 +56,7 @@ class FaceRecognitionService:
             fps: Frames per second to capture (from Config if None)
 
         Returns:
-            numpy.ndarray: Averaged facial embedding (128-dimensional)
+            numpy.ndarray: Averaged facial embedding (512-dimensional)
         """
         duration = duration or Config.FACE_CAPTURE_DURATION
         fps = fps or Config.FACE_CAPTURE_FPS
@@ -55,9 +82,7 @@ class FaceRecognitionService:
                 face = self.mtcnn(rgb)
 
                 if face is not None:
-                    with torch.no_grad():
-                        emb = self.resnet(face.unsqueeze(0).to(self.device))
-                        embeddings.append(emb.cpu().numpy().flatten())
+                    embeddings.append(self._embed(face.unsqueeze(0)).flatten())
 
             count += 1
 
@@ -74,21 +99,290 @@ class FaceRecognitionService:
         Migrated from authenticate_user.py
 
         Args:
-            frame: BGR image from OpenCV
+            frame: BGR image from OpenCV or FrameContext
 
         Returns:
-            numpy.ndarray: 128-dimensional facial embedding
+            numpy.ndarray: 512-dimensional facial embedding
         """
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face = self.mtcnn(rgb)
+        face = self._detect_primary(frame)
 
         if face is None:
             raise ValueError("No face detected in frame")
 
-        with torch.no_grad():
-            emb = self.resnet(face.unsqueeze(0).to(self.device))
+        return self._embed(face.unsqueeze(0)).flatten()
+
+    def detect_and_embed(self, frame, hint=None):
+        """
+        Detect every face in a frame and embed the primary one in a single pass.
+        Replaces calling detect_multiple_faces and get_embedding_from_frame
+        on the same frame.
+
+        With a client face-box hint a padded region around it is searched at
+        full resolution, falling back to the whole frame if no face is found
+        there. Faces outside that region are still counted by a cheap pass
+        over the whole frame at FACE_HINT_COUNT_SHORT_SIDE, so the hint cannot
+        hide a second person from the multi-face check.
+
+        Args:
+            frame: BGR image from OpenCV or FrameContext
+            hint: Optional (x1, y1, x2, y2) face box as fractions of frame width and height
+
+        Returns:
+            dict: {'face_count': int, 'boxes': ndarray or None, 'probs': ndarray or None,
+                   'primary_index': int or None, 'embedding': ndarray or None,
+                   'hint': 'hint_used', 'hint_fallback', 'hint_invalid' or 'no_hint'}
+        """
+        frame = FrameContext.wrap(frame)
+        boxes, probs, outcome = self._detect_hinted(frame, hint)
+
+        if boxes is None:
+            return {
+                'face_count': 0,
+                'boxes': None,
+                'probs': None,
+                'primary_index': None,
+                'embedding': None,
+                'hint': outcome
+            }
+
+        # Primary face is the largest box, matching the single-face MTCNN selection
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        primary_index = int(np.argmax(areas))
+
+        face = self.mtcnn_multi.extract(frame.rgb, boxes[primary_index:primary_index + 1], None)
+        emb = self._embed(face)
+
+        return {
+            'face_count': len(boxes),
+            'boxes': boxes,
+            'probs': probs,
+            'primary_index': primary_index,
+            'embedding': emb[0].flatten(),
+            'hint': outcome
+        }
+
+    def _detect_hinted(self, frame, hint):
+        """Run the multi-face detector on the hint region first, then the full frame"""
+        if hint is None or not self.hints_enabled:
+            outcome = 'no_hint'
+        else:
+            roi = hint_roi(frame.shape, hint, self.hint_padding)
+            if roi is None:
+                outcome = 'hint_invalid'
+            else:
+                boxes, probs = self.mtcnn_multi.detect(frame.crop(roi))
+                if boxes is not None:
+                    self.hint_stats.record('hint_used')
+                    boxes = boxes + np.array(roi[:2] * 2, dtype=boxes.dtype)
+                    boxes, probs = self._add_faces_outside(frame, roi, boxes, probs)
+                    return boxes, probs, 'hint_used'
+                outcome = 'hint_fallback'
+
+        self.hint_stats.record(outcome)
+        boxes, probs = self._detect(frame, self.mtcnn_multi)
+        return boxes, probs, outcome
+
+    def _add_faces_outside(self, frame, roi, boxes, probs):
+        """
+        Append faces a low-resolution whole-frame pass finds outside the hint region.
+
+        Args:
+            frame: FrameContext
+            roi: (x1, y1, x2, y2) hint region in frame pixels
+            boxes, probs: Detections inside the region, in frame pixels
+
+        Returns:
+            tuple: (boxes, probs) covering the whole frame
+        """
+        others, other_probs = self._detect(frame, self.mtcnn_multi, self.hint_count_short_side)
+        if others is None:
+            return boxes, probs
+
+        # Faces centred inside the region were already found at full resolution
+        cx, cy = (others[:, 0] + others[:, 2]) / 2, (others[:, 1] + others[:, 3]) / 2
+        outside = (cx < roi[0]) | (cx >= roi[2]) | (cy < roi[1]) | (cy >= roi[3])
+        if not outside.any():
+            return boxes, probs
+        return (np.concatenate([boxes, others[outside].astype(boxes.dtype)]),
+                np.concatenate([probs, other_probs[outside]]))
+
+    def get_embeddings_from_frames(self, frames, batch_detect=None, deduplicate=None):
+        """
+        Extract facial embeddings from many frames with one batched forward pass.
+        Every accepted crop goes through the embedder together. Detection is
+        only batched on GPU; on CPU the stacked MTCNN pyramid is slower than
+        detecting frame by frame.
+
+        Args:
+            frames: List of BGR images or FrameContexts (None entries are rejected)
+            batch_detect: Run MTCNN over all frames at once (defaults to GPU only)
+            deduplicate: Reject near-identical consecutive frames before detection
+                         (defaults to FRAME_DEDUP_ENABLED)
+
+        Returns:
+            dict: {'embeddings': ndarray (n, 512), 'accepted': list of frame indices,
+                   'rejected': list of {'index': int, 'reason': str}}
+        """
+        if deduplicate is None:
+            deduplicate = Config.FRAME_DEDUP_ENABLED
+        dedup = NearDuplicateFilter() if deduplicate else None
+
+        rejected = []
+        indices = []
+        contexts = []
+        for i, frame in enumerate(frames):
+            if frame is None:
+                rejected.append({'index': i, 'reason': 'decode_failed'})
+                continue
+            if dedup is not None and dedup.is_duplicate(frame):
+                rejected.append({'index': i, 'reason': 'duplicate'})
+                continue
+            indices.append(i)
+            contexts.append(FrameContext.wrap(frame))
+
+        if dedup is not None:
+            logger.info(f"Registration frames: {dedup.dropped} of {len(frames)} dropped as near-duplicates")
+
+        if batch_detect is None:
+            # Downscaled detection maps boxes per frame, so it never stacks frames
+            batch_detect = self.device == 'cuda' and not self.detect_short_side
+
+        faces = None
+        if batch_detect and contexts and len({ctx.shape for ctx in contexts}) == 1:
+            try:
+                faces = self.mtcnn([ctx.rgb for ctx in contexts])
+            except ValueError as e:
+                # facenet-pytorch cannot stack ragged box lists on newer numpy
+                logger.warning(f"Batched face detection failed, detecting per frame: {e}")
+
+        if faces is None:
+            faces = [self._detect_primary(ctx) for ctx in contexts]
+
+        accepted = []
+        crops = []
+        for i, face in zip(indices, faces):
+            if face is None:
+                rejected.append({'index': i, 'reason': 'no_face'})
+            else:
+                accepted.append(i)
+                crops.append(face)
+
+        if not crops:
+            return {'embeddings': np.empty((0, 512), dtype=np.float32), 'accepted': [], 'rejected': rejected}
+
+        rejected.sort(key=lambda r: r['index'])
+        return {
+            'embeddings': self._embed_batch(torch.stack(crops)),
+            'accepted': accepted,
+            'rejected': rejected
+        }
+
+    def embed_all_faces(self, frames):
+        """
+        Detect every face in a few wide photos and embed all crops together.
+        Used for classroom group photos, where one batched pass replaces a
+        request per student.
+
+        Args:
+            frames: List of BGR images or FrameContexts (None entries are rejected)
+
+        Returns:
+            dict: {'embeddings': ndarray (n, 512), 'faces': list of {'photo': int, 'box': list, 'prob': float}
+                   in embedding order, 'rejected': list of {'index': int, 'reason': str}}
+        """
+        faces = []
+        crops = []
+        rejected = []
+        for i, frame in enumerate(frames):
+            if frame is None:
+                rejected.append({'index': i, 'reason': 'decode_failed'})
+                continue
+
+            # Classroom faces are small, so group photos are always searched at full size
+            rgb = FrameContext.wrap(frame).rgb
+            boxes, probs = self.mtcnn_multi.detect(rgb)
+            if boxes is None:
+                rejected.append({'index': i, 'reason': 'no_face'})
+                continue
+
+            crops.append(self.mtcnn_multi.extract(rgb, boxes, None))
+            faces.extend({'photo': i, 'box': [float(v) for v in box], 'prob': float(prob)}
+                         for box, prob in zip(boxes, probs))
+
+        if not crops:
+            return {'embeddings': np.empty((0, 512), dtype=np.float32), 'faces': [], 'rejected': rejected}
+
+        return {
+            'embeddings': self._embed_batch(torch.cat(crops)),
+            'faces': faces,
+            'rejected': rejected
+        }
+
+    def _detect_scale(self, shape, short_side=None):
+        """Resize factor that brings a frame's short side down to short_side (FACE_DETECT_SHORT_SIDE if None)"""
+        if short_side is None:
+            short_side = self.detect_short_side
+        if not short_side:
+            return 1.0
+        return min(1.0, short_side / min(shape[:2]))
+
+    def _detect(self, frame, detector, short_side=None):
+        """
+        Run an MTCNN's detect() at the configured detection resolution.
+        The P-Net pyramid cost grows with frame area, so large frames are
+        searched on a downscaled copy and the boxes mapped back to full-frame
+        pixels, where the crops are then taken at full resolution.
+
+        Args:
+            frame: FrameContext
+            detector: MTCNN whose detect() to run
+            short_side: Detection short side in pixels, 0 for full size (FACE_DETECT_SHORT_SIDE if None)
+
+        Returns:
+            tuple: (boxes in full-frame pixels or None, probs or None)
+        """
+        scale = self._detect_scale(frame.shape, short_side)
+        if scale >= 1.0:
+            return detector.detect(frame.rgb)
+
+        boxes, probs = detector.detect(frame.resized(scale))
+        if boxes is not None:
+            boxes = boxes / scale
+        return boxes, probs
+
+    def _detect_primary(self, frame):
+        """
+        Detect and crop the primary face like the single-face MTCNN's __call__.
 
-        return emb.cpu().numpy().flatten()
+        Args:
+            frame: BGR image from OpenCV or FrameContext
+
+        Returns:
+            torch.Tensor: (3, 160, 160) face crop, or None if no face was found
+        """
+        frame = FrameContext.wrap(frame)
+        if self._detect_scale(frame.shape) >= 1.0:
+            return self.mtcnn(frame.rgb)
+
+        # detect() orders boxes largest first, which extract() picks for keep_all=False
+        boxes, _ = self._detect(frame, self.mtcnn)
+        if boxes is None:
+            return None
+        return self.mtcnn.extract(frame.rgb, boxes, None)
+
+    def _embed_batch(self, faces):
+        """Embed any number of face crops in chunks of FACE_EMBED_BATCH_SIZE"""
+        batch_size = Config.FACE_EMBED_BATCH_SIZE
+        return np.concatenate([self._embed(faces[start:start + batch_size])
+                               for start in range(0, len(faces), batch_size)])
+
+    def _embed(self, faces):
+        """Embed a (n, 3, 160, 160) batch of face crops, via the shared batcher when enabled"""
+        if self.batcher is not None:
+            return self.batcher.embed(faces)
+
+        with torch.no_grad():
+            return self.resnet(faces.to(self.device)).cpu().numpy()
 
     def register_user_face(self, user_id, embedding):
         """
@@ -97,45 +391,89 @@ class FaceRecognitionService:
 
         Args:
             user_id: User database ID
-            embedding: 128-dimensional numpy array
+            embedding: 512-dimensional numpy array
 
         Returns:
             FaceEmbedding: Database record
         """
+        # Only patch the gallery in place if it already matched the database
+        gallery_current = self.gallery.loaded and not self.gallery.is_stale()
+        count_before, latest_before = self.gallery.version if gallery_current else (None, None)
+
         # Check if user already has embedding
         existing = FaceEmbedding.query.filter_by(user_id=user_id).first()
 
         if existing:
             existing.embedding = embedding
-            existing.updated_at = db.func.now()
-            db.session.commit()
-            return existing
+            # Python timestamp keeps sub-second precision for cache version checks
+            existing.updated_at = datetime.utcnow()
+            face_emb = existing
         else:
             face_emb = FaceEmbedding(user_id=user_id, embedding=embedding)
             db.session.add(face_emb)
-            db.session.commit()
-            return face_emb
+
+        db.session.commit()
+
+        # Write through so this worker's next verify is a cache hit
+        self.cache.put(user_id, (face_emb.id, face_emb.updated_at), embedding)
+
+        if gallery_current:
+            # Other workers may have committed templates since the staleness check,
+            # so only patch in place if this row is the database's sole change
+            expected = (count_before + (0 if existing else 1),
+                        max(t for t in (latest_before, face_emb.updated_at) if t is not None))
+            if self.gallery.db_version() == expected:
+                self.gallery.version = expected
+                self.gallery.add_or_update(user_id, embedding)
+            else:
+                # Rebuilt from the database on the next identification
+                self.gallery.loaded = False
+        return face_emb
+
+    def identify_face(self, probe_embeddings, k=1, candidates=None):
+        """
+        Identify who one or many probe embeddings belong to (1:N matching).
+        The gallery is rebuilt from the database when its rows changed elsewhere.
+
+        Args:
+            probe_embeddings: Embedding (512,) or array of embeddings (m, 512)
+            k: Number of candidates per probe
+            candidates: Optional collection of user IDs allowed to match
+
+        Returns:
+            list: Per probe, nearest-first list of {'user_id', 'distance', 'match'}
+        """
+        if self.gallery.is_stale():
+            self.gallery.load_from_db()
+
+        return [
+            [{'user_id': user_id, 'distance': distance, 'match': distance < self.match_threshold}
+             for user_id, distance in matches]
+            for matches in self.gallery.search(probe_embeddings, k, candidates)
+        ]
 
     def verify_face(self, user_id, probe_embedding):
         """
         Verify a face against stored embedding for a user.
         Migrated from authenticate_user.py matching logic.
+        Both embeddings are unit-normalised first, so the distance is the
+        one identify_face reports and the same threshold means the same thing.
 
         Args:
             user_id: User database ID
-            probe_embedding: 128-dimensional numpy array from captured frame
+            probe_embedding: 512-dimensional numpy array from captured frame
 
         Returns:
             tuple: (match_found: bool, distance: float)
         """
-        face_record = FaceEmbedding.query.filter_by(user_id=user_id).first()
+        stored_embedding = self._load_template(user_id)
 
-        if not face_record:
+        if stored_embedding is None:
             logger.warning(f"No face record found for user {user_id}")
             return False, float('inf')
 
-        stored_embedding = face_record.embedding
-        distance = np.linalg.norm(stored_embedding - probe_embedding)
+        # Stored templates are averages of unit embeddings and slightly shorter than 1
+        distance = np.linalg.norm(normalize_embeddings(stored_embedding) - normalize_embeddings(probe_embedding))
 
         match_found = distance < self.match_threshold
         
@@ -143,22 +481,53 @@ class FaceRecognitionService:
         
         return bool(match_found), float(distance)
 
+    def _load_template(self, user_id):
+        """
+        Load a user's stored template, decoding it only when the cached copy is stale.
+        The version lookup reads only row metadata, so other workers'
+        re-registrations invalidate this worker's cache without a broadcast.
+
+        Args:
+            user_id: User database ID
+
+        Returns:
+            numpy.ndarray: float32 template, or None if the user has none
+        """
+        row = db.session.query(FaceEmbedding.id, FaceEmbedding.updated_at, FaceEmbedding.model_version)\
+            .filter_by(user_id=user_id)\
+            .first()
+
+        if row is None:
+            self.cache.invalidate(user_id)
+            return None
+
+        if row.model_version != Config.FACE_MODEL_VERSION:
+            # Distances between embeddings from different models are meaningless
+            logger.warning(f"Template for user {user_id} was made by {row.model_version}, re-registration required")
+            self.cache.invalidate(user_id)
+            return None
+
+        version = (row.id, row.updated_at)
+        template = self.cache.get(user_id, version)
+        if template is not None:
+            return template
+
+        face_record = FaceEmbedding.query.get(version[0])
+        return self.cache.put(user_id, version, face_record.embedding)
+
     def detect_multiple_faces(self, frame):
         """
         Detect if multiple faces are present in frame.
         Part of proxy detection system.
 
         Args:
-            frame: BGR image from OpenCV
+            frame: BGR image from OpenCV or FrameContext
 
         Returns:
             int: Number of faces detected
         """
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Use MTCNN with keep_all=True to detect all faces
-        mtcnn_multi = MTCNN(image_size=160, margin=0, keep_all=True, device=self.device)
-        boxes, _ = mtcnn_multi.detect(rgb)
+        # Use the shared keep_all=True detector to find all faces
+        boxes, _ = self._detect(FrameContext.wrap(frame), self.mtcnn_multi)
 
         if boxes is None:
             return 0
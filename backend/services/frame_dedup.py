@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+from backend.config import Config
+from backend.utils.frame_context import FrameContext
+
+
+class NearDuplicateFilter:
+    def __init__(self, threshold=None, max_gap=None, size=32):
+        """
+        Flags frames that are near-identical to the last kept frame.
+        Frames are compared as small grayscale thumbnails using the largest
+        per-cell change, so a local change such as a blink is not averaged
+        away. At most max_gap - 1 frames in a row are ever flagged, which
+        keeps a minimum temporal coverage of the sequence.
+
+        Args:
+            threshold: Largest per-cell gray-level change still counted as a duplicate
+            max_gap: Keep at least one frame in every max_gap consecutive frames
+            size: Thumbnail side in pixels
+        """
+        self.threshold = Config.FRAME_DEDUP_THRESHOLD if threshold is None else threshold
+        self.max_gap = Config.FRAME_DEDUP_MAX_GAP if max_gap is None else max_gap
+        self.size = size
+        self.kept = 0
+        self.dropped = 0
+        self._last = None
+        self._since_kept = 0
+
+    def signature(self, frame):
+        """Grayscale thumbnail of a BGR image or FrameContext"""
+        bgr = frame.bgr if isinstance(frame, FrameContext) else frame
+        small = cv2.resize(bgr, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def is_duplicate(self, frame):
+        """
+        Check the next frame of the sequence and remember it if kept.
+
+        Args:
+            frame: BGR image or FrameContext
+
+        Returns:
+            bool: True if the frame adds nothing over the last kept frame
+        """
+        signature = self.signature(frame)
+        self._since_kept += 1
+        if (self._last is not None and self._since_kept < self.max_gap
+                and np.abs(signature - self._last).max() <= self.threshold):
+            self.dropped += 1
+            return True
+
+        self._last = signature
+        self._since_kept = 0
+        self.kept += 1
+        return False
+
+    def stats(self):
+        return {'frames_kept': self.kept, 'frames_dropped': self.dropped}
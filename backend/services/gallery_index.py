@@ -0,0 +1,364 @@
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from backend.config import Config
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev servers only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_embeddings(vectors):
+    """Scale embeddings to unit length along the last axis, as float32"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class GalleryIndex:
+    def __init__(self, dim=512):
+        """
+        In-memory 1:N index over every enrolled face template.
+        Templates live in one contiguous L2-normalised float32 matrix so a
+        batch of probes is scored against the whole gallery with a single
+        matrix multiply.
+
+        Args:
+            dim: Embedding dimension
+        """
+        self.dim = dim
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._user_ids = np.empty(0, dtype=np.int64)
+        self._rows = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.version = None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def build(self, user_ids, embeddings, version=None):
+        """
+        Replace the whole gallery.
+
+        Args:
+            user_ids: Sequence of user IDs
+            embeddings: Array (n, dim) of templates in the same order
+            version: Opaque marker of the data the gallery was built from
+        """
+        matrix = normalize_embeddings(embeddings).reshape(-1, self.dim) if len(user_ids) else np.empty((0, self.dim), np.float32)
+        with self._lock:
+            self._matrix = np.ascontiguousarray(matrix)
+            self._user_ids = np.asarray(user_ids, dtype=np.int64)
+            self._rows = {int(uid): i for i, uid in enumerate(self._user_ids)}
+            self._size = len(self._user_ids)
+            self.loaded = True
+            self.version = version
+
+    def load_from_db(self):
+        """Build the gallery from every FaceEmbedding row made by the current model"""
+        from backend.models import FaceEmbedding
+
+        # Read the version first: a commit landing during the query then shows as stale
+        version = self.db_version()
+        records = FaceEmbedding.query.filter_by(model_version=Config.FACE_MODEL_VERSION).all()
+        records = [r for r in records if r.dim == self.dim]
+        embeddings = np.stack([r.embedding for r in records]) if records else np.empty((0, self.dim))
+        self.build([r.user_id for r in records], embeddings, version=version)
+        logger.info(f"Gallery index loaded with {len(records)} templates")
+
+    @staticmethod
+    def db_version():
+        """Cheap marker that changes whenever templates are added, updated or removed"""
+        from backend.models import db, FaceEmbedding
+
+        count, latest = db.session.query(db.func.count(FaceEmbedding.id),
+                                         db.func.max(FaceEmbedding.updated_at)).one()
+        return (count, latest)
+
+    def is_stale(self):
+        return not self.loaded or self.version != self.db_version()
+
+    def add_or_update(self, user_id, embedding):
+        """Insert or replace one user's template without rebuilding the matrix"""
+        vector = normalize_embeddings(np.asarray(embedding).reshape(-1))
+        if vector.size != self.dim:
+            raise ValueError(f"Embedding has {vector.size} values, expected {self.dim}")
+
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                if self._size == len(self._matrix):
+                    capacity = max(16, 2 * len(self._matrix))
+                    matrix = np.empty((capacity, self.dim), dtype=np.float32)
+                    matrix[:self._size] = self._matrix[:self._size]
+                    user_ids = np.empty(capacity, dtype=np.int64)
+                    user_ids[:self._size] = self._user_ids[:self._size]
+                    self._matrix, self._user_ids = matrix, user_ids
+                row = self._size
+                self._rows[user_id] = row
+                self._user_ids[row] = user_id
+                self._size += 1
+            self._matrix[row] = vector
+
+    def remove(self, user_id):
+        """Drop a user's template by moving the last row into its slot"""
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                moved = int(self._user_ids[last])
+                self._user_ids[row] = moved
+                self._rows[moved] = row
+            self._size = last
+            return True
+
+    def search(self, probes, k=1, candidates=None):
+        """
+        Find the k nearest enrolled users for one or many probes.
+
+        Args:
+            probes: Embedding (dim,) or array of embeddings (m, dim)
+            k: Number of neighbours per probe
+            candidates: Optional collection of user IDs to restrict the search to
+
+        Returns:
+            list: Per probe, a list of (user_id, distance) sorted by distance.
+                  Distance is Euclidean between unit-normalised embeddings.
+        """
+        probes = normalize_embeddings(np.asarray(probes).reshape(-1, self.dim))
+
+        with self._lock:
+            size = self._size
+            matrix = self._matrix[:size]
+            user_ids = self._user_ids[:size].copy()
+            if size == 0:
+                return [[] for _ in probes]
+            similarities = probes @ matrix.T
+
+        if candidates is not None:
+            allowed = np.isin(user_ids, np.fromiter(candidates, dtype=np.int64))
+            similarities[:, ~allowed] = -np.inf
+            k = min(k, int(allowed.sum()))
+            if k == 0:
+                return [[] for _ in probes]
+
+        k = min(k, size)
+        if k < size:
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(size), (len(probes), 1))
+        top_sims = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        distances = np.sqrt(np.maximum(2.0 - 2.0 * np.take_along_axis(top_sims, order, axis=1), 0.0))
+
+        return [
+            [(int(user_ids[j]), float(d)) for j, d in zip(row, row_distances)]
+            for row, row_distances in zip(top, distances)
+        ]
+
+
+# Shared gallery file layout: fixed header, int64 user IDs, then the float32
+# matrix starting on a 64-byte boundary. All values are little-endian.
+_MAGIC = b'PGAL'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sIQIIq32s64s')
+_HEADER_SIZE = 256
+
+
+def _matrix_offset(count):
+    return _HEADER_SIZE + (count * 8 + 63) // 64 * 64
+
+
+def _parse_header(raw):
+    if len(raw) < _HEADER.size:
+        return None
+    magic, fmt, generation, dim, count, db_count, db_latest, model_version = _HEADER.unpack_from(raw)
+    if magic != _MAGIC or fmt != _FORMAT_VERSION:
+        return None
+
+    db_latest = db_latest.rstrip(b'\0').decode()
+    return {
+        'generation': generation,
+        'dim': dim,
+        'count': count,
+        'db_version': (db_count, datetime.fromisoformat(db_latest) if db_latest else None),
+        'model_version': model_version.rstrip(b'\0').decode()
+    }
+
+
+class SharedGalleryIndex(GalleryIndex):
+    def __init__(self, path, dim=512):
+        """
+        Gallery backed by a memory-mapped file shared by every worker on a host.
+        One worker builds the file from the database; the others map it
+        read-only and zero-copy. Each rewrite bumps a generation counter in the
+        header so workers remap after enrollments elsewhere.
+
+        Args:
+            path: Gallery file location
+            dim: Embedding dimension
+        """
+        super().__init__(dim=dim)
+        self.path = path
+        self.generation = None
+        self._mmap = None
+
+    def read_header(self):
+        """
+        Read the gallery file header.
+
+        Returns:
+            dict: generation, dim, count, db_version and model_version, or None if
+                  the file is missing or not a gallery file
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                return _parse_header(f.read(_HEADER.size))
+        except FileNotFoundError:
+            return None
+
+    def is_stale(self):
+        if not self.loaded:
+            return True
+        header = self.read_header()
+        if header is None or header['generation'] != self.generation:
+            return True
+        return self.version != self.db_version()
+
+    def load_from_db(self):
+        """Map the shared file if it matches the database, otherwise rebuild and publish it"""
+        if self._file_matches_db(self.read_header()):
+            self._map()
+            return
+
+        with self._publish_lock():
+            # Another worker may have published while we waited for the lock
+            header = self.read_header()
+            if not self._file_matches_db(header):
+                super().load_from_db()
+                self._write(header)
+        self._map()
+
+    def _file_matches_db(self, header):
+        return (header is not None
+                and header['dim'] == self.dim
+                and header['model_version'] == Config.FACE_MODEL_VERSION
+                and header['db_version'] == self.db_version())
+
+    def add_or_update(self, user_id, embedding):
+        self._detach()
+        super().add_or_update(user_id, embedding)
+        self.publish()
+
+    def remove(self, user_id):
+        self._detach()
+        removed = super().remove(user_id)
+        if removed:
+            self.publish()
+        return removed
+
+    def publish(self):
+        """
+        Write this worker's gallery to the shared file and map the new generation.
+        If another worker published since this one last mapped the file, the
+        private copy lacks its changes, so the gallery is rebuilt from the
+        database instead.
+        """
+        with self._publish_lock():
+            header = self.read_header()
+            if header is not None and header['generation'] != self.generation:
+                GalleryIndex.load_from_db(self)
+            self._write(header)
+        self._map()
+
+    @contextmanager
+    def _publish_lock(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, previous_header):
+        """Atomically replace the gallery file; caller holds the publish lock"""
+        with self._lock:
+            size = self._size
+            user_ids = self._user_ids[:size].astype('<i8')
+            matrix = np.ascontiguousarray(self._matrix[:size], dtype='<f4')
+            # Stamp the version the templates were built from; an unknown
+            # version never matches the database, so readers rebuild
+            db_count, db_latest = self.version or (-1, None)
+
+        generation = previous_header['generation'] + 1 if previous_header else 1
+        header = _HEADER.pack(
+            _MAGIC, _FORMAT_VERSION, generation, self.dim, size, db_count,
+            db_latest.isoformat().encode() if db_latest else b'',
+            Config.FACE_MODEL_VERSION.encode()
+        )
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header.ljust(_HEADER_SIZE, b'\0'))
+            f.write(user_ids.tobytes())
+            f.seek(_matrix_offset(size))
+            f.write(matrix.tobytes())
+        os.replace(tmp_path, self.path)
+        logger.info(f"Published shared gallery generation {generation} with {size} templates")
+
+    def _map(self):
+        """Point the index at the current file without copying the templates"""
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = _parse_header(mapped[:_HEADER.size])
+        count = header['count']
+        user_ids = np.frombuffer(mapped, dtype='<i8', count=count, offset=_HEADER_SIZE)
+        matrix = np.frombuffer(mapped, dtype='<f4', count=count * self.dim,
+                               offset=_matrix_offset(count)).reshape(count, self.dim)
+
+        with self._lock:
+            # Old mappings are left to the garbage collector; searches may still hold views
+            self._mmap = mapped
+            self._matrix = matrix
+            self._user_ids = user_ids
+            self._rows = {int(uid): i for i, uid in enumerate(user_ids)}
+            self._size = count
+            self.loaded = True
+            self.version = header['db_version']
+            self.generation = header['generation']
+
+    def _detach(self):
+        """Copy the mapped templates into private memory before an in-place change"""
+        with self._lock:
+            if self._mmap is not None:
+                self._matrix = self._matrix[:self._size].copy()
+                self._user_ids = self._user_ids[:self._size].copy()
+                self._mmap = None
+
+
+# Process-wide gallery, loaded from the database on first identification
+if Config.GALLERY_MMAP_PATH:
+    gallery_index = SharedGalleryIndex(Config.GALLERY_MMAP_PATH)
+else:
+    gallery_index = GalleryIndex()
@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+import numpy as np
+import torch
+from backend.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    def __init__(self, model_getter, device='cpu', max_batch_size=None, max_wait_ms=None):
+        """
+        Collect face crops from concurrent requests and embed them together.
+
+        Args:
+            model_getter: Zero-argument callable returning the embedding model
+            device: Torch device the model runs on
+            max_batch_size: Largest number of crops per forward pass (from Config if None)
+            max_wait_ms: Longest time the first crop waits for others (from Config if None)
+        """
+        self.model_getter = model_getter
+        self.device = device
+        self.max_batch_size = max_batch_size or Config.FACE_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else Config.FACE_BATCH_MAX_WAIT_MS) / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_delays = deque(maxlen=1000)
+        self._requests = 0
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        if not self.is_running():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def embed(self, faces, timeout=30.0):
+        """
+        Embed face crops, sharing a forward pass with other waiting callers.
+
+        Args:
+            faces: Tensor of face crops shaped (n, 3, 160, 160)
+            timeout: Seconds to wait for the result
+
+        Returns:
+            numpy.ndarray: Embeddings shaped (n, 512)
+        """
+        self.start()
+        future = Future()
+        self._queue.put((faces, time.perf_counter(), future))
+        return future.result(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def metrics(self):
+        """
+        Report batching behaviour since start.
+
+        Returns:
+            dict: Request/batch counts, batch-size histogram and queueing delay in ms
+        """
+        with self._metrics_lock:
+            delays = np.array(self._queue_delays) * 1000
+            histogram = dict(sorted(self._batch_sizes.items()))
+            requests = self._requests
+
+        return {
+            'requests': requests,
+            'batches': sum(histogram.values()),
+            'batch_size_histogram': histogram,
+            'queue_depth': self.queue_depth(),
+            'queue_delay_ms': {
+                'mean': float(delays.mean()) if len(delays) else None,
+                'p50': float(np.percentile(delays, 50)) if len(delays) else None,
+                'p95': float(np.percentile(delays, 95)) if len(delays) else None,
+                'max': float(delays.max()) if len(delays) else None
+            }
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+
+            while rows < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        futures = [future for _, _, future in batch]
+
+        try:
+            faces = torch.cat([faces for faces, _, _ in batch])
+            with torch.no_grad():
+                embeddings = self.model_getter()(faces.to(self.device)).cpu().numpy()
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} requests failed: {e}")
+            for future in futures:
+                future.set_exception(e)
+            embeddings = None
+
+        with self._metrics_lock:
+            self._requests += len(batch)
+            self._batch_sizes[sum(len(faces) for faces, _, _ in batch)] += 1
+            self._queue_delays.extend(started - enqueued for _, enqueued, _ in batch)
+
+        if embeddings is None:
+            return
+
+        offset = 0
+        for faces, _, future in batch:
+            future.set_result(embeddings[offset:offset + len(faces)])
+            offset += len(faces)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher():
+    """
+    Return the process-wide embedding batcher.
+
+    Returns:
+        EmbeddingBatcher: Shared batcher, or None when FACE_BATCHING_ENABLED is off
+    """
+    global _batcher
+
+    if not Config.FACE_BATCHING_ENABLED:
+        return None
+
+    from backend.services.model_registry import registry, get_device
+
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = EmbeddingBatcher(lambda: registry.get('resnet'), device=get_device())
+        return _batcher
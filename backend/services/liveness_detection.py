@@ -1,75 +1,148 @@
-import cv2
 import numpy as np
-import mediapipe as mp
-from scipy.spatial import distance as dist
+from backend.config import Config
+from backend.services.model_registry import registry as model_registry
+from backend.services.frame_dedup import NearDuplicateFilter
+from backend.utils.frame_context import FrameContext
+import logging
+
+logger = logging.getLogger(__name__)
 
 class LivenessDetectionService:
-    def __init__(self):
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+    def __init__(self, registry=None):
+        # FaceMesh graphs are pooled through the registry and only built on first use
+        self.registry = registry or model_registry
 
         # Eye landmarks for blink detection
         self.LEFT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
         self.RIGHT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
 
+        # Only these landmarks are copied out of each FaceMesh result:
+        # columns 0-5 left eye, 6-11 right eye, 12 nose tip, 13 chin
+        self.LANDMARK_INDICES = self.LEFT_EYE_INDICES + self.RIGHT_EYE_INDICES + [1, 152]
+
         # EAR threshold
         self.EAR_THRESHOLD = 0.25
         self.BLINK_FRAMES = 3
 
-    def calculate_ear(self, eye_landmarks):
-        """Calculate Eye Aspect Ratio"""
-        # Vertical distances
-        A = dist.euclidean(eye_landmarks[1], eye_landmarks[5])
-        B = dist.euclidean(eye_landmarks[2], eye_landmarks[4])
+        # Nose offset from the eye midpoint (pixels) below which the head faces the camera
+        self.HEAD_CENTER_TOLERANCE = 10
 
-        # Horizontal distance
-        C = dist.euclidean(eye_landmarks[0], eye_landmarks[3])
+        # Challenge sequences feed FaceMesh a padded crop around the tracked face
+        self.ROI_ENABLED = Config.LIVENESS_ROI_ENABLED
+        self.ROI_PADDING = Config.LIVENESS_ROI_PADDING
 
-        ear = (A + B) / (2.0 * C)
-        return ear
+        # Near-identical consecutive frames reuse the previous landmarks instead of running FaceMesh
+        self.DEDUP_ENABLED = Config.FRAME_DEDUP_ENABLED
 
-    def detect_blink(self, frame):
+    @property
+    def face_mesh_pool(self):
+        return self.registry.get('face_mesh_pool')
+
+    def extract_landmarks(self, frames, face_mesh=None, tracker=None):
         """
-        Detect eye blink in frame using Eye Aspect Ratio.
+        Run FaceMesh once per frame and collect the landmarks used by the checks.
+        Results are cached on FrameContexts, so later checks on the same
+        frame do not run FaceMesh again.
 
         Args:
-            frame: BGR image from OpenCV
+            frames: List of BGR images or FrameContexts
+            face_mesh: Graph already checked out by the caller (borrowed from the pool if None)
+            tracker: FaceROITracker to crop consecutive frames around the face (optional)
 
         Returns:
-            dict: {'blink_detected': bool, 'ear': float}
+            numpy.ndarray: (n, len(LANDMARK_INDICES), 2) pixel coordinates, NaN where no face was found
         """
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb)
-
+        key = ('face_mesh_landmarks',)
+        if face_mesh is None and not all(isinstance(frame, FrameContext) and frame.is_cached(key)
+                                         for frame in frames):
+            with self.face_mesh_pool.checkout() as face_mesh:
+                return self.extract_landmarks(frames, face_mesh, tracker)
+
+        points = np.full((len(frames), len(self.LANDMARK_INDICES), 2), np.nan, dtype=np.float32)
+        for i, frame in enumerate(frames):
+            # Wrap one frame at a time so plain arrays do not keep every RGB copy alive
+            frame = FrameContext.wrap(frame)
+            points[i] = frame.cached(key, lambda: self._frame_landmarks(frame, face_mesh, tracker))
+        return points
+
+    def _frame_landmarks(self, frame, face_mesh, tracker=None):
+        points = None
+        box = tracker.roi(frame.shape) if tracker is not None else None
+        if box is not None:
+            points = self._process(face_mesh, frame.crop(box), origin=box[:2])
+        found_in_roi = points is not None
+        if points is None:
+            # No ROI yet, or the face left it: search the whole frame
+            points = self._process(face_mesh, frame.rgb, origin=(0, 0))
+
+        if tracker is not None:
+            tracker.update(points, found_in_roi)
+        if points is None:
+            return np.full((len(self.LANDMARK_INDICES), 2), np.nan, dtype=np.float32)
+        return points
+
+    def _process(self, face_mesh, rgb, origin):
+        """Run FaceMesh on an image and map the landmarks to full-frame pixels"""
+        results = face_mesh.process(rgb)
         if not results.multi_face_landmarks:
-            return {'blink_detected': False, 'ear': None}
+            return None
 
         landmarks = results.multi_face_landmarks[0].landmark
-        h, w = frame.shape[:2]
+        h, w = rgb.shape[:2]
+        points = np.array([(landmarks[i].x, landmarks[i].y) for i in self.LANDMARK_INDICES], dtype=np.float32)
+        return points * np.array([w, h], dtype=np.float32) + np.array(origin, dtype=np.float32)
 
-        # Get left eye landmarks
-        left_eye = [(landmarks[i].x * w, landmarks[i].y * h)
-                    for i in self.LEFT_EYE_INDICES]
+    def eye_aspect_ratios(self, points):
+        """
+        Average Eye Aspect Ratio of both eyes for every frame.
 
-        # Get right eye landmarks
-        right_eye = [(landmarks[i].x * w, landmarks[i].y * h)
-                     for i in self.RIGHT_EYE_INDICES]
+        Args:
+            points: Array from extract_landmarks
 
-        left_ear = self.calculate_ear(left_eye)
-        right_ear = self.calculate_ear(right_eye)
+        Returns:
+            numpy.ndarray: (n,) EAR per frame, NaN where no face was found
+        """
+        eyes = points[:, :12].reshape(-1, 2, 6, 2)
+
+        # Vertical distances over horizontal distance, for both eyes at once
+        a = np.linalg.norm(eyes[:, :, 1] - eyes[:, :, 5], axis=-1)
+        b = np.linalg.norm(eyes[:, :, 2] - eyes[:, :, 4], axis=-1)
+        c = np.linalg.norm(eyes[:, :, 0] - eyes[:, :, 3], axis=-1)
+
+        return ((a + b) / (2.0 * c)).mean(axis=1)
+
+    def horizontal_offsets(self, points):
+        """
+        Horizontal offset of the nose tip from the midpoint of the outer eye corners.
 
-        avg_ear = (left_ear + right_ear) / 2.0
+        Args:
+            points: Array from extract_landmarks
 
-        blink_detected = avg_ear < self.EAR_THRESHOLD
+        Returns:
+            numpy.ndarray: (n,) offset in pixels, positive when facing right, NaN where no face was found
+        """
+        # Landmark 263 is column 3 (left eye), landmark 33 is column 6 (right eye)
+        eye_center_x = (points[:, 3, 0] + points[:, 6, 0]) / 2
+        return points[:, 12, 0] - eye_center_x
+
+    def detect_blink(self, frame):
+        """
+        Detect eye blink in frame using Eye Aspect Ratio.
+
+        Args:
+            frame: BGR image from OpenCV or FrameContext
+
+        Returns:
+            dict: {'blink_detected': bool, 'ear': float}
+        """
+        ear = self.eye_aspect_ratios(self.extract_landmarks([frame]))[0]
+
+        if np.isnan(ear):
+            return {'blink_detected': False, 'ear': None}
 
         return {
-            'blink_detected': blink_detected,
-            'ear': avg_ear
+            'blink_detected': bool(ear < self.EAR_THRESHOLD),
+            'ear': float(ear)
         }
 
     def detect_head_pose(self, frame):
@@ -77,100 +150,269 @@ class LivenessDetectionService:
         Detect head pose (looking left/right/up/down).
 
         Args:
-            frame: BGR image from OpenCV
+            frame: BGR image from OpenCV or FrameContext
 
         Returns:
             dict: {'direction': str, 'angles': dict}
         """
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb)
+        horizontal_diff = self.horizontal_offsets(self.extract_landmarks([frame]))[0]
 
-        if not results.multi_face_landmarks:
+        if np.isnan(horizontal_diff):
             return {'direction': 'unknown', 'angles': None}
 
-        landmarks = results.multi_face_landmarks[0].landmark
-        h, w = frame.shape[:2]
-
-        # Key landmarks for pose estimation
-        nose_tip = landmarks[1]
-        chin = landmarks[152]
-        left_eye = landmarks[33]
-        right_eye = landmarks[263]
-
-        # Calculate angles (simplified)
-        nose_x = nose_tip.x * w
-        chin_x = chin.x * w
-
-        eye_center_x = ((left_eye.x + right_eye.x) / 2) * w
-
-        # Horizontal direction
-        horizontal_diff = nose_x - eye_center_x
-
-        if abs(horizontal_diff) < 10:
-            direction = 'center'
-        elif horizontal_diff > 0:
-            direction = 'right'
-        else:
-            direction = 'left'
-
         return {
-            'direction': direction,
-            'angles': {'horizontal_diff': horizontal_diff}
+            'direction': self._directions(np.array([horizontal_diff]))[0],
+            'angles': {'horizontal_diff': float(horizontal_diff)}
         }
 
-    def verify_liveness_challenge(self, challenge_type, video_frames):
+    def _directions(self, offsets):
+        return np.select(
+            [np.isnan(offsets), np.abs(offsets) < self.HEAD_CENTER_TOLERANCE, offsets > 0],
+            ['unknown', 'center', 'right'],
+            'left'
+        ).tolist()
+
+    def verify_liveness_challenge(self, challenge_type, video_frames, face_box=None):
         """
         Verify user completed liveness challenge.
+        Frames are evaluated in order and evaluation stops as soon as the
+        verdict can no longer change.
 
         Args:
             challenge_type: 'blink' or 'head_left' or 'head_right'
-            video_frames: List of frames captured during challenge
+            video_frames: List of BGR frames or FrameContexts captured during challenge
+            face_box: (x1, y1, x2, y2) face box from recognition to seed the ROI (optional)
 
         Returns:
             dict: {'success': bool, 'confidence': float, 'details': dict}
         """
+        evaluator = self.create_evaluator(challenge_type, len(video_frames), face_box)
+        if evaluator is None:
+            return {'success': False, 'confidence': 0.0, 'details': {'error': 'Unknown challenge type'}}
+        return self._evaluate(evaluator, video_frames)
+
+    def create_evaluator(self, challenge_type, frames_submitted, face_box=None):
+        """
+        Incremental evaluator for a challenge, or None if the type is unknown.
+
+        Args:
+            challenge_type: 'blink' or 'head_left' or 'head_right'
+            frames_submitted: Number of frames the client sent
+            face_box: Face box to seed the ROI; without one the first frame is searched in full
+
+        Returns:
+            BlinkChallengeEvaluator or HeadMovementEvaluator
+        """
+        tracker = FaceROITracker(self.ROI_PADDING, face_box) if self.ROI_ENABLED else None
+        dedup = NearDuplicateFilter() if self.DEDUP_ENABLED else None
         if challenge_type == 'blink':
-            return self._verify_blink_challenge(video_frames)
+            return BlinkChallengeEvaluator(self, frames_submitted, tracker, dedup)
         elif challenge_type in ['head_left', 'head_right']:
-            return self._verify_head_movement(video_frames, challenge_type)
+            return HeadMovementEvaluator(self, frames_submitted, challenge_type.replace('head_', ''),
+                                         tracker, dedup)
+        return None
+
+    def _evaluate(self, evaluator, frames):
+        if evaluator.decided:
+            return evaluator.result()
+
+        # One graph for the whole sequence, so tracking only ever follows this request's frames
+        with self.face_mesh_pool.checkout() as face_mesh:
+            for frame in frames:
+                if evaluator.decided:
+                    break
+                evaluator.add(frame, face_mesh)
+
+        if evaluator.dedup is not None:
+            logger.info(f"Liveness frames: {evaluator.frames_processed}/{evaluator.frames_submitted} evaluated, "
+                        f"{evaluator.dedup.dropped} near-duplicates skipped FaceMesh")
+        return evaluator.result()
+
+    def _verify_blink_challenge(self, frames, face_box=None):
+        """Verify blink was detected in frame sequence"""
+        return self._evaluate(self.create_evaluator('blink', len(frames), face_box), frames)
+
+    def _verify_head_movement(self, frames, direction, face_box=None):
+        """Verify head moved in specified direction"""
+        return self._evaluate(self.create_evaluator(direction, len(frames), face_box), frames)
+
+
+class FaceROITracker:
+    def __init__(self, padding, seed_box=None):
+        """
+        Follows the face across a challenge sequence so FaceMesh only sees a
+        padded square around it.
+
+        Args:
+            padding: Margin added on each side, as a fraction of the face size
+            seed_box: (x1, y1, x2, y2) initial face box, e.g. from recognition
+        """
+        self.padding = padding
+        self.box = tuple(float(v) for v in seed_box) if seed_box is not None else None
+        self.roi_frames = 0
+        self.full_frames = 0
+
+    def roi(self, frame_shape):
+        """
+        Padded square crop around the last known face, clipped to the frame.
+
+        Args:
+            frame_shape: Shape of the frame to crop
+
+        Returns:
+            tuple: (x1, y1, x2, y2) integer pixels, or None when no face is tracked
+        """
+        if self.box is None:
+            return None
+
+        h, w = frame_shape[:2]
+        x1, y1, x2, y2 = self.box
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        half = max(x2 - x1, y2 - y1) * (0.5 + self.padding)
+        roi = (max(0, int(cx - half)), max(0, int(cy - half)), min(w, int(cx + half)), min(h, int(cy + half)))
+        if roi[2] - roi[0] < 2 or roi[3] - roi[1] < 2:
+            return None
+        return roi
+
+    def update(self, points, found_in_roi):
+        """Move the ROI to the landmarks just found; lose track if there were none"""
+        if found_in_roi:
+            self.roi_frames += 1
         else:
-            return {'success': False, 'confidence': 0.0, 'details': {'error': 'Unknown challenge type'}}
+            self.full_frames += 1
 
-    def _verify_blink_challenge(self, frames):
-        """Verify blink was detected in frame sequence"""
-        blink_count = 0
-        low_ear_frames = 0
+        if points is None:
+            self.box = None
+        else:
+            (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0)
+            self.box = (float(x1), float(y1), float(x2), float(y2))
+
+
+class _ChallengeEvaluator:
+    def __init__(self, service, frames_submitted, tracker=None, dedup=None):
+        """
+        Base for challenges judged one frame at a time so evaluation can stop
+        as soon as the verdict is fixed. This deliberately replaces scoring the
+        whole landmark sequence in one vectorised call: with early exit most
+        requests never extract landmarks for their later frames, which saves
+        far more than vectorising the cheap per-frame arithmetic across frames.
+        eye_aspect_ratios and horizontal_offsets still handle both eyes of a
+        frame in one step and are called here on one-frame arrays.
 
-        for frame in frames:
-            result = self.detect_blink(frame)
-            if result['blink_detected']:
-                low_ear_frames += 1
-            else:
-                if low_ear_frames >= self.BLINK_FRAMES:
-                    blink_count += 1
-                low_ear_frames = 0
+        Args:
+            service: LivenessDetectionService providing thresholds and landmark math
+            frames_submitted: Number of frames the client sent
+            tracker: FaceROITracker to search around the last face (optional)
+            dedup: NearDuplicateFilter to reuse landmarks of repeated frames (optional)
+        """
+        self.service = service
+        self.frames_submitted = frames_submitted
+        self.frames_processed = 0
+        self.tracker = tracker
+        self.dedup = dedup
+        self._last_points = None
+
+    @property
+    def frames_remaining(self):
+        return self.frames_submitted - self.frames_processed
+
+    @property
+    def decided(self):
+        return self.verdict is not None or self.frames_remaining <= 0
+
+    def add(self, frame, face_mesh=None):
+        """
+        Feed the next frame.
 
-        success = blink_count >= 1
-        confidence = min(blink_count / 2.0, 1.0)  # Normalize
+        Args:
+            frame: BGR image or FrameContext
+            face_mesh: Graph checked out for this request (borrowed per frame if None)
 
+        Returns:
+            bool: True once the verdict is fixed and later frames can be skipped
+        """
+        self.frames_processed += 1
+        if self.dedup is not None and self.dedup.is_duplicate(frame):
+            # Same picture as the last kept frame, so the same landmarks
+            points = self._last_points
+        else:
+            points = self.service.extract_landmarks([frame], face_mesh, self.tracker)
+            self._last_points = points
+        self._update(points)
+        return self.decided
+
+    def _frame_counts(self):
+        counts = {'frames_processed': self.frames_processed, 'frames_submitted': self.frames_submitted}
+        if self.tracker is not None:
+            counts.update(roi_frames=self.tracker.roi_frames, full_frames=self.tracker.full_frames)
+        if self.dedup is not None:
+            counts['frames_deduplicated'] = self.dedup.dropped
+        return counts
+
+
+class BlinkChallengeEvaluator(_ChallengeEvaluator):
+    """Passes on the first blink; fails once too few frames remain to complete one"""
+
+    def __init__(self, service, frames_submitted, tracker=None, dedup=None):
+        super().__init__(service, frames_submitted, tracker, dedup)
+        self.blink_count = 0
+        self.closed_run = 0
+
+    def _update(self, points):
+        # A blink is a run of at least BLINK_FRAMES closed-eye frames followed by an open one
+        if self.service.eye_aspect_ratios(points)[0] < self.service.EAR_THRESHOLD:
+            self.closed_run += 1
+        else:
+            if self.closed_run >= self.service.BLINK_FRAMES:
+                self.blink_count += 1
+            self.closed_run = 0
+
+    @property
+    def verdict(self):
+        if self.blink_count >= 1:
+            return True
+        frames_needed = max(0, self.service.BLINK_FRAMES - self.closed_run) + 1
+        if self.frames_remaining < frames_needed:
+            return False
+        return None
+
+    def result(self):
         return {
-            'success': success,
-            'confidence': confidence,
-            'details': {'blinks_detected': blink_count}
+            'success': self.blink_count >= 1,
+            'confidence': min(self.blink_count / 2.0, 1.0),  # Normalize
+            'details': {'blinks_detected': self.blink_count, **self._frame_counts()}
         }
 
-    def _verify_head_movement(self, frames, direction):
-        """Verify head moved in specified direction"""
-        poses = [self.detect_head_pose(frame) for frame in frames]
 
-        target_direction = direction.replace('head_', '')
-        matches = sum(1 for p in poses if p['direction'] == target_direction)
+class HeadMovementEvaluator(_ChallengeEvaluator):
+    """Passes once half the submitted frames face the target; fails once that is out of reach"""
 
-        success = matches >= len(frames) * 0.5  # At least 50% of frames
-        confidence = matches / len(frames)
+    def __init__(self, service, frames_submitted, target_direction, tracker=None, dedup=None):
+        super().__init__(service, frames_submitted, tracker, dedup)
+        self.target_direction = target_direction
+        self.matches = 0
 
+    def _update(self, points):
+        offset = self.service.horizontal_offsets(points)[0]
+        tolerance = self.service.HEAD_CENTER_TOLERANCE
+        if self.target_direction == 'right':
+            self.matches += int(offset >= tolerance)
+        else:
+            self.matches += int(offset <= -tolerance)
+
+    @property
+    def verdict(self):
+        required = self.frames_submitted * 0.5  # At least 50% of frames
+        if self.frames_submitted and self.matches >= required:
+            return True
+        if self.matches + self.frames_remaining < required:
+            return False
+        return None
+
+    def result(self):
         return {
-            'success': success,
-            'confidence': confidence,
-            'details': {'target': target_direction, 'matches': matches, 'total': len(frames)}
+            'success': bool(self.frames_submitted) and self.matches >= self.frames_submitted * 0.5,
+            'confidence': self.matches / self.frames_submitted if self.frames_submitted else 0.0,
+            'details': {'target': self.target_direction, 'matches': self.matches,
+                        'total': self.frames_submitted, **self._frame_counts()}
         }
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from backend.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_device():
+    """Pick the torch device for face models"""
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def _resident_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _param_bytes(model):
+    """Size of a torch module's parameters and buffers in bytes"""
+    if not hasattr(model, 'parameters'):
+        return None
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, loader):
+        """
+        Register a loader for a model without loading it.
+
+        Args:
+            name: Model name used with get()
+            loader: Zero-argument callable that builds the model
+        """
+        with self._lock:
+            self._loaders[name] = loader
+
+    def get(self, name):
+        """
+        Return the shared instance of a model, loading it on first use.
+
+        Args:
+            name: Registered model name
+
+        Returns:
+            object: The loaded model
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+            if name not in self._loaders:
+                raise KeyError(f"No loader registered for model '{name}'")
+
+            rss_before = _resident_bytes()
+            started = time.perf_counter()
+            model = self._loaders[name]()
+            load_seconds = time.perf_counter() - started
+            rss_after = _resident_bytes()
+
+            self._stats[name] = {
+                'load_seconds': load_seconds,
+                'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                'param_bytes': _param_bytes(model)
+            }
+            self._models[name] = model
+
+        logger.info(f"Loaded model '{name}' in {load_seconds:.2f}s")
+        return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        """
+        Report load time and memory for every registered model.
+
+        Returns:
+            dict: Per-model {'loaded', 'load_seconds', 'rss_delta_bytes', 'param_bytes'}
+        """
+        with self._lock:
+            report = {}
+            for name in self._loaders:
+                entry = {'loaded': name in self._models}
+                entry.update(self._stats.get(name, {}))
+                report[name] = entry
+            return report
+
+    def unload(self, name):
+        """Drop a loaded model so the next get() rebuilds it"""
+        with self._lock:
+            self._models.pop(name, None)
+            self._stats.pop(name, None)
+
+
+def _load_mtcnn():
+    from facenet_pytorch import MTCNN
+    return MTCNN(image_size=160, margin=0, keep_all=False, device=get_device())
+
+
+def _load_mtcnn_multi():
+    from facenet_pytorch import MTCNN
+    return MTCNN(image_size=160, margin=0, keep_all=True, device=get_device())
+
+
+def _load_resnet():
+    from facenet_pytorch import InceptionResnetV1
+    from backend.services.embedding_backends import build_embedder
+
+    def load_eager():
+        return InceptionResnetV1(pretrained='vggface2').eval()
+
+    return build_embedder(Config.FACE_EMBED_BACKEND, load_eager).to(get_device())
+
+
+def _load_face_mesh():
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def _load_face_mesh_pool():
+    from backend.services.face_mesh_pool import FaceMeshPool
+    return FaceMeshPool(_load_face_mesh, Config.FACE_MESH_POOL_SIZE, timeout=Config.FACE_MESH_POOL_TIMEOUT)
+
+
+# Process-wide registry shared by every service in a worker
+registry = ModelRegistry()
+registry.register('mtcnn', _load_mtcnn)
+registry.register('mtcnn_multi', _load_mtcnn_multi)
+registry.register('resnet', _load_resnet)
+registry.register('face_mesh_pool', _load_face_mesh_pool)
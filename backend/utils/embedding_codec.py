@@ -0,0 +1,42 @@
+import numpy as np
+
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+
+def encode_embedding(embedding, dtype='float32'):
+    """
+    Pack an embedding into raw little-endian bytes.
+
+    Args:
+        embedding: 1-D array-like face embedding
+        dtype: Storage dtype, 'float32' or 'float16'
+
+    Returns:
+        tuple: (data: bytes, dtype: str, dim: int)
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+    array = np.asarray(embedding).reshape(-1).astype(np.dtype(dtype).newbyteorder('<'), copy=False)
+    return array.tobytes(), dtype, int(array.size)
+
+
+def decode_embedding(data, dtype, dim):
+    """
+    View stored bytes as an embedding without copying.
+
+    Args:
+        data: Bytes written by encode_embedding
+        dtype: Storage dtype recorded with the bytes
+        dim: Number of values recorded with the bytes
+
+    Returns:
+        numpy.ndarray: Read-only array backed by data
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+    array = np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder('<'))
+    if array.size != dim:
+        raise ValueError(f"Embedding has {array.size} values, expected {dim}")
+    return array
@@ -0,0 +1,133 @@
+import cv2
+import numpy as np
+
+
+class FrameStats:
+    def __init__(self):
+        """
+        Per-request tally of image conversions performed versus served from a
+        FrameContext cache. One instance is shared by every frame of a request.
+        """
+        self.conversions = 0
+        self.conversions_avoided = 0
+        self.bytes_allocated = 0
+        self.bytes_avoided = 0
+
+    def record(self, array, cached):
+        if cached:
+            self.conversions_avoided += 1
+            self.bytes_avoided += array.nbytes
+        else:
+            self.conversions += 1
+            self.bytes_allocated += array.nbytes
+
+    def to_dict(self):
+        return {
+            'conversions': self.conversions,
+            'conversions_avoided': self.conversions_avoided,
+            'bytes_allocated': self.bytes_allocated,
+            'bytes_avoided': self.bytes_avoided
+        }
+
+
+class FrameContext:
+    def __init__(self, bgr, stats=None):
+        """
+        Wrap a decoded frame so colour conversions, resized and cropped variants
+        are computed at most once, however many services look at the frame.
+
+        Args:
+            bgr: BGR image from OpenCV
+            stats: FrameStats shared with the other frames of the request
+        """
+        self.bgr = bgr
+        self.stats = stats if stats is not None else FrameStats()
+        self._variants = {}
+        self._results = {}
+
+    @classmethod
+    def wrap(cls, frame, stats=None):
+        """Return frame unchanged if it is already a FrameContext (or None), else wrap it"""
+        if frame is None or isinstance(frame, cls):
+            return frame
+        return cls(frame, stats)
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def rgb(self):
+        return self._variant(('rgb',), lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    def resized(self, scale, rgb=True):
+        """
+        Frame scaled by a constant factor.
+
+        Args:
+            scale: Resize factor, e.g. 0.5
+            rgb: Scale the RGB variant instead of the BGR original
+
+        Returns:
+            numpy.ndarray: Resized image
+        """
+        return self._variant(
+            ('resized', float(scale), rgb),
+            lambda: cv2.resize(self._source(rgb), None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        )
+
+    def crop(self, box, rgb=True):
+        """
+        Contiguous copy of a region, clipped to the frame.
+
+        Args:
+            box: (x1, y1, x2, y2) in pixels
+            rgb: Crop the RGB variant instead of the BGR original
+
+        Returns:
+            numpy.ndarray: Cropped image
+        """
+        h, w = self.bgr.shape[:2]
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        x1, x2 = max(0, min(x1, w)), max(0, min(x2, w))
+        y1, y2 = max(0, min(y1, h)), max(0, min(y2, h))
+        def build():
+            if rgb and ('rgb',) not in self._variants:
+                # Convert only the region instead of the whole frame
+                return cv2.cvtColor(self.bgr[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+            return np.ascontiguousarray(self._source(rgb)[y1:y2, x1:x2])
+
+        return self._variant(('crop', x1, y1, x2, y2, rgb), build)
+
+    def cached(self, key, build):
+        """
+        Compute a per-frame analysis result (e.g. landmarks) once and reuse it.
+        Unlike image variants these are not counted in FrameStats.
+
+        Args:
+            key: Hashable name of the result
+            build: Zero-argument callable producing it
+
+        Returns:
+            The cached result
+        """
+        if key not in self._results:
+            self._results[key] = build()
+        return self._results[key]
+
+    def is_cached(self, key):
+        return key in self._results
+
+    def _source(self, rgb):
+        return self.rgb if rgb else self.bgr
+
+    def _variant(self, key, build):
+        variant = self._variants.get(key)
+        if variant is not None:
+            self.stats.record(variant, cached=True)
+            return variant
+
+        variant = build()
+        self.stats.record(variant, cached=False)
+        self._variants[key] = variant
+        return variant
@@ -0,0 +1,219 @@
+import base64
+import binascii
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from backend.config import Config
+
+
+# Start-of-frame markers of baseline, progressive and lossless JPEGs
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# libjpeg scales by these factors during the DCT, largest first
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpeg_size(data):
+    """
+    Read a JPEG's dimensions from its start-of-frame segment without decoding it.
+
+    Args:
+        data: bytes, bytearray or memoryview holding the encoded image
+
+    Returns:
+        tuple: (width, height), or None if data is not a JPEG
+    """
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 <= len(view):
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length field
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height = (view[i + 5] << 8) | view[i + 6]
+            width = (view[i + 7] << 8) | view[i + 8]
+            return width, height
+        i += 2 + ((view[i + 2] << 8) | view[i + 3])
+    return None
+
+
+def decode_flag(data, min_short_side=None):
+    """
+    Pick the cv2.imdecode flag for an encoded frame.
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale when the result still has a
+    short side of at least min_short_side; libjpeg then skips most of the
+    inverse DCT work. Other formats always decode at full size.
+
+    Args:
+        data: bytes, bytearray or memoryview holding the encoded image
+        min_short_side: Smallest acceptable short side in pixels (None or 0 disables)
+
+    Returns:
+        int: cv2.IMREAD_COLOR or one of cv2.IMREAD_REDUCED_COLOR_*
+    """
+    if not min_short_side:
+        return cv2.IMREAD_COLOR
+
+    size = jpeg_size(data)
+    if size is None:
+        return cv2.IMREAD_COLOR
+
+    short_side = min(size)
+    for factor, flag in _REDUCED_FLAGS:
+        if -(-short_side // factor) >= min_short_side:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(data, min_short_side=None):
+    """
+    Decode an encoded image (JPEG, PNG, ...) without copying the bytes.
+
+    Args:
+        data: bytes, bytearray or memoryview holding the encoded image
+        min_short_side: Decode JPEGs at reduced size down to this short side (None for full size)
+
+    Returns:
+        numpy.ndarray: BGR image, or None if the data is not a decodable image
+    """
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), decode_flag(data, min_short_side))
+
+
+def data_url_bytes(data_url):
+    """Encoded bytes of a base64 data URL"""
+    return base64.b64decode(data_url.split(',')[1])
+
+
+def decode_data_url(data_url):
+    """
+    Decode a base64 data URL as sent by the JSON endpoints.
+
+    Args:
+        data_url: 'data:image/jpeg;base64,...' string
+
+    Returns:
+        numpy.ndarray: BGR image, or None if the payload is not a decodable image
+    """
+    return decode_image(data_url_bytes(data_url))
+
+
+def upload_bytes(file_storage):
+    """
+    Encoded bytes of one multipart part.
+    Parts held in a BytesIO are viewed in place; spooled parts are read once.
+
+    Args:
+        file_storage: werkzeug FileStorage from request.files
+
+    Returns:
+        memoryview or bytes: The encoded image
+    """
+    stream = file_storage.stream
+    if hasattr(stream, 'getbuffer'):
+        return stream.getbuffer()
+    return stream.read()
+
+
+def decode_upload(file_storage):
+    """
+    Decode one binary part of a multipart upload.
+
+    Args:
+        file_storage: werkzeug FileStorage from request.files
+
+    Returns:
+        numpy.ndarray: BGR image, or None if the part is not a decodable image
+    """
+    return decode_image(upload_bytes(file_storage))
+
+
+class FrameDecoder:
+    def __init__(self, workers=None, max_frame_bytes=None, min_short_side=None):
+        """
+        Decode the frames of one request concurrently.
+        cv2.imdecode releases the GIL, so a small thread pool decodes a
+        multi-frame upload in roughly the time of its slowest frames.
+        Frames that cannot be decoded are reported instead of raising.
+
+        Args:
+            workers: Decode threads shared by all requests (from Config if None)
+            max_frame_bytes: Largest encoded frame accepted (from Config if None)
+            min_short_side: Reduced-size JPEG decode target, 0 for full size (from Config if None)
+        """
+        self.workers = workers or Config.FRAME_DECODE_WORKERS
+        self.max_frame_bytes = max_frame_bytes or Config.FRAME_DECODE_MAX_BYTES
+        self.min_short_side = Config.FRAME_DECODE_MIN_SHORT_SIDE if min_short_side is None else min_short_side
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='frame-decode')
+
+    def decode_all(self, payloads, load):
+        """
+        Decode a list of encoded frames, keeping their order.
+
+        Args:
+            payloads: Encoded frames, e.g. data URLs or multipart parts
+            load: Callable turning one payload into encoded bytes
+                  (decode_data_url's base64 step or upload_bytes)
+
+        Returns:
+            dict: {'frames': list of BGR images with None for failed frames,
+                   'failed': list of {'index': int, 'reason': str}}
+        """
+        payloads = list(payloads)
+        if len(payloads) > 1:
+            outcomes = list(self._executor.map(lambda payload: self._decode_one(payload, load), payloads))
+        else:
+            outcomes = [self._decode_one(payload, load) for payload in payloads]
+
+        frames = [frame for frame, _ in outcomes]
+        failed = [{'index': i, 'reason': reason} for i, (_, reason) in enumerate(outcomes) if reason]
+        return {'frames': frames, 'failed': failed}
+
+    def _decode_one(self, payload, load):
+        try:
+            data = load(payload)
+        except (binascii.Error, ValueError, IndexError, AttributeError, TypeError):
+            return None, 'malformed'
+
+        if len(data) > self.max_frame_bytes:
+            return None, 'too_large'
+
+        frame = decode_image(data, self.min_short_side)
+        if frame is None:
+            return None, 'decode_failed'
+        return frame, None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_decoder = None
+_decoder_lock = threading.Lock()
+
+
+def get_frame_decoder():
+    """
+    Return the process-wide frame decoder.
+
+    Returns:
+        FrameDecoder: Shared decoder and its thread pool
+    """
+    global _decoder
+
+    with _decoder_lock:
+        if _decoder is None:
+            _decoder = FrameDecoder()
+        return _decoder
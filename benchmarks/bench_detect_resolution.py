@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Detection resolution benchmark
+Measures what reduced-size JPEG decoding (FRAME_DECODE_MIN_SHORT_SIDE) and
+downscale-before-detect (FACE_DETECT_SHORT_SIDE) buy in latency, and what
+they cost in verification stability as the student sits further away.
+
+Usage: bench_detect_resolution.py [face_photo.jpg]
+
+With a photo of one face, the face is pasted into 1280x720 frames at
+several sizes to stand in for distance from the camera. Each detection size
+is compared against full-resolution detection of the same frame: whether the
+face is still found, and the embedding distance between the two crops
+(pixel difference of the crops when the embedding weights are unavailable).
+Without a photo only the latency columns are reported.
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from backend.services.face_recognition import FaceRecognitionService
+from backend.services.model_registry import ModelRegistry, _load_mtcnn, _load_mtcnn_multi, _load_resnet
+from backend.utils.frame_context import FrameContext
+from backend.utils.frame_decoding import decode_image
+
+
+def best_of(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def webcam_jpeg(width, height):
+    """Gradient plus sensor noise, so the JPEG has a realistic amount of detail"""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))], axis=-1)
+    frame += np.random.normal(0, 6, frame.shape)
+    return cv2.imencode('.jpg', np.clip(frame, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+
+
+def report_decode(resolutions=((1280, 720), (1920, 1080)), short_sides=(0, 480, 360, 240)):
+    print(f"{'input':>10} " + " ".join(f"{f'decode >={s}' if s else 'full decode':>14}" for s in short_sides))
+    for width, height in resolutions:
+        jpeg = webcam_jpeg(width, height)
+        cells = []
+        for short_side in short_sides:
+            ms = best_of(lambda: decode_image(jpeg, short_side))
+            decoded = decode_image(jpeg, short_side)
+            cells.append(f"{ms:6.2f}ms {decoded.shape[0]:>4}p")
+        print(f"{width}x{height:<4} " + " ".join(f"{c:>14}" for c in cells))
+
+
+def place_face(photo, face_box, face_width, canvas=(720, 1280)):
+    """Scale the photo so its face is face_width pixels wide and centre it on a grey frame"""
+    scale = face_width / (face_box[2] - face_box[0])
+    scaled = cv2.resize(photo, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    frame = np.full(canvas + (3,), 128, dtype=np.uint8)
+    fx, fy = (face_box[0] + face_box[2]) / 2 * scale, (face_box[1] + face_box[3]) / 2 * scale
+    ox, oy = int(canvas[1] / 2 - fx), int(canvas[0] / 2 - fy)
+
+    # Paste the overlapping part of the scaled photo
+    x1, y1 = max(ox, 0), max(oy, 0)
+    x2, y2 = min(ox + scaled.shape[1], canvas[1]), min(oy + scaled.shape[0], canvas[0])
+    frame[y1:y2, x1:x2] = scaled[y1 - oy:y2 - oy, x1 - ox:x2 - ox]
+    return frame
+
+
+def crop_signature(service, frame, embed):
+    """Embedding of the primary face, or its raw crop when no embedder is available"""
+    face = service._detect_primary(FrameContext(frame))
+    if face is None:
+        return None
+    if embed:
+        return service._embed(face.unsqueeze(0)).flatten()
+    return face.numpy().ravel()
+
+
+def report_detection(photo_path, detect_sizes=(0, 480, 360, 240), face_widths=(320, 160, 80, 40)):
+    registry = ModelRegistry()
+    registry.register('mtcnn', _load_mtcnn)
+    registry.register('mtcnn_multi', _load_mtcnn_multi)
+    registry.register('resnet', _load_resnet)
+    try:
+        registry.get('resnet')
+        embed = True
+        metric = 'embedding distance'
+    except Exception:
+        embed = False
+        metric = 'RMS crop difference (embedding weights unavailable)'
+
+    service = FaceRecognitionService(registry=registry, batcher=None)
+
+    if photo_path:
+        photo = cv2.imread(photo_path)
+        boxes, _ = service.mtcnn_multi.detect(cv2.cvtColor(photo, cv2.COLOR_BGR2RGB))
+        if boxes is None:
+            sys.exit(f"No face found in {photo_path}")
+        frames = [(f"face {w}px", place_face(photo, boxes[0], w)) for w in face_widths]
+    else:
+        frames = [('no face', np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8))]
+        metric = 'n/a without a face photo'
+
+    print(f"\nDetection at 1280x720, stability as {metric}")
+    print(f"{'frame':>11} " + " ".join(f"{f'detect {s}p' if s else 'detect full':>22}" for s in detect_sizes))
+    for label, frame in frames:
+        service.detect_short_side = 0
+        reference = crop_signature(service, frame, embed)
+
+        cells = []
+        for size in detect_sizes:
+            service.detect_short_side = size
+            ms = best_of(lambda: service._detect_primary(FrameContext(frame)), repeats=3)
+            signature = crop_signature(service, frame, embed)
+            if reference is None or signature is None:
+                stability = 'miss' if signature is None else 'found'
+            else:
+                difference = np.linalg.norm(signature - reference)
+                stability = f"{difference if embed else difference / np.sqrt(len(signature)):.3f}"
+            cells.append(f"{ms:7.1f}ms {stability:>9}")
+        print(f"{label:>11} " + " ".join(f"{c:>22}" for c in cells))
+
+
+def main():
+    print("🎯 Detection resolution benchmark")
+    print("=" * 100)
+    report_decode()
+    report_detection(sys.argv[1] if len(sys.argv) > 1 else None)
+
+
+if __name__ == '__main__':
+    main()
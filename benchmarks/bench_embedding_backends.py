@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Embedding backend latency benchmark
+Compares eager PyTorch, TorchScript and ONNX Runtime for InceptionResnetV1
+on CPU at batch sizes 1 and 16, and reports embedding drift against eager.
+
+Uses an untrained InceptionResnetV1 so it runs without downloading weights;
+latency and numerical parity do not depend on the weight values.
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import torch
+from facenet_pytorch import InceptionResnetV1
+
+from backend.services.embedding_backends import build_embedder
+
+torch.set_grad_enabled(False)
+
+
+def latency_ms(embedder, faces, iterations):
+    embedder(faces)  # warm-up
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        embedder(faces)
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.median(timings)
+
+
+def main(batch_sizes=(1, 16), iterations=20):
+    torch.manual_seed(0)
+    eager = InceptionResnetV1().eval()
+    cache_dir = tempfile.mkdtemp(prefix='presence-models-')
+
+    embedders = {'eager': eager}
+    for backend in ('torchscript', 'onnx'):
+        try:
+            embedders[backend] = build_embedder(backend, lambda: eager, cache_dir=cache_dir)
+        except RuntimeError as e:
+            print(f"⚠️  Skipping {backend}: {e}")
+
+    print(f"🎯 Embedding backend benchmark (CPU, median of {iterations} runs)")
+    print("=" * 60)
+    header = f"{'backend':<12}" + "".join(f"{'batch ' + str(b):>12}" for b in batch_sizes) + f"{'max drift':>14}"
+    print(header)
+
+    probe = torch.randn(8, 3, 160, 160)
+    reference = eager(probe).numpy()
+
+    for backend, embedder in embedders.items():
+        row = f"{backend:<12}"
+        for b in batch_sizes:
+            row += f"{latency_ms(embedder, torch.randn(b, 3, 160, 160), iterations):>10.1f}ms"
+        drift = np.linalg.norm(embedder(probe).numpy() - reference, axis=1).max()
+        row += f"{drift:>14.2e}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Face template storage benchmark
+Compares the old pickled float64 column with the binary float32/float16
+encoding: bytes per template, decode time, and time to load every template
+from a SQLite table.
+"""
+import os
+import sys
+import pickle
+import sqlite3
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from backend.utils.embedding_codec import encode_embedding, decode_embedding
+
+
+def best_of(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(rows=10000, dim=512):
+    embeddings = np.random.randn(rows, dim)
+    formats = {
+        'pickle float64': ([pickle.dumps(e) for e in embeddings], pickle.loads),
+        'binary float32': ([encode_embedding(e, 'float32')[0] for e in embeddings],
+                           lambda b: decode_embedding(b, 'float32', dim)),
+        'binary float16': ([encode_embedding(e, 'float16')[0] for e in embeddings],
+                           lambda b: decode_embedding(b, 'float16', dim)),
+    }
+
+    print(f"🎯 Template storage benchmark ({rows} templates, {dim} dims)")
+    print("=" * 72)
+    print(f"{'format':<16} {'bytes/row':>10} {'decode/row':>12} {'load all rows':>15}")
+
+    for label, (blobs, decode) in formats.items():
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE face_embeddings (id INTEGER PRIMARY KEY, embedding BLOB)')
+        conn.executemany('INSERT INTO face_embeddings (embedding) VALUES (?)', [(b,) for b in blobs])
+
+        decode_time = best_of(lambda: [decode(b) for b in blobs]) / rows
+        load_time = best_of(lambda: [decode(r[0]) for r in conn.execute('SELECT embedding FROM face_embeddings')])
+
+        print(f"{label:<16} {len(blobs[0]):>10} {decode_time * 1e6:>10.2f}us {load_time * 1000:>13.1f}ms")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
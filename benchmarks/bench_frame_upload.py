@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Frame upload benchmark
+Compares the JSON body with base64 data URLs against the multipart variant
+with one binary JPEG part per frame, for 1, 10 and 30 webcam frames.
+
+Reports bytes on the wire and the time to turn a request body into decoded
+BGR frames, split into parsing (JSON / multipart + base64) and imdecode,
+with frames decoded one by one and through the shared FrameDecoder pool.
+"""
+import os
+import sys
+import time
+import json
+import base64
+from io import BytesIO
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+from flask import Flask, request
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import EnvironBuilder
+
+from backend.utils.frame_decoding import FrameDecoder, data_url_bytes, decode_image, decode_upload, upload_bytes
+
+
+def make_jpeg(width=640, height=480):
+    """A webcam-like 640x480 JPEG: smooth gradient plus sensor noise"""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))], axis=-1)
+    frame += np.random.normal(0, 6, frame.shape)
+    ok, encoded = cv2.imencode('.jpg', np.clip(frame, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return encoded.tobytes()
+
+
+def json_environ(jpeg, n):
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+    body = json.dumps({'frames': [data_url] * n}).encode()
+    return EnvironBuilder(method='POST', data=body, content_type='application/json').get_environ()
+
+
+def multipart_environ(jpeg, n):
+    files = [FileStorage(BytesIO(jpeg), filename=f'{i}.jpg', content_type='image/jpeg') for i in range(n)]
+    return EnvironBuilder(method='POST', data={'frames': files}).get_environ()
+
+
+def replayable(environ):
+    """Read the built body once so every timed run parses a fresh in-memory stream"""
+    body = environ['wsgi.input'].read()
+    return lambda: dict(environ, **{'wsgi.input': BytesIO(body)}), len(body)
+
+
+def parse_json(app, environ):
+    with app.request_context(environ()):
+        return [base64.b64decode(url.split(',')[1]) for url in request.get_json()['frames']]
+
+
+def parse_multipart(app, environ):
+    with app.request_context(environ()):
+        return [upload_bytes(part) for part in request.files.getlist('frames')]
+
+
+def decode_json(app, environ):
+    return [decode_image(data) for data in parse_json(app, environ)]
+
+
+def decode_multipart(app, environ):
+    with app.request_context(environ()):
+        return [decode_upload(part) for part in request.files.getlist('frames')]
+
+
+def pooled_json(app, environ, decoder):
+    with app.request_context(environ()):
+        return decoder.decode_all(request.get_json()['frames'], data_url_bytes)
+
+
+def pooled_multipart(app, environ, decoder):
+    with app.request_context(environ()):
+        return decoder.decode_all(request.files.getlist('frames'), upload_bytes)
+
+
+def best_of(fn, repeats=7):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main(frame_counts=(1, 10, 30)):
+    app = Flask(__name__)
+    jpeg = make_jpeg()
+    decoder = FrameDecoder()
+
+    print(f"🎯 Frame upload benchmark, 640x480 JPEG ({len(jpeg) / 1024:.1f} KiB per frame)")
+    print("=" * 78)
+    print(f"{'frames':>7} {'format':>10} {'wire bytes':>12} {'parse':>10} {'parse+decode':>14} "
+          f"{f'pooled ({decoder.workers})':>13}")
+
+    for n in frame_counts:
+        for label, build, parse, decode, pooled in (
+                ('json', json_environ, parse_json, decode_json, pooled_json),
+                ('multipart', multipart_environ, parse_multipart, decode_multipart, pooled_multipart)):
+            environ, wire_bytes = replayable(build(jpeg, n))
+            parse_ms = best_of(lambda: parse(app, environ))
+            total_ms = best_of(lambda: decode(app, environ))
+            pooled_ms = best_of(lambda: pooled(app, environ, decoder))
+            print(f"{n:>7} {label:>10} {wire_bytes:>12,} {parse_ms:>8.2f}ms {total_ms:>12.2f}ms {pooled_ms:>11.2f}ms")
+
+    decoder.shutdown()
+
+
+if __name__ == '__main__':
+    main()
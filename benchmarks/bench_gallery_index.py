@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+1:N gallery identification benchmark
+Times top-5 search for a single probe and for a 60-probe batch (one class
+photo) against galleries of 1k/10k/100k enrolled students, plus the cost
+of an incremental enrollment.
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from backend.services.gallery_index import GalleryIndex
+
+
+def median_ms(fn, repeats=20):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.median(timings)
+
+
+def main(sizes=(1000, 10000, 100000), dim=512):
+    print("🎯 Gallery identification benchmark (top-5, float32)")
+    print("=" * 72)
+    print(f"{'enrolled':>9} {'build':>10} {'matrix MB':>10} {'1 probe':>10} {'60 probes':>11} {'enroll one':>11}")
+
+    for n in sizes:
+        templates = np.random.randn(n, dim).astype(np.float32)
+        index = GalleryIndex(dim=dim)
+
+        started = time.perf_counter()
+        index.build(np.arange(n), templates)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        single = np.random.randn(dim)
+        batch = np.random.randn(60, dim)
+        single_ms = median_ms(lambda: index.search(single, k=5))
+        batch_ms = median_ms(lambda: index.search(batch, k=5))
+        enroll_ms = median_ms(lambda: index.add_or_update(int(np.random.randint(n)), np.random.randn(dim)))
+
+        print(f"{n:>9} {build_ms:>8.1f}ms {index._matrix.nbytes / 1e6:>10.1f} {single_ms:>8.2f}ms {batch_ms:>9.2f}ms {enroll_ms:>9.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
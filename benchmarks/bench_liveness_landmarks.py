@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Liveness landmark benchmark
+Compares the old per-frame path (FaceMesh run separately for blink and head
+pose, landmark tuples and scipy distances) with one FaceMesh pass per frame
+and vectorized EAR / head-pose math over the whole sequence.
+
+Uses the real FaceMesh when mediapipe is installed. Otherwise a stand-in
+returns fixed landmarks instantly, which isolates the Python-side overhead.
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+from scipy.spatial import distance as dist
+
+from backend.services.liveness_detection import LivenessDetectionService
+from backend.services.model_registry import ModelRegistry, _load_face_mesh
+from backend.services.face_mesh_pool import FaceMeshPool
+
+
+class InstantFaceMesh:
+    """Returns the same plausible face for every frame without running a model"""
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        landmarks = [SimpleNamespace(x=x, y=y) for x, y in rng.uniform(0.3, 0.7, (478, 2))]
+        self.result = SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=landmarks)])
+
+    def process(self, rgb):
+        return self.result
+
+
+def legacy_checks(face_mesh, service, frames):
+    """The pre-vectorization implementation: two FaceMesh calls and scipy per frame"""
+    def ear(eye):
+        a = dist.euclidean(eye[1], eye[5])
+        b = dist.euclidean(eye[2], eye[4])
+        c = dist.euclidean(eye[0], eye[3])
+        return (a + b) / (2.0 * c)
+
+    for frame in frames:
+        h, w = frame.shape[:2]
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if results.multi_face_landmarks:
+            lm = results.multi_face_landmarks[0].landmark
+            left = [(lm[i].x * w, lm[i].y * h) for i in service.LEFT_EYE_INDICES]
+            right = [(lm[i].x * w, lm[i].y * h) for i in service.RIGHT_EYE_INDICES]
+            (ear(left) + ear(right)) / 2.0
+
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if results.multi_face_landmarks:
+            lm = results.multi_face_landmarks[0].landmark
+            lm[1].x * w - ((lm[33].x + lm[263].x) / 2) * w
+
+
+def vectorized_checks(service, frames):
+    points = service.extract_landmarks(frames)
+    service.eye_aspect_ratios(points)
+    service.horizontal_offsets(points)
+
+
+def best_of(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main(sequence_lengths=(10, 30, 90)):
+    try:
+        face_mesh = _load_face_mesh()
+        label = 'mediapipe FaceMesh'
+    except (ImportError, AttributeError):
+        face_mesh = InstantFaceMesh()
+        label = 'instant stand-in (mediapipe FaceMesh unavailable)'
+
+    registry = ModelRegistry()
+    registry.register('face_mesh_pool', lambda: FaceMeshPool(lambda: face_mesh, 1))
+    service = LivenessDetectionService(registry=registry)
+
+    print(f"🎯 Liveness landmark benchmark ({label})")
+    print("=" * 72)
+    print(f"{'frames':>7} {'per-frame path':>16} {'vectorized':>12} {'speedup':>9}")
+
+    for n in sequence_lengths:
+        frames = [np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(n)]
+        legacy_ms = best_of(lambda: legacy_checks(face_mesh, service, frames))
+        vectorized_ms = best_of(lambda: vectorized_checks(service, frames))
+        print(f"{n:>7} {legacy_ms:>14.2f}ms {vectorized_ms:>10.2f}ms {legacy_ms / vectorized_ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Liveness face-ROI benchmark
+Times a 15-frame head-turn sequence with FaceMesh fed full frames versus
+padded crops around the tracked face, at 640x480 and 1280x720.
+
+Uses the real FaceMesh when mediapipe is installed. Otherwise a stand-in
+resizes its input to 192x192 as the FaceMesh graph does and finds a
+synthetic face there, which models the per-pixel part of the cost only.
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from backend.services.liveness_detection import LivenessDetectionService
+from backend.services.model_registry import ModelRegistry, _load_face_mesh
+from backend.services.face_mesh_pool import FaceMeshPool
+
+
+class ResizingFaceMesh:
+    """Stand-in that downsizes like FaceMesh, then places a face over the bright square"""
+
+    def process(self, rgb):
+        small = cv2.resize(rgb, (192, 192), interpolation=cv2.INTER_AREA)
+        ys, xs = np.nonzero(small[..., 0] > 200)
+        if len(xs) == 0:
+            return SimpleNamespace(multi_face_landmarks=None)
+
+        x1, x2, y1, y2 = xs.min() / 192, (xs.max() + 1) / 192, ys.min() / 192, (ys.max() + 1) / 192
+        grid = np.linspace(0.2, 0.8, 478)
+        landmarks = [SimpleNamespace(x=x1 + g * (x2 - x1), y=y1 + g * (y2 - y1)) for g in grid]
+        return SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=landmarks)])
+
+
+def make_sequence(width, height, n=15):
+    """Frames with a face-sized bright square drifting across the middle"""
+    size = height // 3
+    frames = []
+    for i in range(n):
+        frame = np.random.randint(0, 120, (height, width, 3), dtype=np.uint8)
+        x, y = width // 2 - size // 2 + 3 * i, height // 2 - size // 2
+        frame[y:y + size, x:x + size] = 230
+        frames.append(frame)
+    return frames, (width // 2 - size // 2, height // 2 - size // 2, width // 2 + size // 2, height // 2 + size // 2)
+
+
+def best_of(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main(resolutions=((640, 480), (1280, 720))):
+    try:
+        face_mesh = _load_face_mesh()
+        label = 'mediapipe FaceMesh'
+    except (ImportError, AttributeError):
+        face_mesh = ResizingFaceMesh()
+        label = 'resizing stand-in (mediapipe FaceMesh unavailable)'
+
+    registry = ModelRegistry()
+    registry.register('face_mesh_pool', lambda: FaceMeshPool(lambda: face_mesh, 1))
+    service = LivenessDetectionService(registry=registry)
+
+    print(f"🎯 Liveness ROI benchmark, 15 frames ({label})")
+    print("=" * 72)
+    print(f"{'input':>10} {'full frame':>12} {'face ROI':>10} {'speedup':>9} {'ROI frames':>11} {'ROI area':>11}")
+
+    for width, height in resolutions:
+        frames, face_box = make_sequence(width, height)
+
+        def run(roi_enabled):
+            service.ROI_ENABLED = roi_enabled
+            return service.verify_liveness_challenge('head_right', frames, face_box=face_box)
+
+        full_ms = best_of(lambda: run(False))
+        roi_ms = best_of(lambda: run(True))
+        details = run(True)['details']
+        roi_side = service.create_evaluator('blink', 1, face_box).tracker.roi(frames[0].shape)
+        roi_pixels = (roi_side[2] - roi_side[0]) * (roi_side[3] - roi_side[1])
+
+        print(f"{width}x{height:<4} {full_ms:>10.2f}ms {roi_ms:>8.2f}ms {full_ms / roi_ms:>8.1f}x "
+              f"{details['roi_frames']:>5}/{details['frames_processed']:<5} {roi_pixels / (width * height):>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
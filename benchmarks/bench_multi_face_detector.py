@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Multi-face detector micro-benchmark
+Compares building MTCNN(keep_all=True) on every call against reusing the
+shared detector from the model registry.
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+from facenet_pytorch import MTCNN
+
+from backend.services.model_registry import ModelRegistry, get_device, _load_mtcnn_multi
+from backend.services.face_recognition import FaceRecognitionService
+
+
+def time_calls(fn, iterations):
+    """Return per-call wall time in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.array(timings)
+
+
+def report(label, timings):
+    print(f"{label:<32} mean {timings.mean():8.2f} ms   p50 {np.median(timings):8.2f} ms   p95 {np.percentile(timings, 95):8.2f} ms")
+
+
+def main(iterations=30):
+    device = get_device()
+    frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    print("🎯 Multi-face detector benchmark")
+    print("=" * 50)
+    print(f"Device: {device} | Frame: 640x480 | Iterations: {iterations}\n")
+
+    construct_only = time_calls(
+        lambda: MTCNN(image_size=160, margin=0, keep_all=True, device=device),
+        iterations
+    )
+
+    def per_call():
+        MTCNN(image_size=160, margin=0, keep_all=True, device=device).detect(rgb)
+
+    before = time_calls(per_call, iterations)
+
+    registry = ModelRegistry()
+    registry.register('mtcnn_multi', _load_mtcnn_multi)
+    service = FaceRecognitionService(registry=registry)
+    service.detect_multiple_faces(frame)  # warm-up load
+    after = time_calls(lambda: service.detect_multiple_faces(frame), iterations)
+
+    report("construction only", construct_only)
+    report("before: new MTCNN per call", before)
+    report("after: shared detector", after)
+    print(f"\nSaved per call: {before.mean() - after.mean():.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
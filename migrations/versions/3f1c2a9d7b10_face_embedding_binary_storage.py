@@ -0,0 +1,86 @@
+"""Store face embeddings as compact binary instead of pickles
+
+Revision ID: 3f1c2a9d7b10
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+Converts every face_embeddings.embedding pickle into raw little-endian
+float32 bytes plus dtype, dim and model_version columns. Databases created
+by init_db.py after this change already have the new schema and only need
+`flask db stamp head`.
+
+"""
+import pickle
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+MODEL_VERSION = 'inception_resnet_v1_vggface2'
+
+
+def _convert_rows(select_sql, update_sql, convert):
+    """Rewrite rows in fixed-size chunks so large tables are not loaded at once"""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(select_sql), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        bind.execute(sa.text(update_sql), [convert(row) for row in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    with op.batch_alter_table('face_embeddings') as batch_op:
+        batch_op.add_column(sa.Column('embedding_data', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('dtype', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('dim', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('model_version', sa.String(length=50), nullable=True))
+
+    def to_binary(row):
+        values = np.asarray(pickle.loads(row[1])).reshape(-1).astype('<f4')
+        return {'id': row[0], 'data': values.tobytes(), 'dim': int(values.size)}
+
+    _convert_rows(
+        'SELECT id, embedding FROM face_embeddings WHERE id > :last_id ORDER BY id LIMIT :limit',
+        f"UPDATE face_embeddings SET embedding_data = :data, dtype = 'float32', dim = :dim, "
+        f"model_version = '{MODEL_VERSION}' WHERE id = :id",
+        to_binary
+    )
+
+    with op.batch_alter_table('face_embeddings') as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_data', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.alter_column('dtype', existing_type=sa.String(length=10), nullable=False)
+        batch_op.alter_column('dim', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('model_version', existing_type=sa.String(length=50), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('face_embeddings') as batch_op:
+        batch_op.add_column(sa.Column('embedding', sa.LargeBinary(), nullable=True))
+
+    def to_pickle(row):
+        values = np.frombuffer(row[1], dtype=np.dtype(row[2]).newbyteorder('<')).astype(np.float64)
+        return {'id': row[0], 'data': pickle.dumps(values)}
+
+    _convert_rows(
+        'SELECT id, embedding_data, dtype FROM face_embeddings WHERE id > :last_id ORDER BY id LIMIT :limit',
+        'UPDATE face_embeddings SET embedding = :data WHERE id = :id',
+        to_pickle
+    )
+
+    with op.batch_alter_table('face_embeddings') as batch_op:
+        batch_op.alter_column('embedding', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.drop_column('model_version')
+        batch_op.drop_column('dim')
+        batch_op.drop_column('dtype')
+        batch_op.drop_column('embedding_data')
@@ -2,6 +2,7 @@
 Unit tests for database models
 """
 import pytest
+import numpy as np
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -73,7 +74,7 @@ class TestUserModel:
         db.session.commit()
 
         assert len(user.face_embeddings) == 1
-        assert user.face_embeddings[0].embedding == [0.1] * 128
+        assert np.array_equal(user.face_embeddings[0].embedding, np.float32([0.1] * 128))
 
 
 class TestSessionModel:
@@ -339,4 +340,32 @@ class TestFaceEmbeddingModel:
 
         assert face_emb.id is not None
         assert len(face_emb.embedding) == 128
-        assert face_emb.embedding[0] == 0.1
+        assert face_emb.embedding[0] == np.float32(0.1)  # Stored as float32
+
+    def test_face_embedding_binary_storage(self):
+        """Test embeddings are stored as raw float32 bytes with metadata"""
+        embedding_data = np.linspace(-1, 1, 512)
+        face_emb = FaceEmbedding(user_id=self.user.id, embedding=embedding_data)
+        db.session.add(face_emb)
+        db.session.commit()
+        db.session.expire_all()
+
+        stored = FaceEmbedding.query.get(face_emb.id)
+        assert stored.dtype == 'float32'
+        assert stored.dim == 512
+        assert stored.model_version == 'inception_resnet_v1_vggface2'
+        assert len(stored.embedding_data) == 512 * 4
+        assert stored.embedding.dtype == np.float32
+        assert not stored.embedding.flags.writeable  # Zero-copy view over the column bytes
+        assert np.allclose(stored.embedding, embedding_data, atol=1e-6)
+
+    def test_face_embedding_float16_codec(self):
+        """Test the optional float16 encoding and dimension check"""
+        from backend.utils.embedding_codec import encode_embedding, decode_embedding
+
+        data, dtype, dim = encode_embedding(np.ones(512), 'float16')
+        assert (len(data), dtype, dim) == (1024, 'float16', 512)
+        assert decode_embedding(data, dtype, dim).dtype == np.float16
+
+        with pytest.raises(ValueError):
+            decode_embedding(data, dtype, 128)
@@ -3,15 +3,572 @@ Unit tests for AI services
 """
 import pytest
 import numpy as np
+import torch
+import cv2
+import base64
 import sys
 import os
+from io import BytesIO
+from werkzeug.datastructures import FileStorage
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from backend.services.face_recognition import FaceRecognitionService
 from backend.services.liveness_detection import LivenessDetectionService
 from backend.services.ble_service import BLEProximityService
+from backend.services.ble_scanner import BLEScannerDaemon, FakeScannerBackend
 from backend.services.attendance_service import AttendanceService
+from backend.services.model_registry import ModelRegistry
+from backend.services.face_mesh_pool import FaceMeshPool
+from backend.services.frame_dedup import NearDuplicateFilter
+from backend.services.inference_batcher import EmbeddingBatcher
+from backend.services.embedding_backends import build_embedder
+from backend.services.embedding_cache import EmbeddingCache
+from backend.services.gallery_index import GalleryIndex, SharedGalleryIndex
 from backend.services.notification_service import NotificationService
+from backend.services.face_hints import FaceHintStats, hint_roi
+from backend.services.attendance_jobs import AttendanceJobQueue, QueueFullError
+from backend.utils.frame_context import FrameContext, FrameStats
+from backend.utils.frame_decoding import (FrameDecoder, data_url_bytes, decode_data_url, decode_flag,
+                                          decode_image, decode_upload, jpeg_size, upload_bytes)
+
+
+def face_landmarks(ear=0.3, offset=0.0):
+    """FaceMesh-style landmarks for a 100x100 frame with the given EAR and nose offset (pixels)"""
+    from types import SimpleNamespace
+
+    points = [[0.5, 0.5] for _ in range(478)]
+    half_height = ear * 0.2 / 2
+    for corner, top, bottom, x0 in ((362, (385, 387), (380, 373), 0.6), (33, (160, 158), (144, 153), 0.2)):
+        points[corner] = [x0, 0.4]
+        points[{362: 263, 33: 133}[corner]] = [x0 + 0.2, 0.4]
+        for j in range(2):
+            points[top[j]] = [x0 + 0.07 * (j + 1), 0.4 - half_height]
+            points[bottom[j]] = [x0 + 0.07 * (j + 1), 0.4 + half_height]
+    # Landmarks 33 and 263 sit at x=0.2 and x=0.8, so the eye midpoint is x=0.5
+    points[1] = [0.5 + offset / 100, 0.6]
+    return [SimpleNamespace(x=x, y=y) for x, y in points]
+
+
+class FakeFaceMesh:
+    """FaceMesh stand-in that replays scripted landmarks; None means no face"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        self.resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+    def process(self, rgb):
+        from types import SimpleNamespace
+
+        landmarks = self.script[self.calls % len(self.script)]
+        self.calls += 1
+        faces = [SimpleNamespace(landmark=landmarks)] if landmarks is not None else None
+        return SimpleNamespace(multi_face_landmarks=faces)
+
+
+class TestFrameContext:
+    """Test per-frame caching of colour conversions and variants"""
+
+    def setup_method(self):
+        """Create a BGR frame with distinct channels"""
+        self.bgr = np.zeros((40, 60, 3), dtype=np.uint8)
+        self.bgr[..., 0] = 255
+        self.stats = FrameStats()
+        self.frame = FrameContext(self.bgr, self.stats)
+
+    def test_rgb_converted_once(self):
+        """Test repeated RGB access reuses the first conversion"""
+        rgb = self.frame.rgb
+        assert self.frame.rgb is rgb
+        assert rgb[0, 0].tolist() == [0, 0, 255]
+        assert self.stats.to_dict() == {'conversions': 1, 'conversions_avoided': 1,
+                                         'bytes_allocated': rgb.nbytes, 'bytes_avoided': rgb.nbytes}
+
+    def test_resized_and_cropped_variants(self):
+        """Test variants are cached per argument and crops are clipped"""
+        assert self.frame.resized(0.5).shape == (20, 30, 3)
+        assert self.frame.resized(0.5) is self.frame.resized(0.5)
+        crop = self.frame.crop((50, -5, 80, 10), rgb=False)
+        assert crop.shape == (10, 10, 3)
+        assert crop.flags.c_contiguous
+
+    def test_wrap_is_idempotent(self):
+        """Test wrapping a context or None returns it unchanged"""
+        assert FrameContext.wrap(self.frame) is self.frame
+        assert FrameContext.wrap(None) is None
+        assert FrameContext.wrap(self.bgr, self.stats).stats is self.stats
+
+    def test_services_share_conversions(self):
+        """Test liveness checks on the same context convert it once"""
+        mesh = FakeFaceMesh([None])
+        registry = ModelRegistry()
+        registry.register('face_mesh_pool', lambda: FaceMeshPool(lambda: mesh, 1))
+        service = LivenessDetectionService(registry=registry)
+        service.detect_blink(self.frame)
+        service.detect_head_pose(self.frame)
+
+        assert self.stats.conversions == 1
+        assert mesh.calls == 1
+
+
+class TestFrameDecoding:
+    """Test decoding of base64 and binary multipart frames"""
+
+    def setup_method(self):
+        """Encode a small frame as PNG so decoding is lossless"""
+        self.bgr = np.zeros((16, 24, 3), dtype=np.uint8)
+        self.bgr[:, :12] = (255, 0, 0)
+        self.encoded = cv2.imencode('.png', self.bgr)[1].tobytes()
+
+    def test_data_url_and_upload_decode_identically(self):
+        """Test both transports yield the original frame"""
+        data_url = 'data:image/png;base64,' + base64.b64encode(self.encoded).decode()
+        part = FileStorage(BytesIO(self.encoded), filename='0.png')
+
+        assert np.array_equal(decode_data_url(data_url), self.bgr)
+        assert np.array_equal(decode_upload(part), self.bgr)
+
+    def test_undecodable_upload_returns_none(self):
+        """Test empty or corrupt parts decode to None"""
+        assert decode_upload(FileStorage(BytesIO(b''))) is None
+        assert decode_upload(FileStorage(BytesIO(b'not an image'))) is None
+
+    def test_reduced_decode_from_jpeg_header(self):
+        """Test JPEGs decode at the largest reduction that keeps the short side"""
+        jpeg = cv2.imencode('.jpg', np.zeros((720, 1280, 3), dtype=np.uint8))[1].tobytes()
+
+        assert jpeg_size(jpeg) == (1280, 720)
+        assert jpeg_size(self.encoded) is None
+        assert decode_flag(jpeg, 360) == cv2.IMREAD_REDUCED_COLOR_2
+        assert decode_flag(jpeg, 90) == cv2.IMREAD_REDUCED_COLOR_8
+        assert decode_flag(jpeg, 480) == cv2.IMREAD_COLOR
+        assert decode_flag(self.encoded, 4) == cv2.IMREAD_COLOR
+        assert decode_image(jpeg, 180).shape == (180, 320, 3)
+
+    def test_decoder_keeps_order_and_reports_failures(self):
+        """Test pooled decoding keeps frame order and reports each failure"""
+        decoder = FrameDecoder(workers=2, max_frame_bytes=len(self.encoded))
+        data_url = 'data:image/png;base64,' + base64.b64encode(self.encoded).decode()
+        oversized = 'data:image/png;base64,' + base64.b64encode(self.encoded + b'\0').decode()
+        result = decoder.decode_all([data_url, 'no-comma', oversized, 'data:,AAAA', data_url], data_url_bytes)
+        decoder.shutdown()
+
+        assert np.array_equal(result['frames'][0], self.bgr)
+        assert np.array_equal(result['frames'][4], self.bgr)
+        assert result['frames'][1:4] == [None, None, None]
+        assert result['failed'] == [{'index': 1, 'reason': 'malformed'},
+                                    {'index': 2, 'reason': 'too_large'},
+                                    {'index': 3, 'reason': 'decode_failed'}]
+
+    def test_decoder_accepts_multipart_parts(self):
+        """Test the decoder reads multipart parts through upload_bytes"""
+        decoder = FrameDecoder(workers=2)
+        parts = [FileStorage(BytesIO(self.encoded), filename=f'{i}.png') for i in range(3)]
+        result = decoder.decode_all(parts, upload_bytes)
+        decoder.shutdown()
+
+        assert result['failed'] == []
+        assert all(np.array_equal(frame, self.bgr) for frame in result['frames'])
+
+
+class TestModelRegistry:
+    """Test lazy process-wide model registry"""
+
+    def setup_method(self):
+        """Initialize registry with counting loaders"""
+        self.loads = []
+        self.registry = ModelRegistry()
+        for name in ('mtcnn', 'resnet', 'face_mesh'):
+            self.registry.register(name, lambda name=name: self.loads.append(name) or object())
+
+    def test_services_do_not_load_models_on_construction(self):
+        """Test building services leaves every model unloaded"""
+        face_service = FaceRecognitionService(registry=self.registry)
+        liveness_service = LivenessDetectionService(registry=self.registry)
+        AttendanceService(face_service, liveness_service, BLEProximityService())
+
+        assert self.loads == []
+        assert not any(entry['loaded'] for entry in self.registry.stats().values())
+
+    def test_models_shared_across_services(self):
+        """Test every service gets the same instance and each model loads once"""
+        first = FaceRecognitionService(registry=self.registry)
+        second = FaceRecognitionService(registry=self.registry)
+
+        assert first.resnet is second.resnet
+        assert first.mtcnn is second.mtcnn
+        assert sorted(self.loads) == ['mtcnn', 'resnet']
+
+    def test_stats_report_load_time(self):
+        """Test stats report per-model load time once loaded"""
+        self.registry.get('face_mesh')
+        stats = self.registry.stats()
+
+        assert stats['face_mesh']['loaded'] == True
+        assert stats['face_mesh']['load_seconds'] >= 0
+        assert stats['resnet'] == {'loaded': False}
+
+    def test_multi_face_detector_reused(self):
+        """Test detect_multiple_faces reuses one keep_all detector"""
+        class FakeDetector:
+            calls = 0
+
+            def detect(self, rgb):
+                FakeDetector.calls += 1
+                return np.array([[0, 0, 10, 10], [20, 20, 30, 30]]), np.array([0.99, 0.98])
+
+        self.registry.register('mtcnn_multi', lambda: self.loads.append('mtcnn_multi') or FakeDetector())
+        service = FaceRecognitionService(registry=self.registry)
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+        assert service.detect_multiple_faces(frame) == 2
+        assert service.detect_multiple_faces(frame) == 2
+        assert FakeDetector.calls == 2
+        assert self.loads == ['mtcnn_multi']
+
+    def test_unknown_model(self):
+        """Test requesting an unregistered model"""
+        with pytest.raises(KeyError):
+            self.registry.get('missing')
+
+
+class FakeMTCNN:
+    """Detector stand-in that returns fixed boxes (or one queued response per call) and counts calls"""
+
+    def __init__(self, boxes=None, responses=None):
+        self.boxes = boxes
+        self.responses = responses
+        self.detect_calls = 0
+        self.shapes = []
+
+    def detect(self, rgb):
+        self.detect_calls += 1
+        self.shapes.append(('detect', rgb.shape))
+        boxes = self.responses.pop(0) if self.responses else self.boxes
+        if boxes is None:
+            return None, None
+        return boxes, np.full(len(boxes), 0.99)
+
+    def extract(self, rgb, boxes, save_path):
+        self.shapes.append(('extract', rgb.shape))
+        # Encode each box's width into the crop so embeddings are traceable
+        return torch.stack([torch.full((3, 160, 160), float(b[2] - b[0])) for b in boxes])
+
+
+class FakeSingleMTCNN:
+    """Single-face detector stand-in that finds a face in any non-black frame"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, imgs):
+        batched = isinstance(imgs, list)
+        self.calls.append(len(imgs) if batched else 1)
+        faces = [torch.full((3, 160, 160), float(img.mean())) if img.mean() > 0 else None
+                 for img in (imgs if batched else [imgs])]
+        return faces if batched else faces[0]
+
+
+class FakeResnet:
+    """Embedder stand-in that maps each crop to a 512-d vector of its mean"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, faces):
+        self.batch_sizes.append(len(faces))
+        return faces.mean(dim=(1, 2, 3)).unsqueeze(1).repeat(1, 512)
+
+
+class TestFaceRecognitionPipeline:
+    """Test face pipeline logic against fake models"""
+
+    def setup_method(self):
+        """Initialize service with fake detector and embedder"""
+        self.detector = FakeMTCNN(np.array([[0, 0, 40, 40], [100, 100, 180, 190], [300, 0, 350, 60]], dtype=np.float32))
+        self.resnet = FakeResnet()
+        self.registry = ModelRegistry()
+        self.single_detector = FakeSingleMTCNN()
+        self.registry.register('mtcnn', lambda: self.single_detector)
+        self.registry.register('mtcnn_multi', lambda: self.detector)
+        self.registry.register('resnet', lambda: self.resnet)
+        self.service = FaceRecognitionService(registry=self.registry)
+        self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def test_detect_and_embed_single_pass(self):
+        """Test one detector pass yields count, boxes and primary embedding"""
+        result = self.service.detect_and_embed(self.frame)
+
+        assert self.detector.detect_calls == 1
+        assert result['face_count'] == 3
+        assert result['primary_index'] == 1
+        assert len(result['probs']) == 3
+        assert result['embedding'].shape == (512,)
+        assert result['embedding'][0] == 80
+
+    def test_detect_and_embed_downscaled(self):
+        """Test detection runs on a downscaled copy and crops from the full frame"""
+        self.service.detect_short_side = 240
+        result = self.service.detect_and_embed(self.frame)
+
+        assert self.detector.shapes == [('detect', (240, 320, 3)), ('extract', (480, 640, 3))]
+        assert result['boxes'][1].tolist() == [200, 200, 360, 380]
+        assert result['embedding'][0] == 160
+
+    def test_detect_short_side_never_upscales(self):
+        """Test frames already below the detection size are searched as they are"""
+        self.service.detect_short_side = 720
+        self.service.detect_and_embed(self.frame)
+
+        assert self.detector.shapes[0] == ('detect', (480, 640, 3))
+
+    def test_hint_limits_detection_to_padded_region(self):
+        """Test a usable hint is searched at full size and the whole frame only at the count size"""
+        stats = FaceHintStats()
+        service = FaceRecognitionService(registry=self.registry, hint_stats=stats)
+        service.hints_enabled = True
+        service.hint_count_short_side = 120
+        result = service.detect_and_embed(self.frame, hint=[0.25, 0.25, 0.5, 0.5])
+
+        assert self.detector.shapes[:2] == [('detect', (240, 320, 3)), ('detect', (120, 160, 3))]
+        assert self.detector.detect_calls == 2
+        assert result['boxes'][0].tolist() == [80, 60, 120, 100]
+        assert result['hint'] == 'hint_used'
+        assert stats.stats()['hint_hit_rate'] == 1.0
+
+    def test_hint_still_counts_faces_outside_region(self):
+        """Test a tight hint cannot hide a second face from the multi-face count"""
+        service = FaceRecognitionService(registry=self.registry, hint_stats=FaceHintStats())
+        service.hints_enabled = True
+        self.detector.responses = [
+            # Hint region (80, 60)-(400, 300) at full size
+            np.array([[20, 20, 60, 70]], dtype=np.float32),
+            # Whole frame at half size: the hinted face again plus one outside the region
+            np.array([[50, 40, 70, 65], [265, 20, 280, 40]], dtype=np.float32)
+        ]
+        result = service.detect_and_embed(self.frame, hint=[0.25, 0.25, 0.5, 0.5])
+
+        assert self.detector.shapes[1] == ('detect', (240, 320, 3))
+        assert result['face_count'] == 2
+        assert result['boxes'].tolist() == [[100, 80, 140, 130], [530, 40, 560, 80]]
+        assert result['primary_index'] == 0
+        assert result['embedding'][0] == 40
+
+    def test_hint_falls_back_to_full_frame(self):
+        """Test a hint region without a face triggers a full-frame scan"""
+        stats = FaceHintStats()
+        service = FaceRecognitionService(registry=self.registry, hint_stats=stats)
+        service.hints_enabled = True
+        self.detector.boxes = None
+        result = service.detect_and_embed(self.frame, hint=[0.25, 0.25, 0.5, 0.5])
+
+        assert [shape for _, shape in self.detector.shapes] == [(240, 320, 3), (480, 640, 3)]
+        assert result['hint'] == 'hint_fallback'
+        assert stats.stats()['hint_fallback'] == 1
+        assert stats.stats()['hint_hit_rate'] == 0.0
+
+    def test_hint_ignored_when_unusable_or_disabled(self):
+        """Test malformed hints and disabled hinting scan the full frame"""
+        stats = FaceHintStats()
+        service = FaceRecognitionService(registry=self.registry, hint_stats=stats)
+        service.hints_enabled = True
+        assert service.detect_and_embed(self.frame, hint=['a', 0, 1, 1])['hint'] == 'hint_invalid'
+        service.hints_enabled = False
+        assert service.detect_and_embed(self.frame, hint=[0.25, 0.25, 0.5, 0.5])['hint'] == 'no_hint'
+
+        assert self.detector.shapes == [('detect', (480, 640, 3)), ('extract', (480, 640, 3))] * 2
+        assert stats.stats()['hint_hit_rate'] is None
+
+    def test_hint_roi_clipped_to_frame(self):
+        """Test hint regions are clipped and degenerate hints rejected"""
+        assert hint_roi((100, 200), (0.9, 0.9, 1.2, 1.0), 0.5) == (150, 85, 200, 100)
+        assert hint_roi((100, 200), (0.5, 0.5, 0.4, 0.6), 0.5) is None
+        assert hint_roi((100, 200), (2.0, 2.0, 3.0, 3.0), 0.5) is None
+        assert hint_roi((100, 200), (0.1, float('nan'), 0.2, 0.3), 0.5) is None
+
+    def test_detect_and_embed_no_face(self):
+        """Test no face leaves embedding empty without running the embedder"""
+        self.detector.boxes = None
+        result = self.service.detect_and_embed(self.frame)
+
+        assert result['face_count'] == 0
+        assert result['embedding'] is None
+        assert self.resnet.batch_sizes == []
+
+    def test_detect_and_embed_through_batcher(self):
+        """Test embeddings are routed through the shared batcher when given one"""
+        batcher = EmbeddingBatcher(lambda: self.resnet, max_wait_ms=0)
+        service = FaceRecognitionService(registry=self.registry, batcher=batcher)
+        try:
+            result = service.detect_and_embed(self.frame)
+        finally:
+            batcher.stop()
+
+        assert result['embedding'][0] == 80
+        assert batcher.metrics()['requests'] == 1
+
+    def test_get_embeddings_from_frames_batched(self):
+        """Test accepted crops go through the embedder as one batch"""
+        frames = [np.full((48, 64, 3), v, dtype=np.uint8) for v in (10, 0, 20, 30)]
+        frames.insert(2, None)
+
+        result = self.service.get_embeddings_from_frames(frames, batch_detect=True)
+
+        assert self.single_detector.calls == [4]
+        assert self.resnet.batch_sizes == [3]
+        assert result['accepted'] == [0, 3, 4]
+        assert result['rejected'] == [{'index': 1, 'reason': 'no_face'},
+                                      {'index': 2, 'reason': 'decode_failed'}]
+        assert result['embeddings'].shape == (3, 512)
+        assert list(result['embeddings'][:, 0]) == [10, 20, 30]
+
+    def test_get_embeddings_from_frames_mixed_sizes(self):
+        """Test frames of different sizes fall back to per-frame detection"""
+        frames = [np.full((48, 64, 3), 10, dtype=np.uint8), np.full((96, 128, 3), 20, dtype=np.uint8)]
+
+        result = self.service.get_embeddings_from_frames(frames, batch_detect=True)
+
+        assert self.single_detector.calls == [1, 1]
+        assert self.resnet.batch_sizes == [2]
+        assert result['accepted'] == [0, 1]
+
+    def test_get_embeddings_from_frames_cpu_detects_per_frame(self):
+        """Test CPU default detects frame by frame but still embeds in one batch"""
+        frames = [np.full((48, 64, 3), v, dtype=np.uint8) for v in (10, 20, 30)]
+
+        result = self.service.get_embeddings_from_frames(frames, batch_detect=False)
+
+        assert self.single_detector.calls == [1, 1, 1]
+        assert self.resnet.batch_sizes == [3]
+        assert result['accepted'] == [0, 1, 2]
+
+    def test_get_embeddings_from_frames_none_accepted(self):
+        """Test no usable frames returns an empty embedding matrix"""
+        result = self.service.get_embeddings_from_frames([np.zeros((48, 64, 3), dtype=np.uint8)])
+
+        assert result['embeddings'].shape == (0, 512)
+        assert result['rejected'] == [{'index': 0, 'reason': 'no_face'}]
+
+
+class TestEmbeddingBatcher:
+    """Test micro-batching of concurrent embedding requests"""
+
+    def setup_method(self):
+        """Initialize batcher around a fake embedder"""
+        self.resnet = FakeResnet()
+        self.batcher = EmbeddingBatcher(lambda: self.resnet, max_batch_size=8, max_wait_ms=200)
+
+    def teardown_method(self):
+        self.batcher.stop()
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Test crops from concurrent callers are embedded in one forward pass"""
+        import threading
+        results = {}
+
+        def submit(value):
+            results[value] = self.batcher.embed(torch.full((1, 3, 160, 160), float(value)))
+
+        threads = [threading.Thread(target=submit, args=(v,)) for v in range(1, 5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert self.resnet.batch_sizes == [4]
+        for value, emb in results.items():
+            assert emb.shape == (1, 512)
+            assert emb[0, 0] == value
+
+        metrics = self.batcher.metrics()
+        assert metrics['requests'] == 4
+        assert metrics['batch_size_histogram'] == {4: 1}
+        assert metrics['queue_delay_ms']['max'] >= 0
+
+    def test_max_batch_size_flushes_early(self):
+        """Test a full batch runs without waiting for max_wait"""
+        import time
+        started = time.perf_counter()
+        emb = self.batcher.embed(torch.zeros(8, 3, 160, 160))
+
+        assert emb.shape == (8, 512)
+        assert time.perf_counter() - started < 0.2
+
+    def test_model_errors_reach_callers(self):
+        """Test a failing forward pass raises in the caller"""
+        def broken(faces):
+            raise RuntimeError('model failed')
+
+        batcher = EmbeddingBatcher(lambda: broken, max_wait_ms=0)
+        try:
+            with pytest.raises(RuntimeError, match='model failed'):
+                batcher.embed(torch.zeros(1, 3, 160, 160))
+        finally:
+            batcher.stop()
+
+
+class TestEmbeddingBackends:
+    """Test exported embedding backends match the eager model"""
+
+    def setup_method(self):
+        """Build an eager model; weights do not matter for parity"""
+        from facenet_pytorch import InceptionResnetV1
+        torch.manual_seed(0)
+        self.eager = InceptionResnetV1().eval()
+        self.faces = torch.randn(4, 3, 160, 160)
+        with torch.no_grad():
+            self.expected = self.eager(self.faces).numpy()
+
+    def assert_parity(self, embedder):
+        with torch.no_grad():
+            actual = embedder(self.faces).numpy()
+        distances = np.linalg.norm(actual - self.expected, axis=1)
+        assert actual.shape == (4, 512)
+        assert distances.max() < 1e-4
+
+    def test_torchscript_parity(self, tmp_path):
+        """Test TorchScript embeddings match eager embeddings"""
+        embedder = build_embedder('torchscript', lambda: self.eager, cache_dir=str(tmp_path))
+        self.assert_parity(embedder)
+        assert (tmp_path / 'inception_resnet_v1_vggface2.pt').exists()
+
+    def test_onnx_parity(self, tmp_path):
+        """Test ONNX Runtime embeddings match eager embeddings"""
+        pytest.importorskip('onnxruntime')
+        embedder = build_embedder('onnx', lambda: self.eager, cache_dir=str(tmp_path))
+        self.assert_parity(embedder)
+
+    def test_onnx_int8_report(self, tmp_path):
+        """Test INT8 calibration produces a model that stays close to fp32"""
+        pytest.importorskip('onnxruntime')
+        from backend.quantize_embedder import compare_embedders
+        from backend.services.embedding_backends import model_path, quantize_onnx
+
+        fp32 = build_embedder('onnx', lambda: self.eager, cache_dir=str(tmp_path))
+        crops = self.faces.numpy()
+        quantize_onnx(fp32.path, model_path('onnx_int8', str(tmp_path)), crops)
+
+        int8 = build_embedder('onnx_int8', lambda: self.eager, cache_dir=str(tmp_path))
+        report = compare_embedders(fp32, int8, crops, ['a', 'a', 'b', 'b'], threshold=0.6, iterations=2)
+
+        assert int8.path.endswith('.int8.onnx')
+        assert report['pairs'] == 6
+        assert report['embedding_drift']['max'] < 0.2
+        assert report['speedup'] > 0
+
+    def test_onnx_int8_falls_back_without_calibration(self, tmp_path):
+        """Test a missing INT8 model falls back to fp32 ONNX"""
+        pytest.importorskip('onnxruntime')
+        embedder = build_embedder('onnx_int8', lambda: self.eager, cache_dir=str(tmp_path))
+        assert embedder.path.endswith('vggface2.onnx')
+
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected"""
+        with pytest.raises(ValueError, match='Unknown embedding backend'):
+            build_embedder('tensorrt', lambda: self.eager)
 
 
 class TestFaceRecognitionService:
@@ -55,7 +612,7 @@ class TestLivenessDetectionService:
 
     def test_initialization(self):
         """Test service initialization"""
-        assert self.service.face_mesh is not None
+        assert self.service.face_mesh_pool is not None
         assert self.service.EAR_THRESHOLD == 0.25
         assert self.service.BLINK_FRAMES == 3
 
@@ -88,6 +645,358 @@ class TestLivenessDetectionService:
         assert result['details']['blinks_detected'] == 0
 
 
+class TestFaceMeshPool:
+    """Test per-request checkout of FaceMesh graphs"""
+
+    def test_builds_lazily_and_reuses(self):
+        """Test graphs are built on demand and reset on every checkout"""
+        built = []
+        pool = FaceMeshPool(lambda: built.append(FakeFaceMesh([None])) or built[-1], size=2)
+
+        with pool.checkout() as first:
+            pass
+        with pool.checkout() as second:
+            pass
+
+        assert len(built) == 1
+        assert first is second
+        assert first.resets == 2
+        assert pool.stats()['checkouts'] == 2
+
+    def test_concurrent_checkouts_bounded(self):
+        """Test no more than size graphs exist or are in use at once"""
+        import threading
+        import time
+
+        pool = FaceMeshPool(lambda: FakeFaceMesh([None]), size=2)
+        peak = []
+
+        def work():
+            with pool.checkout():
+                peak.append(pool.stats()['in_use'])
+                time.sleep(0.02)
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = pool.stats()
+        assert stats['created'] == 2
+        assert max(peak) <= 2
+        assert stats['in_use'] == 0
+        assert stats['waits'] >= 1
+
+    def test_checkout_timeout(self):
+        """Test waiting for a busy pool gives up after the timeout"""
+        pool = FaceMeshPool(lambda: FakeFaceMesh([None]), size=1, timeout=0.01)
+
+        with pool.checkout():
+            with pytest.raises(TimeoutError):
+                with pool.checkout():
+                    pass
+
+    def test_failed_build_frees_slot(self):
+        """Test a factory error does not leak a pool slot"""
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("model missing")
+            return FakeFaceMesh([None])
+
+        pool = FaceMeshPool(factory, size=1, timeout=0.01)
+        with pytest.raises(RuntimeError):
+            with pool.checkout():
+                pass
+        with pool.checkout() as face_mesh:
+            assert face_mesh is not None
+
+
+class TestAttendanceJobQueue:
+    """Test the in-process queue behind async mark-attendance"""
+
+    def setup_method(self):
+        self.queue = AttendanceJobQueue(workers=1, max_pending=1, ttl=60)
+
+    def teardown_method(self):
+        self.queue.shutdown()
+
+    def test_job_result_and_stage_timings(self):
+        """Test a job reports its result and per-stage timings to its owner only"""
+        def run(job):
+            with job.stage('verify'):
+                return {'success': True}
+
+        job = self.queue.submit(7, run)
+        snapshot = self.queue.wait(job, 'queued', timeout=5)
+        if snapshot['status'] == 'running':
+            snapshot = self.queue.wait(job, 'running', timeout=5)
+
+        assert snapshot['status'] == 'done'
+        assert snapshot['result'] == {'success': True}
+        assert set(snapshot['timings_ms']) == {'queued', 'verify', 'total'}
+        assert self.queue.get(job.id, 7) is job
+        assert self.queue.get(job.id, 8) is None
+
+        metrics = self.queue.metrics()
+        assert metrics['completed'] == 1
+        assert metrics['queue_depth'] == 0
+        assert set(metrics['stages']) == {'queued', 'verify', 'total'}
+
+    def test_finished_job_expires_without_new_submissions(self):
+        """Test a finished job stops being readable after the TTL even if nothing else is submitted"""
+        job = self.queue.submit(7, lambda job: {'success': True})
+        while job.status != 'done':
+            self.queue.wait(job, job.status, timeout=5)
+
+        assert self.queue.get(job.id, 7) is job
+        # Finished longer ago than the 60 s TTL
+        job.finished_at -= 61
+
+        assert self.queue.get(job.id, 7) is None
+        assert job.id not in self.queue._jobs
+
+    def test_queue_full_and_failures(self):
+        """Test submissions beyond max_pending are refused and errors mark the job failed"""
+        import threading
+
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking(job):
+            started.set()
+            release.wait(5)
+            raise RuntimeError('BLE adapter missing')
+
+        running = self.queue.submit(1, blocking)
+        started.wait(5)
+        queued = self.queue.submit(1, lambda job: {})
+        with pytest.raises(QueueFullError):
+            self.queue.submit(1, lambda job: {})
+        assert self.queue.metrics()['queue_depth'] == 1
+
+        release.set()
+        self.queue.shutdown()
+
+        assert running.status == 'failed'
+        assert running.error == 'BLE adapter missing'
+        assert queued.status == 'done'
+        assert self.queue.metrics()['rejected'] == 1
+
+
+class TestLivenessSequences:
+    """Test vectorized liveness checks against scripted landmarks"""
+
+    def service_for(self, script):
+        self.mesh = FakeFaceMesh(script)
+        registry = ModelRegistry()
+        registry.register('face_mesh_pool', lambda: FaceMeshPool(lambda: self.mesh, 1))
+        service = LivenessDetectionService(registry=registry)
+        # Scripted landmarks are relative to whatever image is passed, so feed full
+        # frames; the frames themselves are identical, so keep every one
+        service.ROI_ENABLED = False
+        service.DEDUP_ENABLED = False
+        return service
+
+    def frames(self, n):
+        return [np.full((100, 100, 3), 128, dtype=np.uint8) for _ in range(n)]
+
+    def test_single_frame_checks(self):
+        """Test per-frame EAR and pose from one landmark set"""
+        service = self.service_for([face_landmarks(ear=0.1, offset=-15)])
+        blink = service.detect_blink(self.frames(1)[0])
+        pose = service.detect_head_pose(self.frames(1)[0])
+
+        assert blink['blink_detected'] == True
+        assert abs(blink['ear'] - 0.1) < 1e-4
+        assert pose['direction'] == 'left'
+        assert abs(pose['angles']['horizontal_diff'] + 15) < 1e-3
+
+    def test_blink_runs(self):
+        """Test only closed runs of BLINK_FRAMES followed by an open frame count"""
+        ears = [0.3, 0.1, 0.1, 0.1, 0.3, 0.1, 0.1, 0.3, 0.1, 0.1, 0.1]
+        service = self.service_for([face_landmarks(ear=e) for e in ears])
+        result = service._verify_blink_challenge(self.frames(len(ears)))
+
+        assert result['details']['blinks_detected'] == 1
+        assert result['success'] == True
+        # Evaluation stops at the open frame that completes the first blink
+        assert result['details']['frames_processed'] == 5
+        assert result['details']['frames_submitted'] == len(ears)
+        assert self.mesh.calls == 5
+
+    def test_missing_face_breaks_blink(self):
+        """Test a frame without a face ends a closed-eye run"""
+        script = [face_landmarks(ear=0.1), face_landmarks(ear=0.1), None, face_landmarks(ear=0.1),
+                  face_landmarks(ear=0.3)]
+        result = self.service_for(script)._verify_blink_challenge(self.frames(5))
+
+        assert result['details']['blinks_detected'] == 0
+
+    def test_head_movement(self):
+        """Test head turn matches count frames past the centre tolerance"""
+        script = [face_landmarks(offset=o) for o in (15, 12, 0, -20)] + [None]
+        result = self.service_for(script).verify_liveness_challenge('head_right', self.frames(5))
+
+        assert result['details']['matches'] == 2
+        assert result['success'] == False
+        assert result['confidence'] == 0.4
+
+    def test_head_movement_stops_at_quota(self):
+        """Test evaluation stops once half the frames face the target"""
+        script = [face_landmarks(offset=o) for o in (15, 15, 15, 0, 0)]
+        result = self.service_for(script).verify_liveness_challenge('head_right', self.frames(5))
+
+        assert result['success'] == True
+        assert result['details']['frames_processed'] == 3
+        assert self.mesh.calls == 3
+
+    def test_unreachable_blink_fails_without_processing(self):
+        """Test a sequence too short to contain a blink is rejected immediately"""
+        service = self.service_for([face_landmarks(ear=0.1)])
+        result = service.verify_liveness_challenge('blink', self.frames(service.BLINK_FRAMES))
+
+        assert result['success'] == False
+        assert result['details']['frames_processed'] == 0
+        assert self.mesh.calls == 0
+
+
+class BlobFaceMesh:
+    """FaceMesh stand-in that places a face over the bright square in whatever image it gets"""
+
+    def __init__(self):
+        self.input_shapes = []
+
+    def process(self, rgb):
+        from types import SimpleNamespace
+
+        self.input_shapes.append(rgb.shape[:2])
+        ys, xs = np.nonzero(rgb[..., 0] > 200)
+        if len(xs) == 0:
+            return SimpleNamespace(multi_face_landmarks=None)
+
+        h, w = rgb.shape[:2]
+        x1, y1, size = xs.min(), ys.min(), xs.max() + 1 - xs.min()
+        landmarks = [SimpleNamespace(x=(x1 + p.x * size) / w, y=(y1 + p.y * size) / h)
+                     for p in face_landmarks()]
+        return SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=landmarks)])
+
+
+class TestLivenessROI:
+    """Test face-ROI cropping of liveness frames"""
+
+    def setup_method(self):
+        """Service with a blob-tracking FaceMesh"""
+        self.mesh = BlobFaceMesh()
+        registry = ModelRegistry()
+        registry.register('face_mesh_pool', lambda: FaceMeshPool(lambda: self.mesh, 1))
+        self.service = LivenessDetectionService(registry=registry)
+        self.service.DEDUP_ENABLED = False
+
+    def frame(self, x, y, size=100, shape=(480, 640)):
+        frame = np.zeros(shape + (3,), dtype=np.uint8)
+        frame[y:y + size, x:x + size] = 255
+        return frame
+
+    def test_roi_landmarks_match_full_frame(self):
+        """Test landmarks from crops map back to full-frame coordinates"""
+        from backend.services.liveness_detection import FaceROITracker
+
+        frames = [self.frame(300 + 5 * i, 200) for i in range(4)]
+        expected = self.service.extract_landmarks(frames)
+        tracker = FaceROITracker(0.75, seed_box=(300, 200, 400, 300))
+        actual = self.service.extract_landmarks(frames, tracker=tracker)
+
+        assert np.allclose(actual, expected, atol=1e-3)
+        assert tracker.roi_frames == 4 and tracker.full_frames == 0
+        assert all(h * w < 480 * 640 / 2 for h, w in self.mesh.input_shapes[-4:])
+
+    def test_lost_face_falls_back_to_full_frame(self):
+        """Test a face outside the ROI is found again in the full frame"""
+        from backend.services.liveness_detection import FaceROITracker
+
+        frames = [self.frame(50, 50), self.frame(500, 350, size=80), self.frame(505, 350, size=80)]
+        tracker = FaceROITracker(0.75)
+        points = self.service.extract_landmarks(frames, tracker=tracker)
+
+        assert not np.isnan(points).any()
+        # First frame has no seed, second leaves the ROI, third is tracked again
+        assert tracker.full_frames == 2
+        assert tracker.roi_frames == 1
+        assert points[1, :, 0].min() > 500
+
+    def test_challenge_reports_roi_usage(self):
+        """Test challenge details count cropped and full frames"""
+        frames = [self.frame(300, 200) for _ in range(4)]
+        result = self.service.verify_liveness_challenge('head_left', frames, face_box=(300, 200, 400, 300))
+
+        assert result['details']['roi_frames'] == result['details']['frames_processed']
+        assert result['details']['full_frames'] == 0
+
+
+class TestNearDuplicateFilter:
+    """Test near-duplicate frame suppression"""
+
+    def noisy(self, base, seed):
+        rng = np.random.default_rng(seed)
+        return np.clip(base + rng.integers(-2, 3, base.shape), 0, 255).astype(np.uint8)
+
+    def test_drops_repeats_within_gap(self):
+        """Test repeated frames are dropped but one in every max_gap is kept"""
+        base = np.full((120, 160, 3), 100, dtype=np.int16)
+        dedup = NearDuplicateFilter(threshold=6, max_gap=3)
+        flags = [dedup.is_duplicate(self.noisy(base, i)) for i in range(7)]
+
+        assert flags == [False, True, True, False, True, True, False]
+        assert dedup.stats() == {'frames_kept': 3, 'frames_dropped': 4}
+
+    def test_local_change_is_kept(self):
+        """Test a small local change such as closing the eyes is not a duplicate"""
+        open_eyes = np.full((480, 640, 3), 100, dtype=np.uint8)
+        closed_eyes = open_eyes.copy()
+        closed_eyes[200:215, 280:320] = 20
+        dedup = NearDuplicateFilter(threshold=6, max_gap=10)
+
+        assert dedup.is_duplicate(open_eyes) == False
+        assert dedup.is_duplicate(closed_eyes) == False
+        assert dedup.is_duplicate(closed_eyes.copy()) == True
+
+    def test_liveness_reuses_landmarks_for_duplicates(self):
+        """Test duplicate frames skip FaceMesh but still count towards a blink"""
+        mesh = FakeFaceMesh([face_landmarks(ear=0.1), face_landmarks(ear=0.3)])
+        registry = ModelRegistry()
+        registry.register('face_mesh_pool', lambda: FaceMeshPool(lambda: mesh, 1))
+        service = LivenessDetectionService(registry=registry)
+        service.ROI_ENABLED = False
+
+        closed = np.full((100, 100, 3), 50, dtype=np.uint8)
+        opened = np.full((100, 100, 3), 150, dtype=np.uint8)
+        frames = [closed, closed.copy(), closed.copy(), opened]
+        result = service.verify_liveness_challenge('blink', frames)
+
+        assert result['success'] == True
+        assert result['details']['frames_deduplicated'] == 2
+        assert mesh.calls == 2
+
+    def test_registration_rejects_duplicates(self):
+        """Test repeated registration frames never reach the detector"""
+        detector = FakeSingleMTCNN()
+        registry = ModelRegistry()
+        registry.register('mtcnn', lambda: detector)
+        registry.register('resnet', FakeResnet)
+        service = FaceRecognitionService(registry=registry, batcher=None, cache=EmbeddingCache(),
+                                         gallery=GalleryIndex())
+        frames = [np.full((48, 64, 3), v, dtype=np.uint8) for v in (10, 10, 30)]
+        result = service.get_embeddings_from_frames(frames, batch_detect=False, deduplicate=True)
+
+        assert result['accepted'] == [0, 2]
+        assert result['rejected'] == [{'index': 1, 'reason': 'duplicate'}]
+        assert sum(detector.calls) == 2
+
+
 from backend.app import create_app
 from backend.models import db, User
 import asyncio
@@ -133,6 +1042,663 @@ class TestBLEProximityService:
         assert result['verified'] == False
         assert result['error'] == 'Device not registered'
 
+    def test_check_proximity_from_scanner_table(self):
+        """Test check_proximity answers from a running background scanner"""
+        user = User(roll_number='TEST002', name='Test', email='test2@test.com',
+                    device_uuid='aa:bb:cc:dd:ee:ff')
+        db.session.add(user)
+        db.session.commit()
+
+        backend = FakeScannerBackend()
+        scanner = BLEScannerDaemon(backend=backend)
+        scanner.start()
+        try:
+            service = BLEProximityService(scanner=scanner)
+
+            result = asyncio.run(service.check_proximity(user.id))
+            assert result['verified'] == False
+            assert result['source'] == 'scanner'
+
+            backend.emit('AA:BB:CC:DD:EE:FF', -60)
+            result = asyncio.run(service.check_proximity(user.id))
+            assert result['verified'] == True
+            assert result['rssi'] == -60
+
+            backend.emit('AA:BB:CC:DD:EE:FF', -85)
+            result = asyncio.run(service.check_proximity(user.id))
+            assert result['verified'] == False
+            assert result['rssi'] == -85
+        finally:
+            scanner.stop()
+
+    def test_scan_for_target_stops_on_detection(self):
+        """Test targeted scan returns as soon as the target is in range"""
+        backend = FakeScannerBackend()
+        service = BLEProximityService(scan_backend_factory=lambda: backend)
+
+        async def scan():
+            task = asyncio.create_task(service.scan_for_target('aa:bb:cc:dd:ee:ff', timeout=5))
+            await asyncio.sleep(0.05)
+            backend.emit('11:22:33:44:55:66', -40)
+            backend.emit('AA:BB:CC:DD:EE:FF', -90)
+            backend.emit('AA:BB:CC:DD:EE:FF', -55)
+            return await task
+
+        sighting = asyncio.run(scan())
+        assert sighting['rssi'] == -55
+        assert sighting['time_to_detection'] < 1
+        assert sighting['scan_duration'] < 1
+
+    def test_scan_for_target_timeout(self):
+        """Test targeted scan gives up after the timeout when the target is weak"""
+        backend = FakeScannerBackend()
+        service = BLEProximityService(scan_backend_factory=lambda: backend)
+
+        async def scan():
+            task = asyncio.create_task(service.scan_for_target('AA:BB:CC:DD:EE:FF', timeout=0.2))
+            await asyncio.sleep(0.05)
+            backend.emit('AA:BB:CC:DD:EE:FF', -90)
+            return await task
+
+        sighting = asyncio.run(scan())
+        assert sighting['rssi'] == -90
+        assert sighting['scan_duration'] >= 0.2
+        assert asyncio.run(service.scan_for_target('AA:BB:CC:DD:EE:FF', timeout=0.05)) is None
+
+
+class TestBLEScannerDaemon:
+    """Test background BLE scanner RSSI table"""
+
+    def setup_method(self):
+        """Initialize daemon with a controllable clock"""
+        self.now = 1000.0
+        self.daemon = BLEScannerDaemon(backend=FakeScannerBackend(), expiry_seconds=60,
+                                       clock=lambda: self.now)
+
+    def test_record_and_lookup(self):
+        """Test sightings accumulate per address"""
+        self.daemon.record('aa:bb:cc:dd:ee:ff', -72, 'Phone')
+        self.now += 2
+        self.daemon.record('AA:BB:CC:DD:EE:FF', -65)
+
+        entry = self.daemon.lookup('aa:bb:cc:dd:ee:ff')
+        assert entry['rssi'] == -65
+        assert entry['samples'] == 2
+        assert entry['name'] == 'Phone'
+        assert entry['age'] == 0
+
+    def test_lookup_freshness_window(self):
+        """Test sightings older than max_age are ignored"""
+        self.daemon.record('AA:BB:CC:DD:EE:FF', -60)
+        self.now += 15
+
+        assert self.daemon.lookup('AA:BB:CC:DD:EE:FF', max_age=10) is None
+        assert self.daemon.lookup('AA:BB:CC:DD:EE:FF', max_age=30)['age'] == 15
+
+    def test_prune_expired_entries(self):
+        """Test entries past the expiry horizon are dropped"""
+        self.daemon.record('AA:BB:CC:DD:EE:01', -60)
+        self.now += 50
+        self.daemon.record('AA:BB:CC:DD:EE:02', -60)
+        self.now += 20
+
+        assert self.daemon.prune() == 1
+        assert [e['address'] for e in self.daemon.snapshot()] == ['AA:BB:CC:DD:EE:02']
+
+    def test_explicit_zero_expiry_kept(self):
+        """Test expiry_seconds=0 is honoured instead of falling back to Config"""
+        daemon = BLEScannerDaemon(backend=FakeScannerBackend(), expiry_seconds=0, clock=lambda: self.now)
+        daemon.record('AA:BB:CC:DD:EE:01', -60)
+        self.now += 1
+
+        assert daemon.expiry_seconds == 0
+        assert daemon.prune() == 1
+
+    def test_start_stop_with_fake_backend(self):
+        """Test the daemon thread feeds the table from its backend"""
+        backend = FakeScannerBackend()
+        daemon = BLEScannerDaemon(backend=backend)
+        daemon.start()
+        assert daemon.is_running()
+
+        backend.emit('AA:BB:CC:DD:EE:FF', -55)
+        assert daemon.lookup('AA:BB:CC:DD:EE:FF')['rssi'] == -55
+
+        daemon.stop()
+        assert not daemon.is_running()
+
+
+class TestEmbeddingCache:
+    """Test template cache used by verify_face"""
+
+    def setup_method(self):
+        """Initialize in-memory db and two services standing in for two workers"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.user = User(roll_number='TEST001', name='Test', email='test@test.com')
+        db.session.add(self.user)
+        db.session.commit()
+
+        self.cache = EmbeddingCache(max_size=2)
+        self.service = FaceRecognitionService(registry=ModelRegistry(), cache=self.cache)
+        self.other_worker = FaceRecognitionService(registry=ModelRegistry(), cache=EmbeddingCache())
+
+    def teardown_method(self):
+        """Clean up"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_register_writes_through(self):
+        """Test verify after register is served from the cache"""
+        self.service.register_user_face(self.user.id, np.ones(512) * 0.1)
+
+        match, distance = self.service.verify_face(self.user.id, np.ones(512, dtype=np.float32) * 0.1)
+        assert match == True
+        assert distance < 1e-5
+        assert self.cache.stats()['hits'] == 1
+        assert self.cache.stats()['misses'] == 0
+
+    def test_reregistration_in_other_worker_invalidates(self):
+        """Test a newer row version written elsewhere replaces the cached template"""
+        self.service.register_user_face(self.user.id, np.zeros(512))
+        self.other_worker.register_user_face(self.user.id, np.ones(512))
+
+        match, distance = self.service.verify_face(self.user.id, np.ones(512))
+        assert match == True
+        assert self.cache.stats()['misses'] == 1
+
+        self.service.verify_face(self.user.id, np.ones(512))
+        assert self.cache.stats()['hits'] == 1
+
+    def test_lru_eviction(self):
+        """Test the least recently used user is evicted when full"""
+        cache = EmbeddingCache(max_size=2)
+        cache.put(1, 'v1', np.zeros(4))
+        cache.put(2, 'v1', np.zeros(4))
+        cache.get(1, 'v1')
+        cache.put(3, 'v1', np.zeros(4))
+
+        assert cache.get(2, 'v1') is None
+        assert cache.get(1, 'v1') is not None
+        assert cache.get(3, 'v1').dtype == np.float32
+        assert cache.stats()['evictions'] == 1
+
+    def test_verify_unregistered_user(self):
+        """Test verify for a user without a template"""
+        match, distance = self.service.verify_face(self.user.id, np.zeros(512))
+        assert match == False
+        assert distance == float('inf')
+
+
+class TestGalleryIndex:
+    """Test vectorized 1:N identification"""
+
+    def setup_method(self):
+        """Initialize an index over four orthogonal templates"""
+        self.index = GalleryIndex(dim=8)
+        self.index.build([10, 20, 30, 40], np.eye(8)[:4])
+
+    def test_search_top_k(self):
+        """Test probes return their nearest users, nearest first"""
+        probes = np.array([[1, 0.5, 0, 0, 0, 0, 0, 0], [0, 0, 0, 1, 0, 0, 0, 0]])
+        results = self.index.search(probes, k=2)
+
+        assert [uid for uid, _ in results[0]] == [10, 20]
+        assert results[1][0] == (40, 0.0)
+        assert results[0][0][1] < results[0][1][1]
+
+    def test_add_update_remove(self):
+        """Test incremental changes are visible to the next search"""
+        self.index.add_or_update(50, np.eye(8)[5])
+        assert self.index.search(np.eye(8)[5])[0][0][0] == 50
+
+        self.index.add_or_update(10, np.eye(8)[6])
+        assert self.index.search(np.eye(8)[6])[0][0][0] == 10
+
+        assert self.index.remove(20)
+        assert len(self.index) == 4
+        assert 20 not in self.index
+        assert [uid for uid, _ in self.index.search(np.eye(8)[1], k=10)[0]].count(20) == 0
+        assert self.index.search(np.eye(8)[5])[0][0][0] == 50
+
+    def test_growth_beyond_capacity(self):
+        """Test the matrix grows when adding past its capacity"""
+        index = GalleryIndex(dim=4)
+        for user_id in range(100):
+            index.add_or_update(user_id, np.random.randn(4))
+
+        assert len(index) == 100
+        assert len(index.search(np.random.randn(3, 4), k=5)[2]) == 5
+
+    def test_search_restricted_to_candidates(self):
+        """Test non-candidate users are never returned"""
+        results = self.index.search(np.eye(8)[0], k=3, candidates=[20, 30])
+
+        assert [uid for uid, _ in results[0]] in ([20, 30], [30, 20])
+        assert self.index.search(np.eye(8)[0], candidates=[]) == [[]]
+
+    def test_empty_gallery(self):
+        """Test searching an empty gallery"""
+        assert GalleryIndex(dim=4).search(np.ones((2, 4))) == [[], []]
+
+
+class TestFaceIdentification:
+    """Test identify_face against the database-backed gallery"""
+
+    def setup_method(self):
+        """Initialize in-memory db with enrolled students"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.gallery = GalleryIndex()
+        self.service = FaceRecognitionService(registry=ModelRegistry(), cache=EmbeddingCache(),
+                                              gallery=self.gallery)
+        self.templates = np.eye(512)[:3]
+        self.users = []
+        for i in range(3):
+            user = User(roll_number=f'S{i}', name=f'Student {i}', email=f's{i}@test.com')
+            db.session.add(user)
+            db.session.commit()
+            self.service.register_user_face(user.id, self.templates[i])
+            self.users.append(user)
+
+    def teardown_method(self):
+        """Clean up"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_identify_loads_gallery(self):
+        """Test identification loads all templates and matches probes"""
+        results = self.service.identify_face(self.templates[[2, 0]])
+
+        assert self.gallery.loaded
+        assert results[0][0]['user_id'] == self.users[2].id
+        assert results[0][0]['match'] == True
+        assert results[1][0]['user_id'] == self.users[0].id
+
+    def test_identify_and_verify_agree_on_averaged_template(self):
+        """Test a template shorter than unit length gets the same distance from identify and verify"""
+        probe = np.zeros(512)
+        probe[0], probe[1] = 0.9, np.sqrt(0.19)
+        # Averaged enrolment template: right direction, norm well below 1
+        self.service.register_user_face(self.users[0].id, 0.3 * self.templates[0])
+
+        identified = self.service.identify_face(probe, candidates=[self.users[0].id])[0][0]
+        match, distance = self.service.verify_face(self.users[0].id, probe)
+
+        assert distance == pytest.approx(identified['distance'], abs=1e-5)
+        assert distance == pytest.approx(np.sqrt(2 - 2 * 0.9), abs=1e-5)
+        assert match == identified['match'] == True
+
+    def test_register_updates_loaded_gallery_in_place(self):
+        """Test re-registration patches the loaded gallery without a reload"""
+        self.service.identify_face(self.templates[0])
+        self.service.register_user_face(self.users[0].id, np.eye(512)[7])
+
+        assert not self.gallery.is_stale()
+        result = self.service.identify_face(np.eye(512)[7])[0][0]
+        assert result['user_id'] == self.users[0].id
+        assert result['distance'] < 1e-5
+
+    def test_register_after_concurrent_commit_marks_gallery_stale(self):
+        """Test a row committed by another worker after the staleness check is not lost"""
+        self.service.identify_face(self.templates[0])
+        other_worker = FaceRecognitionService(registry=ModelRegistry(), cache=EmbeddingCache(),
+                                              gallery=GalleryIndex())
+        newcomer = User(roll_number='S9', name='Student 9', email='s9@test.com')
+        db.session.add(newcomer)
+        db.session.commit()
+
+        # The other worker commits between this worker's staleness check and its own commit
+        real_is_stale = self.gallery.is_stale
+        def check_then_race():
+            stale = real_is_stale()
+            other_worker.register_user_face(newcomer.id, np.eye(512)[9])
+            return stale
+        self.gallery.is_stale = check_then_race
+        self.service.register_user_face(self.users[0].id, np.eye(512)[7])
+        del self.gallery.is_stale
+
+        assert not self.gallery.loaded
+        assert self.service.identify_face(np.eye(512)[9])[0][0]['user_id'] == newcomer.id
+        assert self.service.identify_face(np.eye(512)[7])[0][0]['user_id'] == self.users[0].id
+
+
+class TestSharedGalleryIndex:
+    """Test the memory-mapped gallery shared between workers"""
+
+    def setup_method(self):
+        """Initialize in-memory db with enrolled students"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.users = []
+        for i in range(3):
+            user = User(roll_number=f'S{i}', name=f'Student {i}', email=f's{i}@test.com')
+            db.session.add(user)
+            db.session.commit()
+            self.users.append(user.id)
+
+    def teardown_method(self):
+        """Clean up"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def worker(self, path):
+        return FaceRecognitionService(registry=ModelRegistry(), cache=EmbeddingCache(),
+                                      gallery=SharedGalleryIndex(str(path)))
+
+    def test_workers_map_published_file(self, tmp_path):
+        """Test a second worker maps the first worker's file instead of rebuilding"""
+        path = tmp_path / 'gallery.bin'
+        first, second = self.worker(path), self.worker(path)
+        for i, user_id in enumerate(self.users):
+            first.register_user_face(user_id, np.eye(512)[i])
+
+        assert first.identify_face(np.eye(512)[1])[0][0]['user_id'] == self.users[1]
+        generation = first.gallery.generation
+
+        assert second.identify_face(np.eye(512)[2])[0][0]['user_id'] == self.users[2]
+        assert second.gallery.generation == generation
+        assert not second.gallery._matrix.flags.writeable
+        assert second.gallery._matrix.flags.c_contiguous
+
+    def test_enrollment_bumps_generation(self, tmp_path):
+        """Test other workers remap after an enrollment elsewhere"""
+        path = tmp_path / 'gallery.bin'
+        first, second = self.worker(path), self.worker(path)
+        first.register_user_face(self.users[0], np.eye(512)[0])
+        first.identify_face(np.eye(512)[0])
+        second.identify_face(np.eye(512)[0])
+        generation = second.gallery.generation
+
+        first.register_user_face(self.users[1], np.eye(512)[1])
+        assert first.gallery.generation == generation + 1
+        assert second.gallery.is_stale()
+
+        result = second.identify_face(np.eye(512)[1])[0][0]
+        assert result['user_id'] == self.users[1]
+        assert second.gallery.generation == generation + 1
+
+    def test_concurrent_publishes_keep_every_template(self, tmp_path):
+        """Test a worker publishing over a newer generation rebuilds instead of dropping templates"""
+        from backend.models import FaceEmbedding
+
+        path = tmp_path / 'gallery.bin'
+        first, second = self.worker(path), self.worker(path)
+        first.identify_face(np.eye(512)[0])
+        second.identify_face(np.eye(512)[0])
+
+        # Both workers commit, then each patches its own private copy and publishes
+        for user_id, index in ((self.users[0], 0), (self.users[1], 1)):
+            db.session.add(FaceEmbedding(user_id=user_id, embedding=np.eye(512)[index]))
+            db.session.commit()
+        first.gallery.add_or_update(self.users[0], np.eye(512)[0])
+        second.gallery.add_or_update(self.users[1], np.eye(512)[1])
+
+        # A new worker maps the published file as is, and it holds both templates
+        fresh = SharedGalleryIndex(str(path))
+        fresh.load_from_db()
+        assert fresh.generation == second.gallery.generation
+        assert sorted(fresh._user_ids.tolist()) == sorted(self.users[:2])
+        assert not fresh.is_stale()
+        assert second.identify_face(np.eye(512)[0])[0][0]['user_id'] == self.users[0]
+
+    def test_empty_gallery_file(self, tmp_path):
+        """Test a gallery with no templates can be published and mapped"""
+        gallery = SharedGalleryIndex(str(tmp_path / 'gallery.bin'))
+        gallery.load_from_db()
+
+        assert gallery.loaded and len(gallery) == 0
+        assert gallery.search(np.ones(512)) == [[]]
+
+
+class OneHotResnet:
+    """Embedder stand-in that maps a crop of value v to the v-th unit vector"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, faces):
+        self.batch_sizes.append(len(faces))
+        return torch.eye(512)[faces[:, 0, 0, 0].long()]
+
+
+class TestRegisterFaceRoute:
+    """Test face registration through the HTTP API"""
+
+    def setup_method(self):
+        """Initialize in-memory db and log a student in"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        student = User(roll_number='S1', name='Student', email='s1@test.com', role='student')
+        student.set_password('secret')
+        db.session.add(student)
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        self.client.post('/auth/login', data={'roll_number': 'S1', 'password': 'secret'})
+        frame = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+        self.frame = 'data:image/jpeg;base64,' + base64.b64encode(frame).decode()
+
+    def teardown_method(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_frontend_capture_size_accepted(self):
+        """Test the 100 frames the registration page sends (10 s at 10 fps) are all decoded"""
+        from unittest.mock import patch
+
+        batch = {'embeddings': np.zeros((5, 512), dtype=np.float32), 'accepted': list(range(5)), 'rejected': []}
+        with patch('backend.routes.student.face_service.get_embeddings_from_frames', return_value=batch) as embed, \
+                patch('backend.routes.student.face_service.register_user_face') as register:
+            response = self.client.post('/student/api/register-face', json={'frames': [self.frame] * 100})
+
+        assert response.status_code == 200
+        assert response.get_json()['success'] == True
+        frames = embed.call_args[0][0]
+        assert len(frames) == 100
+        assert all(frame is not None for frame in frames)
+        register.assert_called_once()
+
+    def test_oversized_registration_rejected(self):
+        """Test registrations beyond the frame cap are refused before decoding"""
+        from backend.config import Config
+
+        response = self.client.post('/student/api/register-face',
+                                    json={'frames': [self.frame] * (Config.FRAME_DECODE_MAX_REGISTRATION_FRAMES + 1)})
+
+        assert response.status_code == 400
+
+
+class TestAttendanceJobRoutes:
+    """Test submit-then-poll mark-attendance through the HTTP API"""
+
+    def setup_method(self):
+        """Initialize in-memory db and log a student in"""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        student = User(roll_number='S1', name='Student', email='s1@test.com', role='student')
+        student.set_password('secret')
+        db.session.add(student)
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        self.client.post('/auth/login', data={'roll_number': 'S1', 'password': 'secret'})
+        frame = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+        self.frame = 'data:image/jpeg;base64,' + base64.b64encode(frame).decode()
+
+    def teardown_method(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_submit_then_poll_and_stream(self):
+        """Test a queued job ends with the same result dict as the synchronous API"""
+        import time
+        from unittest.mock import patch, AsyncMock
+
+        with patch('backend.routes.student.ble_service.check_proximity',
+                   AsyncMock(return_value={'verified': False})):
+            response = self.client.post('/student/api/mark-attendance/jobs',
+                                        json={'session_id': 999, 'frame': self.frame})
+            assert response.status_code == 202
+            job_id = response.get_json()['job_id']
+
+            for _ in range(100):
+                job = self.client.get(f'/student/api/mark-attendance/jobs/{job_id}').get_json()
+                if job['status'] == 'done':
+                    break
+                time.sleep(0.05)
+
+            synchronous = self.client.post('/student/api/mark-attendance',
+                                           json={'session_id': 999, 'frame': self.frame}).get_json()
+
+        assert job['result']['errors'] == ['Session not active']
+        assert job['result'] == synchronous
+        assert {'queued', 'decode', 'ble', 'verify', 'total'} <= set(job['timings_ms'])
+
+        events = self.client.get(f'/student/api/mark-attendance/jobs/{job_id}/events')
+        assert events.mimetype == 'text/event-stream'
+        assert 'event: done' in events.get_data(as_text=True)
+        assert self.client.get('/student/api/mark-attendance/jobs/unknown').status_code == 404
+
+
+class TestGroupAttendance:
+    """Test bulk attendance from classroom photos"""
+
+    def setup_method(self):
+        """Initialize in-memory db with a session and three enrolled students"""
+        from datetime import date, time
+        from backend.models import Session as ClassSession
+
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        teacher = User(roll_number='T1', name='Teacher', email='t@test.com', role='teacher')
+        db.session.add(teacher)
+        db.session.commit()
+        self.session = ClassSession(course_code='CS101', course_name='Intro', teacher_id=teacher.id,
+                                    session_date=date.today(), start_time=time(9), end_time=time(10))
+        db.session.add(self.session)
+        db.session.commit()
+
+        self.detector = FakeMTCNN()
+        self.resnet = OneHotResnet()
+        registry = ModelRegistry()
+        registry.register('mtcnn_multi', lambda: self.detector)
+        registry.register('resnet', lambda: self.resnet)
+        face_service = FaceRecognitionService(registry=registry, batcher=None, cache=EmbeddingCache(),
+                                              gallery=GalleryIndex())
+        self.service = AttendanceService(face_service, liveness_service=object(), ble_service=object())
+
+        # Student i is enrolled with unit vector i + 1, i.e. a box of width i + 1
+        self.students = []
+        for i in range(3):
+            user = User(roll_number=f'S{i}', name=f'Student {i}', email=f's{i}@test.com')
+            db.session.add(user)
+            db.session.commit()
+            face_service.register_user_face(user.id, np.eye(512)[i + 1])
+            self.students.append(user.id)
+
+    def teardown_method(self):
+        """Clean up"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_marks_matched_and_logs_unmatched(self):
+        """Test one embedding pass marks each recognised student once and logs only strangers"""
+        from backend.models import AttendanceLog, AnomalyLog
+
+        # Widths 1 and 2 are students 0 and 1, width 9 is a stranger, width 1 again is a duplicate
+        self.detector.boxes = np.array([[0, 0, 1, 1], [0, 0, 2, 2], [0, 0, 9, 9], [5, 5, 6, 6]], dtype=float)
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        result = self.service.mark_group_attendance(self.session.id, [frame, None])
+
+        assert result['success']
+        assert result['faces_detected'] == 4
+        assert self.resnet.batch_sizes == [4]
+        assert sorted(m['user_id'] for m in result['marked']) == self.students[:2]
+        assert len(result['unmatched']) == 1
+        assert result['unmatched'][0]['box'] == [0, 0, 9, 9]
+        assert len(result['duplicates']) == 1
+        assert result['duplicates'][0]['user_id'] == self.students[0]
+        assert result['duplicates'][0]['photo'] == 0
+        assert result['rejected'] == [{'index': 1, 'reason': 'decode_failed'}]
+        assert AttendanceLog.query.filter_by(session_id=self.session.id).count() == 2
+        assert AnomalyLog.query.filter_by(anomaly_type='unmatched_face').count() == 1
+
+    def test_skips_students_already_marked(self):
+        """Test a second photo does not duplicate attendance rows"""
+        from backend.models import AttendanceLog
+
+        self.detector.boxes = np.array([[0, 0, 1, 1]], dtype=float)
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        self.service.mark_group_attendance(self.session.id, [frame])
+        result = self.service.mark_group_attendance(self.session.id, [frame])
+
+        assert result['marked'] == []
+        assert result['already_marked'][0]['user_id'] == self.students[0]
+        assert AttendanceLog.query.count() == 1
+
+    def test_teacher_templates_are_not_candidates(self):
+        """Test only students can be matched from a group photo"""
+        teacher = User.query.filter_by(role='teacher').first()
+        self.service.face_service.register_user_face(teacher.id, np.eye(512)[5])
+
+        self.detector.boxes = np.array([[0, 0, 5, 5]], dtype=float)
+        result = self.service.mark_group_attendance(self.session.id, [np.zeros((50, 50, 3), np.uint8)])
+
+        assert result['marked'] == []
+        assert len(result['unmatched']) == 1
+
+    def test_face_confidence_matches_single_student_metric(self):
+        """Test group rows store the distance verify_face reports, even for a shorter averaged template"""
+        from backend.models import AttendanceLog
+
+        template = np.zeros(512)
+        template[1], template[5] = 0.3 * 0.9, 0.3 * np.sqrt(0.19)
+        self.service.face_service.register_user_face(self.students[0], template)
+
+        self.detector.boxes = np.array([[0, 0, 1, 1]], dtype=float)
+        self.service.mark_group_attendance(self.session.id, [np.zeros((50, 50, 3), np.uint8)])
+
+        _, distance = self.service.face_service.verify_face(self.students[0], np.eye(512)[1])
+        stored = AttendanceLog.query.filter_by(user_id=self.students[0]).one().face_confidence
+        assert stored == pytest.approx(distance, abs=1e-5)
+
 
 class TestNotificationService:
     """Test Notification Service"""